@@ -0,0 +1,281 @@
+"""
+Times the hot paths of the ART tools on the in-memory Maya scene of Benchmarks.fake_maya, reporting the wall time and
+the maya.cmds calls of each, so regressions can be caught without Maya.
+
+Run from a plain Python 2.7 interpreter with Core/Scripts on the path (not from mayapy: the fake modules take the
+place of maya):
+
+    python -m Benchmarks.bench_hot_paths
+    python -m Benchmarks.bench_hot_paths --frames 200 --vertices 50000 --output baseline.json
+    python -m Benchmarks.bench_hot_paths --compare baseline.json
+
+The animation benchmarks run on a rig generated from the biped template (see fake_maya.build_rig_scene):
+
+    control lookup      the per-attribute listConnections walk control lookups used to do, building the control
+                        map, and repeated utils.get_all_controls calls on the cached map
+    pose save/load      ART_CreatePose of every control, and ART_LoadPose of the file in local space
+    pickwalk            SinglePickwalk down every fk chain, from the first control of each
+    weight export/import  riggingUtils.export_skin_weights and import_skin_weights of the skinned mesh
+    match over range    ART_MatchOverRangeUI.Match of both arms and legs over --frames frames. The limbs are
+                        already in FK mode, so this times the per-frame dispatch to switchMode, not the matching.
+    template load       the module loop of ART_RigCreatorUI.loadTemplate on an empty scene: module network nodes
+                        in dependency order, template values set on the joint movers and parent mover lookups. The
+                        settings UI is left out and the .ma joint mover imports are replaced by
+                        fake_maya.create_movers.
+
+With --compare, the run is checked against the --output of an earlier one, and the exit code is 1 if any benchmark
+makes more maya.cmds calls than it did.
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from Benchmarks import fake_maya
+
+SCENE = fake_maya.install()
+
+# the ART modules import maya, so they have to be imported after the fake modules are installed
+import maya.cmds as cmds
+import Utilities.pickwalk_manager as pickwalk_manager
+import Utilities.riggingUtils as riggingUtils
+import Utilities.utils as utils
+import Tools.Animation.ART_MatchOverRangeUI as ART_MatchOverRangeUI
+import Tools.Animation.ART_PoseLibrary as ART_PoseLibrary
+
+
+NAMESPACE = "biped"
+MATCH_MODULES = ("ART_Arm_Standard_Module", "ART_Arm_Standard_Module1", "ART_Leg_Standard_Module",
+                 "ART_Leg_Standard_Module1")
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# LEGACY IMPLEMENTATION (reference only)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def legacy_character_controls(character_node):
+    character_controls = []
+    modules = cmds.listConnections(character_node + ".rigModules")
+    if modules is not None:
+        for module in modules:
+            controls = cmds.listConnections(module + ".controls")
+            if controls is not None:
+                for control in controls:
+                    attrs = cmds.listAttr(control, ud=True)
+                    for attr in attrs:
+                        connections = cmds.listConnections(control + "." + attr, source=False)
+                        if connections is not None:
+                            character_controls.extend(connections)
+    return character_controls
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# HOT PATHS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def get_controls_repeated(character_node, repeats):
+    for i in range(repeats):
+        controls = utils.get_all_controls(False, character_node)
+    return controls
+
+
+def pickwalk_chains(character_node, steps):
+    chains = []
+    for module, groups in utils.get_control_map(character_node):
+        chains.extend(controls[0] for group, controls in groups if group == "fkControls")
+
+    cmds.select(chains)
+    for i in range(steps):
+        pickwalk_manager.SinglePickwalk("pickWalkDown")
+    return cmds.ls(sl=True)
+
+
+def load_template(data):
+    """
+    The module loop of ART_RigCreatorUI.loadTemplate, starting from a scene with the root module, as the rig creator
+    does.
+    """
+
+    _load_template_data_for_module("ART_Root_Module", data["ART_Root_Module"][0], data["ART_Root_Module"][1])
+
+    completed = []
+    to_do = copy.deepcopy(data)
+    to_do.pop("ART_Root_Module")
+    joint_index = utils.get_joint_index()
+
+    while len(to_do) > 0:
+        for each in data:
+            if each not in completed:
+                attr_data, mover_data = data.get(each)
+                if attr_data.get("parentModuleBone") in joint_index:
+                    _load_template_data_for_module(each, attr_data, mover_data)
+                    completed.append(each)
+                    to_do.pop(each, None)
+    return completed
+
+
+def _load_template_data_for_module(network_node, attr_data, mover_data):
+    # the network node, as buildNetwork and applyTemplate leave it
+    cmds.createNode("network", name=network_node)
+    cmds.addAttr(network_node, ln="parent", at="message")
+    for attr in sorted(attr_data):
+        value = attr_data[attr]
+        if isinstance(value, bool):
+            cmds.addAttr(network_node, ln=attr, at="bool")
+        elif isinstance(value, (int, float)):
+            cmds.addAttr(network_node, ln=attr, at="double")
+        else:
+            cmds.addAttr(network_node, ln=attr, dt="string")
+        if value is not None:
+            cmds.setAttr(network_node + "." + attr, value)
+
+    # the joint movers, with the positional data applied
+    fake_maya.create_movers(SCENE, mover_data)
+    for mover in mover_data:
+        value = mover_data.get(mover)
+        try:
+            cmds.setAttr(mover, value)
+        except Exception:
+            pass
+
+    # the parent mover lookup
+    parent = attr_data.get("parentModuleBone")
+    if parent is not None and parent != "root":
+        network_nodes = utils.returnRigModules()
+        mover = utils.findMoverNodeFromJointName(network_nodes, parent, False, True)
+        if mover is None:
+            mover = utils.findMoverNodeFromJointName(network_nodes, parent, True, False)
+        return mover
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# BENCHMARK
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _measure(results, name, function, *args):
+    SCENE.reset_calls()
+    start = time.time()
+    result = function(*args)
+    seconds = time.time() - start
+
+    calls = SCENE.total_calls()
+    commands = sorted(SCENE.calls.items(), key=lambda item: (-item[1], item[0]))
+    results.append({"name": name, "seconds": seconds, "calls": calls, "commands": dict(commands)})
+    top = ", ".join("{0} {1}".format(command, count) for command, count in commands[:3])
+    print("{0:<24} {1:>10.3f} {2:>10}   {3}".format(name, seconds, calls, top))
+    return result
+
+
+def run(frames=500, vertices=20000, lookups=100, pickwalks=20, template_path=fake_maya.BIPED_TEMPLATE):
+    """
+    Runs the benchmarks and prints one line per hot path.
+
+    :param frames: frame range length for match over range.
+    :param vertices: vertex count of the skinned mesh.
+    :param lookups: number of utils.get_all_controls calls timed on the cached control map.
+    :param pickwalks: number of pickwalk steps.
+    :param template_path: joint mover template the scenes are generated from.
+    :return: list of result dictionaries (name, seconds, calls and calls by command).
+    """
+
+    data = fake_maya.load_template(template_path)
+    character = fake_maya.build_rig_scene(SCENE, data, NAMESPACE, vertices)
+    geometry = NAMESPACE + ":body_geo"
+    temp_dir = tempfile.mkdtemp()
+    results = []
+    print("{0:<24} {1:>10} {2:>10}   {3}".format("hot path", "time (s)", "cmds", "most called"))
+
+    try:
+        # control lookup
+        legacy = _measure(results, "controls (legacy)", legacy_character_controls, character)
+        control_map = _measure(results, "control map build", utils.get_control_map, character)
+        controls = _measure(results, "controls x{0}".format(lookups), get_controls_repeated, character, lookups)
+        assert sorted(controls) == sorted(legacy)
+        assert len(control_map) == len(data)
+
+        # pose save/load
+        pose = _measure(results, "pose save", ART_PoseLibrary.ART_CreatePose, "bench", temp_dir, controls, None,
+                        "none")
+        assert pose.status
+        _measure(results, "pose load", ART_PoseLibrary.ART_LoadPose, pose.pose_path + ".v2pose", "All Controls",
+                 "Local Space", NAMESPACE)
+
+        # pickwalk
+        _measure(results, "pickwalk x{0}".format(pickwalks), pickwalk_chains, character, pickwalks)
+
+        # weight export/import
+        weight_file = os.path.join(temp_dir, "body_geo.weights")
+        _measure(results, "weight export", riggingUtils.export_skin_weights, weight_file, geometry)
+        _measure(results, "weight import", riggingUtils.import_skin_weights, weight_file, geometry)
+
+        # match over range
+        module_match_info = [[NAMESPACE + ":" + module, "Match FK to IK"] for module in MATCH_MODULES]
+        _measure(results, "match {0} frames".format(frames), ART_MatchOverRangeUI.Match, NAMESPACE,
+                 module_match_info, 1, frames)
+
+        # template load
+        SCENE.new()
+        completed = _measure(results, "template load", load_template, data)
+        assert len(completed) == len(data) - 1
+    finally:
+        shutil.rmtree(temp_dir)
+        _remove_callbacks()
+
+    return results
+
+
+def _remove_callbacks():
+    # done here rather than in the __del__ methods, which run after the fake modules are gone
+    for registry in (utils.get_network_registry(), utils.get_joint_index(), utils.get_module_pool(),
+                     riggingUtils.get_skin_cluster_index()):
+        registry.remove_callbacks()
+
+
+def compare(results, baseline):
+    """
+    Prints the benchmarks that make more maya.cmds calls than in the baseline.
+
+    :param results: results of run.
+    :param baseline: results of an earlier run.
+    :return: whether no benchmark regressed.
+    """
+
+    previous = dict((result["name"], result) for result in baseline)
+    passed = True
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        if result["calls"] > before["calls"]:
+            passed = False
+            print("REGRESSION {0}: {1} cmds calls, {2} in the baseline ({3:.3f}s, {4:.3f}s in the "
+                  "baseline)".format(result["name"], result["calls"], before["calls"], result["seconds"],
+                                     before["seconds"]))
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--vertices", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=100)
+    parser.add_argument("--pickwalks", type=int, default=20)
+    parser.add_argument("--template", default=fake_maya.BIPED_TEMPLATE)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file written by an earlier run with --output")
+    arguments = parser.parse_args()
+
+    run_results = run(arguments.frames, arguments.vertices, arguments.lookups, arguments.pickwalks,
+                      arguments.template)
+    if arguments.output:
+        with open(arguments.output, "w") as fobj:
+            json.dump(run_results, fobj, indent=2, sort_keys=True)
+    if arguments.compare:
+        with open(arguments.compare) as fobj:
+            if not compare(run_results, json.load(fobj)):
+                sys.exit(1)
@@ -0,0 +1,162 @@
+"""
+Benchmarks mathUtils.KDTree against the recursive, object-per-node KDTree it replaced.
+
+Run from mayapy (or Maya's script editor) with Core/Scripts on the path:
+
+    mayapy -m Benchmarks.bench_kdtree
+    mayapy -m Benchmarks.bench_kdtree --sizes 10000 100000 --queries 2000
+
+For every size it times the build, single nearest-neighbour queries and query_batch over the same query points,
+and checks both implementations find points at the same distance. The legacy tree is skipped above --legacy-limit
+points, since it needs minutes to build a million points.
+"""
+
+import argparse
+import random
+import time
+
+import Utilities.mathUtils as mathUtils
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# LEGACY IMPLEMENTATION (reference only)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class LegacyKDTreeNode(object):
+    def __init__(self, point, left, right):
+        self.point = point
+        self.left = left
+        self.right = right
+
+    def is_leaf(self):
+        return self.left is None and self.right is None
+
+
+class LegacyKDTreeNeighbours(object):
+    def __init__(self, query_point, t):
+        self.query_point = query_point
+        self.t = t
+        self.largest_distance = 0
+        self.current_best = []
+
+    def calculate_largest(self):
+        if self.t >= len(self.current_best):
+            self.largest_distance = self.current_best[-1][1]
+        else:
+            self.largest_distance = self.current_best[self.t - 1][1]
+
+    def add(self, point):
+        sd = mathUtils.square_distance(point, self.query_point)
+        for i, e in enumerate(self.current_best):
+            if i == self.t:
+                return
+            if e[1] > sd:
+                self.current_best.insert(i, [point, sd])
+                self.calculate_largest()
+                return
+        self.current_best.append([point, sd])
+        self.calculate_largest()
+
+    def get_best(self):
+        return [element[0] for element in self.current_best[:self.t]]
+
+
+class LegacyKDTree(object):
+    def __init__(self, data):
+        def build_kdtree(point_list, depth):
+            if not point_list:
+                return None
+            axis = depth % len(point_list[0])
+            point_list.sort(key=lambda point: point[axis])
+            median = len(point_list) // 2
+            return LegacyKDTreeNode(point=point_list[median],
+                                    left=build_kdtree(point_list[0:median], depth + 1),
+                                    right=build_kdtree(point_list[median + 1:], depth + 1))
+
+        self.root_node = build_kdtree(list(data), depth=0)
+
+    def query(self, query_point, t=1):
+        def nn_search(node, depth, best_neighbours):
+            if node is None:
+                return
+            if node.is_leaf():
+                best_neighbours.add(node.point)
+                return
+            axis = depth % len(query_point)
+            if query_point[axis] < node.point[axis]:
+                near_subtree, far_subtree = node.left, node.right
+            else:
+                near_subtree, far_subtree = node.right, node.left
+            nn_search(near_subtree, depth + 1, best_neighbours)
+            best_neighbours.add(node.point)
+            if (node.point[axis] - query_point[axis]) ** 2 < best_neighbours.largest_distance:
+                nn_search(far_subtree, depth + 1, best_neighbours)
+
+        if self.root_node is None:
+            return []
+        neighbours = LegacyKDTreeNeighbours(query_point, t)
+        nn_search(self.root_node, 0, neighbours)
+        return neighbours.get_best()
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# BENCHMARK
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def run(sizes=(10000, 100000, 1000000), queries=1000, legacy_limit=100000, seed=0):
+    """
+    Runs the benchmark and prints one line per implementation and size.
+
+    :param sizes: point counts to benchmark.
+    :param queries: number of query points per size.
+    :param legacy_limit: largest size the legacy tree is built for.
+    :param seed: random seed, so runs are comparable.
+    :return: list of result dictionaries.
+    """
+
+    random.seed(seed)
+    results = []
+    print("{0:>10} {1:>8} {2:>10} {3:>12} {4:>12}".format("points", "tree", "build (s)", "query (s)", "batch (s)"))
+
+    for size in sizes:
+        points = [(random.uniform(-100, 100), random.uniform(0, 180), random.uniform(-50, 50)) for i in range(size)]
+        query_points = [(random.uniform(-100, 100), random.uniform(0, 180), random.uniform(-50, 50))
+                        for i in range(queries)]
+
+        tree, build_time = _timed(mathUtils.KDTree, points)
+        nearest, query_time = _timed(lambda: [tree.query(point, k=1)[0] for point in query_points])
+        batch, batch_time = _timed(tree.query_batch, query_points, 1)
+        assert [found[0] for found in batch] == nearest
+        results.append({"tree": "KDTree", "points": size, "build": build_time, "query": query_time,
+                        "batch": batch_time})
+        print("{0:>10} {1:>8} {2:>10.3f} {3:>12.3f} {4:>12.3f}".format(size, "array", build_time, query_time,
+                                                                       batch_time))
+
+        if size > legacy_limit:
+            print("{0:>10} {1:>8} {2:>10}".format(size, "legacy", "skipped"))
+            continue
+
+        legacy, build_time = _timed(LegacyKDTree, points)
+        legacy_nearest, query_time = _timed(lambda: [legacy.query(point, t=1)[0] for point in query_points])
+        for point, index, legacy_point in zip(query_points, nearest, legacy_nearest):
+            assert mathUtils.square_distance(points[index], point) == \
+                mathUtils.square_distance(legacy_point, point)
+        results.append({"tree": "legacy", "points": size, "build": build_time, "query": query_time})
+        print("{0:>10} {1:>8} {2:>10.3f} {3:>12.3f} {4:>12}".format(size, "legacy", build_time, query_time, "-"))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--legacy-limit", type=int, default=100000)
+    arguments = parser.parse_args()
+    run(arguments.sizes, arguments.queries, arguments.legacy_limit)
@@ -0,0 +1,1101 @@
+"""
+In-memory stand-in for the parts of Maya the ART tools use, so their hot paths can be timed without a Maya session.
+
+install() puts fake maya (cmds, mel, OpenMaya, OpenMayaAnim, OpenMayaUI, api.OpenMaya, api.OpenMayaAnim), Qt and
+shiboken modules in sys.modules, so it has to run before any ART module is imported. The fake modules all work on one
+Scene, which holds:
+
+    * nodes with a type, attributes and, for DAG nodes, a parent
+    * attribute values, keyframes and connections
+    * skinCluster influences, weights and blend weights, stored dense and vertex-major
+
+Every maya.cmds call is counted in Scene.calls. Commands outside the supported subset raise AttributeError instead of
+returning made-up values, so a benchmark stops where the stand-in ends. Qt, OpenMayaUI and the API 1.0 modules are
+permissive stubs: any attribute exists and calling it does nothing.
+
+build_rig_scene() fills the scene with a built, referenced rig generated from a joint mover template, and
+create_movers() adds the joint movers of a template module, as importing its joint mover file would.
+"""
+
+import json
+import os
+import random
+import sys
+import types
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+
+SCRIPTS_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS_PATH = os.path.dirname(os.path.dirname(SCRIPTS_PATH))
+BIPED_TEMPLATE = os.path.join(TOOLS_PATH, "Core", "JointMover", "templates", "biped.template")
+
+# attributes every transform and joint has
+TRANSFORM_ATTRS = ("translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY",
+                   "scaleZ", "visibility")
+COMPOUND_ATTRS = {"translate": ("translateX", "translateY", "translateZ"),
+                  "rotate": ("rotateX", "rotateY", "rotateZ"),
+                  "scale": ("scaleX", "scaleY", "scaleZ")}
+SHORT_NAMES = {"tx": "translateX", "ty": "translateY", "tz": "translateZ", "rx": "rotateX", "ry": "rotateY",
+               "rz": "rotateZ", "sx": "scaleX", "sy": "scaleY", "sz": "scaleZ", "v": "visibility",
+               "t": "translate", "r": "rotate", "s": "scale"}
+IDENTITY = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+DAG_TYPES = ("transform", "joint", "mesh")
+
+# API function set types each node type is compatible with
+NODE_FNS = {"skinCluster": ("skinClusterFilter", "geometryFilter"),
+            "mesh": ("mesh", "shape"),
+            "joint": ("joint", "transform"),
+            "transform": ("transform",)}
+
+# skinCluster attributes (see riggingUtils.ATTRIBUTES)
+SKIN_ATTRS = {"skinningMethod": 0, "normalizeWeights": 1, "dropoffRate": 4.0, "maintainMaxInfluences": False,
+              "maxInfluences": 4, "bindMethod": 0, "useComponents": False, "weightDistribution": 0,
+              "heatmapFalloff": 0.68}
+
+# the single scene the fake modules work on, see install
+SCENE = None
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# SCENE
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class Attribute(object):
+    __slots__ = ("name", "type", "value", "keyable", "user", "locked", "keys")
+
+    def __init__(self, name, attr_type, value=None, keyable=False, user=False):
+        self.name = name
+        self.type = attr_type
+        self.value = value
+        self.keyable = keyable
+        self.user = user
+        self.locked = False
+        self.keys = None
+
+
+class Node(object):
+    """
+    A scene node. It also serves as the MObject of the fake API.
+    """
+
+    def __init__(self, name, node_type):
+        self.name = name
+        self.type = node_type
+        self.attrs = {}
+        self.order = []
+        self.parent = None
+        self.children = []
+        self.alive = True
+        self.locked = False
+        self.data = {}
+
+    def add_attr(self, name, attr_type, value=None, keyable=False, user=False):
+        attr = self.attrs[name] = Attribute(name, attr_type, value, keyable, user)
+        self.order.append(name)
+        return attr
+
+    def hasFn(self, fn_type):
+        return fn_type in NODE_FNS.get(self.type, (self.type,))
+
+    def isNull(self):
+        return False
+
+    def apiType(self):
+        return self.type
+
+
+class Scene(object):
+    """
+    Nodes, connections, selection, time and callbacks of the fake scene.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.callbacks = {}
+        self.next_callback = 1
+        self.new()
+
+    def new(self):
+        self.nodes = {}
+        self.outgoing = {}
+        self.incoming = {}
+        self.selection = []
+        self.time = 1.0
+        self._fire("scene", "kAfterNew")
+
+    def reset_calls(self):
+        self.calls = {}
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    # nodes
+    def node(self, name):
+        node = self.nodes.get(name.rpartition("|")[2])
+        if node is None:
+            raise ValueError("No object matches name: " + name)
+        return node
+
+    def create(self, node_type, name, parent=None):
+        if name in self.nodes:
+            index = 1
+            while name + str(index) in self.nodes:
+                index += 1
+            name += str(index)
+        node = self.nodes[name] = Node(name, node_type)
+        node.add_attr("message", "message")
+        if node_type in ("transform", "joint"):
+            for attr in TRANSFORM_ATTRS:
+                node.add_attr(attr, "bool" if attr == "visibility" else "double",
+                              1.0 if attr.startswith("scale") or attr == "visibility" else 0.0, keyable=True)
+            node.add_attr("worldMatrix", "matrix", list(IDENTITY))
+        if parent is not None:
+            self.reparent(node, self.node(parent))
+        self._fire("added", node)
+        return node
+
+    def delete(self, node):
+        for child in list(node.children):
+            self.delete(child)
+        for key in [key for key in self.outgoing if key[0] is node]:
+            for destination in self.outgoing.pop(key):
+                self.incoming.pop(destination, None)
+        for key in [key for key in self.incoming if key[0] is node]:
+            source = self.incoming.pop(key)
+            self.outgoing[source].remove(key)
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        if node in self.selection:
+            self.selection.remove(node)
+        del self.nodes[node.name]
+        node.alive = False
+        self._fire("removed", node)
+
+    def rename(self, node, name):
+        previous = node.name
+        del self.nodes[previous]
+        node.name = name
+        self.nodes[name] = node
+        self._fire("name", node, previous)
+
+    def reparent(self, node, parent):
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.parent = parent
+        if parent is not None:
+            parent.children.append(node)
+
+    def path(self, node):
+        names = []
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "|" + "|".join(reversed(names))
+
+    # plugs
+    def plug(self, plug):
+        node_name, separator, attr_name = plug.partition(".")
+        node = self.node(node_name)
+        attr_name = SHORT_NAMES.get(attr_name, attr_name)
+        if attr_name not in node.attrs and attr_name not in COMPOUND_ATTRS:
+            raise ValueError("No object matches name: " + plug)
+        return node, attr_name
+
+    def connect(self, source, destination):
+        self.disconnect_destination(destination)
+        self.outgoing.setdefault(source, []).append(destination)
+        self.incoming[destination] = source
+        self._fire("connection", source, destination)
+        for node, attr in (source, destination):
+            self._fire("attribute", node, attr, "kConnectionMade")
+
+    def disconnect_destination(self, destination):
+        source = self.incoming.pop(destination, None)
+        if source is not None:
+            self.outgoing[source].remove(destination)
+
+    def connected(self, node, attr=None, source=True, destination=True):
+        """
+        :return: list of ((node, attr), (other node, other attr)) pairs, in attribute order.
+        """
+
+        pairs = []
+        for name in ([attr] if attr else node.order):
+            key = (node, name)
+            if source and key in self.incoming:
+                pairs.append((key, self.incoming[key]))
+            if destination and key in self.outgoing:
+                pairs.extend((key, other) for other in self.outgoing[key])
+        return pairs
+
+    # callbacks
+    def add_callback(self, kind, function, *filters):
+        callback = self.next_callback
+        self.next_callback += 1
+        self.callbacks[callback] = (kind, function, filters)
+        return callback
+
+    def _fire(self, kind, *args):
+        for callback_kind, function, filters in list(self.callbacks.values()):
+            if callback_kind != kind:
+                continue
+            if kind in ("added", "removed"):
+                if filters[0] in (None, args[0].type):
+                    function(args[0], None)
+            elif kind == "scene":
+                if filters[0] == args[0]:
+                    function(None)
+            elif kind == "connection":
+                function(Plug(*args[0]), Plug(*args[1]), True, None)
+            elif kind == "attribute":
+                node, attr, message = args
+                if filters[0] is node:
+                    function(getattr(MNodeMessage, message), Plug(node, attr), Plug(node, attr), filters[1])
+            elif kind == "name":
+                node, previous = args
+                if filters[0] is node:
+                    function(node, previous, filters[1])
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# MAYA.CMDS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _flags(kwargs, *names):
+    for name in names:
+        if name in kwargs:
+            return kwargs[name]
+
+
+def _names(args):
+    names = []
+    for arg in args:
+        if isinstance(arg, basestring):
+            names.append(arg)
+        elif arg is not None:
+            names.extend(arg)
+    return names
+
+
+def _ls(*args, **kwargs):
+    scene = SCENE
+    if _flags(kwargs, "sl", "selection"):
+        nodes = list(scene.selection)
+    elif args:
+        nodes = []
+        for name in _names(args):
+            node = scene.nodes.get(name.partition(".")[0].rpartition("|")[2])
+            if node is not None and node not in nodes:
+                nodes.append(node)
+    else:
+        nodes = list(scene.nodes.values())
+
+    node_type = _flags(kwargs, "type", "typ")
+    if node_type is not None:
+        types_ = [node_type] if isinstance(node_type, basestring) else node_type
+        nodes = [node for node in nodes if node.type in types_]
+    if _flags(kwargs, "long", "l"):
+        return [scene.path(node) if node.type in DAG_TYPES else node.name for node in nodes]
+    return [node.name for node in nodes]
+
+
+def _objExists(name):
+    try:
+        SCENE.plug(name) if "." in name else SCENE.node(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _createNode(node_type, name=None, n=None, parent=None, p=None, **kwargs):
+    return SCENE.create(node_type, name or n or node_type + "1", parent or p).name
+
+
+def _group(*args, **kwargs):
+    node = SCENE.create("transform", _flags(kwargs, "name", "n") or "group1", _flags(kwargs, "parent", "p"))
+    for child in _names(args):
+        SCENE.reparent(SCENE.node(child), node)
+    return node.name
+
+
+def _joint(*args, **kwargs):
+    parent = SCENE.selection[0].name if SCENE.selection else None
+    node = SCENE.create("joint", _flags(kwargs, "name", "n") or "joint1", parent)
+    SCENE.selection = [node]
+    return node.name
+
+
+def _delete(*args, **kwargs):
+    for name in _names(args):
+        if SCENE.nodes.get(name.rpartition("|")[2]) is not None:
+            SCENE.delete(SCENE.node(name))
+
+
+def _rename(old, new):
+    SCENE.rename(SCENE.node(old), new)
+    return new
+
+
+def _parent(*args, **kwargs):
+    names = _names(args)
+    if _flags(kwargs, "world", "w"):
+        parent = None
+    else:
+        parent = SCENE.node(names.pop())
+    for name in names:
+        SCENE.reparent(SCENE.node(name), parent)
+    return names
+
+
+def _select(*args, **kwargs):
+    if _flags(kwargs, "clear", "cl"):
+        SCENE.selection = []
+        return
+    nodes = [SCENE.node(name) for name in _names(args)]
+    if _flags(kwargs, "add", "af"):
+        SCENE.selection.extend(node for node in nodes if node not in SCENE.selection)
+    elif _flags(kwargs, "deselect", "d"):
+        SCENE.selection = [node for node in SCENE.selection if node not in nodes]
+    else:
+        SCENE.selection = nodes
+
+
+def _addAttr(*args, **kwargs):
+    node = SCENE.node(_names(args)[0])
+    name = _flags(kwargs, "longName", "ln", "shortName", "sn")
+    attr_type = _flags(kwargs, "attributeType", "at", "dataType", "dt") or "double"
+    default = _flags(kwargs, "defaultValue", "dv")
+    if default is None:
+        default = {"string": None, "message": None, "bool": False}.get(attr_type, 0.0)
+    node.add_attr(name, attr_type, default, bool(_flags(kwargs, "keyable", "k")), True)
+    SCENE._fire("attribute", node, name, "kAttributeAdded")
+
+
+def _setAttr(plug, *values, **kwargs):
+    node, attr_name = SCENE.plug(plug)
+    if attr_name in COMPOUND_ATTRS:
+        for child, value in zip(COMPOUND_ATTRS[attr_name], values):
+            _setAttr(node.name + "." + child, value)
+        return
+
+    attr = node.attrs[attr_name]
+    lock = _flags(kwargs, "lock", "l")
+    keyable = _flags(kwargs, "keyable", "k")
+    if keyable is not None:
+        attr.keyable = keyable
+    if values:
+        if attr.locked and not lock is False:
+            raise RuntimeError("The attribute '{0}' is locked or connected and cannot be modified.".format(plug))
+        attr.value = values[0] if len(values) == 1 else list(values)
+        if attr.keys is not None:
+            attr.keys[SCENE.time] = attr.value
+        SCENE._fire("attribute", node, attr_name, "kAttributeSet")
+    if lock is not None:
+        attr.locked = lock
+
+
+def _getAttr(plug, **kwargs):
+    node, attr_name = SCENE.plug(plug)
+    if attr_name in COMPOUND_ATTRS:
+        return [tuple(node.attrs[child].value for child in COMPOUND_ATTRS[attr_name])]
+
+    attr = node.attrs[attr_name]
+    if _flags(kwargs, "type"):
+        return attr.type
+    if _flags(kwargs, "lock", "l"):
+        return attr.locked
+    if _flags(kwargs, "keyable", "k"):
+        return attr.keyable
+    if attr.type == "matrix":
+        return list(attr.value)
+    return attr.value
+
+
+def _listAttr(*args, **kwargs):
+    names = _names(args)
+    if not names:
+        return None
+    node_name, separator, attr_name = names[0].partition(".")
+    node = SCENE.node(node_name)
+    attrs = [node.attrs[name] for name in node.order]
+    if _flags(kwargs, "userDefined", "ud"):
+        attrs = [attr for attr in attrs if attr.user]
+    if _flags(kwargs, "keyable", "k"):
+        attrs = [attr for attr in attrs if attr.keyable]
+    string = _flags(kwargs, "string", "st")
+    if string is not None:
+        attrs = [attr for attr in attrs if attr.name == string]
+    return [attr.name for attr in attrs] or None
+
+
+def _listConnections(*args, **kwargs):
+    source = _flags(kwargs, "source", "s")
+    destination = _flags(kwargs, "destination", "d")
+    connections = _flags(kwargs, "connections", "c")
+    plugs = _flags(kwargs, "plugs", "p")
+    node_type = _flags(kwargs, "type", "t")
+
+    result = []
+    for name in _names(args):
+        if "." in name:
+            node, attr = SCENE.plug(name)
+        else:
+            node, attr = SCENE.node(name), None
+        for (this, this_attr), (other, other_attr) in SCENE.connected(node, attr, source is not False,
+                                                                      destination is not False):
+            if node_type is not None and other.type != node_type:
+                continue
+            if connections:
+                result.append(this.name + "." + this_attr)
+            result.append(other.name + "." + other_attr if plugs else other.name)
+    return result or None
+
+
+def _connectAttr(source, destination, **kwargs):
+    SCENE.connect(SCENE.plug(source), SCENE.plug(destination))
+
+
+def _disconnectAttr(source, destination, **kwargs):
+    SCENE.disconnect_destination(SCENE.plug(destination))
+
+
+def _listRelatives(*args, **kwargs):
+    full = _flags(kwargs, "fullPath", "f")
+    node_type = _flags(kwargs, "type", "typ")
+    result = []
+    for name in _names(args):
+        node = SCENE.node(name)
+        if _flags(kwargs, "parent", "p"):
+            found = [node.parent] if node.parent is not None else []
+        elif _flags(kwargs, "allDescendents", "ad"):
+            found = []
+            stack = list(node.children)
+            while stack:
+                child = stack.pop()
+                found.append(child)
+                stack.extend(child.children)
+        else:
+            found = list(node.children)
+            if _flags(kwargs, "shapes", "s"):
+                found = [child for child in found if child.type == "mesh"]
+        if node_type is not None:
+            found = [child for child in found if child.type == node_type]
+        result.extend(SCENE.path(child) if full else child.name for child in found)
+    return result or None
+
+
+def _setKeyframe(*args, **kwargs):
+    for name in _names(args):
+        node, attr_name = SCENE.plug(name) if "." in name else (SCENE.node(name), None)
+        names = [attr_name] if attr_name else [attr for attr in node.order if node.attrs[attr].keyable]
+        for attr_name in names:
+            for child in COMPOUND_ATTRS.get(attr_name, (attr_name,)):
+                attr = node.attrs[child]
+                if attr.keys is None:
+                    attr.keys = {}
+                attr.keys[SCENE.time] = attr.value
+    return 1
+
+
+def _currentTime(*args, **kwargs):
+    if _flags(kwargs, "query", "q"):
+        return SCENE.time
+    SCENE.time = float(args[0])
+    # animated attributes take the value of their key on the new frame, or keep their value between keys
+    for node in SCENE.nodes.values():
+        for attr in node.attrs.values():
+            if attr.keys and SCENE.time in attr.keys:
+                attr.value = attr.keys[SCENE.time]
+    return SCENE.time
+
+
+def _lockNode(*args, **kwargs):
+    nodes = [SCENE.node(name) for name in _names(args)]
+    if _flags(kwargs, "query", "q"):
+        return [node.locked for node in nodes]
+    for node in nodes:
+        node.locked = _flags(kwargs, "lock", "l") is not False
+
+
+def _warning(*args, **kwargs):
+    return None
+
+
+def _evaluationManager(*args, **kwargs):
+    if _flags(kwargs, "query", "q"):
+        return ["parallel"]
+
+
+def _upAxis(*args, **kwargs):
+    return "z"
+
+
+def _deformer(name, **kwargs):
+    return [SCENE.node(name).data["geometry"].name]
+
+
+def _polyEvaluate(*args, **kwargs):
+    node = SCENE.node(_names(args)[0])
+    if node.type != "mesh":
+        node = [child for child in node.children if child.type == "mesh"][0]
+    return node.data["vertices"]
+
+
+def _internalVar(**kwargs):
+    import tempfile
+    return tempfile.gettempdir() + "/"
+
+
+COMMANDS = {"ls": _ls, "objExists": _objExists, "createNode": _createNode, "group": _group, "joint": _joint,
+            "delete": _delete, "rename": _rename, "parent": _parent, "select": _select, "addAttr": _addAttr,
+            "setAttr": _setAttr, "getAttr": _getAttr, "listAttr": _listAttr, "listConnections": _listConnections,
+            "connectAttr": _connectAttr, "disconnectAttr": _disconnectAttr, "listRelatives": _listRelatives,
+            "setKeyframe": _setKeyframe, "currentTime": _currentTime, "lockNode": _lockNode, "warning": _warning,
+            "evaluationManager": _evaluationManager, "upAxis": _upAxis, "deformer": _deformer,
+            "polyEvaluate": _polyEvaluate, "internalVar": _internalVar}
+
+
+class CommandModule(types.ModuleType):
+    """
+    maya.cmds: the COMMANDS, each counted in Scene.calls when called.
+    """
+
+    def __init__(self, name):
+        types.ModuleType.__init__(self, name)
+        for command, function in COMMANDS.items():
+            setattr(self, command, self._counted(command, function))
+
+    @staticmethod
+    def _counted(command, function):
+        def call(*args, **kwargs):
+            SCENE.calls[command] = SCENE.calls.get(command, 0) + 1
+            return function(*args, **kwargs)
+        call.__name__ = command
+        return call
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        raise AttributeError("maya.cmds." + name + " is not supported by the fake Maya scene.")
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# MAYA.API.OPENMAYA / OPENMAYAANIM
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class MDoubleArray(list):
+    def __init__(self, values=(), fill=None):
+        if fill is not None:
+            values = [fill] * values
+        list.__init__(self, values)
+
+
+class MIntArray(MDoubleArray):
+    pass
+
+
+class MFn(object):
+    kSkinClusterFilter = "skinClusterFilter"
+    kGeometryFilt = "geometryFilter"
+    kShape = "shape"
+    kMesh = "mesh"
+    kTransform = "transform"
+    kJoint = "joint"
+    kMeshVertComponent = "meshVertComponent"
+
+
+class MSpace(object):
+    kObject = 2
+    kWorld = 4
+
+
+class Plug(object):
+    def __init__(self, node, attr):
+        self._node = node
+        self._attr = attr
+
+    def node(self):
+        return self._node
+
+    def name(self):
+        return self._node.name + "." + self._attr
+
+    def partialName(self, *args, **kwargs):
+        return self._attr
+
+    def attribute(self):
+        return self
+
+    def asString(self):
+        value = self._node.attrs[self._attr].value
+        return "" if value is None else str(value)
+
+    def asDouble(self):
+        return float(self._node.attrs[self._attr].value)
+
+    def asInt(self):
+        return int(self._node.attrs[self._attr].value)
+
+    def asBool(self):
+        return bool(self._node.attrs[self._attr].value)
+
+
+class MFnAttribute(object):
+    def __init__(self, attribute):
+        self.name = attribute._attr
+
+
+class MObjectHandle(object):
+    def __init__(self, node):
+        self._node = node
+
+    def isValid(self):
+        return self._node.alive
+
+    def isAlive(self):
+        return self._node.alive
+
+    def object(self):
+        return self._node
+
+    def hashCode(self):
+        return id(self._node)
+
+
+class MDagPath(object):
+    def __init__(self, node=None):
+        self._node = node
+
+    def node(self):
+        return self._node
+
+    def partialPathName(self):
+        return self._node.name
+
+    def fullPathName(self):
+        return SCENE.path(self._node)
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._nodes = []
+
+    def add(self, name):
+        try:
+            self._nodes.append(SCENE.node(name.partition(".")[0]))
+        except ValueError:
+            raise RuntimeError("(kInvalidParameter): Object does not exist")
+        return self
+
+    def length(self):
+        return len(self._nodes)
+
+    def getDependNode(self, index):
+        return self._nodes[index]
+
+    def getDagPath(self, index):
+        return MDagPath(self._nodes[index])
+
+
+class MFnDependencyNode(object):
+    def __init__(self, node):
+        self._node = node
+
+    def name(self):
+        return self._node.name
+
+    def typeName(self):
+        return self._node.type
+
+    def hasAttribute(self, name):
+        return name in self._node.attrs
+
+    def findPlug(self, name, want_networked=False):
+        if name not in self._node.attrs:
+            raise RuntimeError("(kInvalidParameter): Object does not exist")
+        return Plug(self._node, name)
+
+
+class MItDependencyNodes(object):
+    def __init__(self, fn_type=None):
+        self._nodes = [node for node in SCENE.nodes.values() if fn_type is None or node.hasFn(fn_type)]
+        self._index = 0
+
+    def isDone(self):
+        return self._index >= len(self._nodes)
+
+    def thisNode(self):
+        return self._nodes[self._index]
+
+    def next(self):
+        self._index += 1
+
+
+class MFnSingleIndexedComponent(object):
+    def create(self, component_type):
+        self._count = 0
+        return self
+
+    def setCompleteData(self, count):
+        self._count = count
+
+
+class MItGeometry(object):
+    def __init__(self, dag_path):
+        self._count = dag_path.node().data["vertices"]
+
+    def count(self):
+        return self._count
+
+
+class MFnSkinCluster(object):
+    def __init__(self, node):
+        self._node = node
+        self._data = node.data
+
+    def getOutputGeometry(self):
+        return [self._data["geometry"]]
+
+    def getPathAtIndex(self, index):
+        return MDagPath(self._data["geometry"])
+
+    def influenceObjects(self):
+        return [MDagPath(node) for node in self._data["influences"]]
+
+    def getWeights(self, dag_path, components, *args):
+        return MDoubleArray(self._data["weights"]), len(self._data["influences"])
+
+    def setWeights(self, dag_path, components, influences, weights, normalize=True, return_old=False):
+        old = MDoubleArray(self._data["weights"]) if return_old else None
+        count = len(self._data["influences"])
+        stored = self._data["weights"]
+        columns = list(influences)
+        width = len(columns)
+        for vertex in range(len(stored) // count):
+            base = vertex * count
+            source = vertex * width
+            for offset, column in enumerate(columns):
+                stored[base + column] = weights[source + offset]
+        return old
+
+    def getBlendWeights(self, dag_path, components):
+        return MDoubleArray(self._data["blendWeights"])
+
+    def setBlendWeights(self, dag_path, components, weights):
+        self._data["blendWeights"] = list(weights)
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallbacks(callbacks):
+        for callback in callbacks:
+            SCENE.callbacks.pop(callback, None)
+
+    @staticmethod
+    def removeCallback(callback):
+        SCENE.callbacks.pop(callback, None)
+
+
+class MDGMessage(MMessage):
+    @staticmethod
+    def addNodeAddedCallback(function, node_type="dependNode", client_data=None):
+        return SCENE.add_callback("added", function, None if node_type == "dependNode" else node_type)
+
+    @staticmethod
+    def addNodeRemovedCallback(function, node_type="dependNode", client_data=None):
+        return SCENE.add_callback("removed", function, None if node_type == "dependNode" else node_type)
+
+    @staticmethod
+    def addConnectionCallback(function, client_data=None):
+        return SCENE.add_callback("connection", function)
+
+
+class MNodeMessage(MMessage):
+    kConnectionMade = 0x01
+    kAttributeSet = 0x08
+    kAttributeAdded = 0x40
+    kAttributeRemoved = 0x80
+
+    @staticmethod
+    def addAttributeChangedCallback(node, function, client_data=None):
+        return SCENE.add_callback("attribute", function, node, client_data)
+
+    @staticmethod
+    def addNameChangedCallback(node, function, client_data=None):
+        return SCENE.add_callback("name", function, node, client_data)
+
+
+class MSceneMessage(MMessage):
+    kAfterNew = "kAfterNew"
+    kAfterOpen = "kAfterOpen"
+    kAfterImport = "kAfterImport"
+    kAfterCreateReference = "kAfterCreateReference"
+    kAfterRemoveReference = "kAfterRemoveReference"
+    kAfterLoadReference = "kAfterLoadReference"
+    kAfterUnloadReference = "kAfterUnloadReference"
+
+    @staticmethod
+    def addCallback(message, function, client_data=None):
+        return SCENE.add_callback("scene", function, message)
+
+
+API_CLASSES = (MDoubleArray, MIntArray, MFn, MSpace, MFnAttribute, MObjectHandle, MDagPath, MSelectionList,
+               MFnDependencyNode, MItDependencyNodes, MFnSingleIndexedComponent, MItGeometry, MMessage, MDGMessage,
+               MNodeMessage, MSceneMessage)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# STUBS (Qt, OpenMayaUI, API 1.0, mel)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class _StubType(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub()
+
+
+def _stub_getattr(self, name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return Stub()
+
+
+# any attribute exists, calling it does nothing; classes can be subclassed
+Stub = _StubType("Stub", (object,), {"__init__": lambda self, *args, **kwargs: None,
+                                      "__getattr__": _stub_getattr,
+                                      "__call__": lambda self, *args, **kwargs: Stub(),
+                                      "__iter__": lambda self: iter(()),
+                                      "__len__": lambda self: 0})
+
+
+class StubModule(types.ModuleType):
+    """
+    A module whose every attribute is a Stub class.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = _StubType(name, (Stub,), {})
+        setattr(self, name, value)
+        return value
+
+
+class QSettings(Stub):
+    """
+    QtCore.QSettings, answering with the paths of this checkout.
+    """
+
+    values = {"toolsPath": TOOLS_PATH, "scriptPath": SCRIPTS_PATH,
+              "iconPath": os.path.join(TOOLS_PATH, "Core", "Icons"), "projectPath": None}
+
+    def value(self, key, default=None):
+        return self.values.get(key, default)
+
+    def setValue(self, key, value):
+        self.values[key] = value
+
+
+def _mel_eval(command):
+    SCENE.calls["mel.eval"] = SCENE.calls.get("mel.eval", 0) + 1
+
+
+def _display(message):
+    return None
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def install():
+    """
+    Creates the scene and registers the fake modules in sys.modules. Safe to call more than once.
+
+    :return: the Scene.
+    """
+
+    global SCENE
+    if SCENE is not None:
+        return SCENE
+    SCENE = Scene()
+
+    maya = types.ModuleType("maya")
+    maya.__path__ = []
+    cmds = CommandModule("maya.cmds")
+
+    mel = types.ModuleType("maya.mel")
+    mel.eval = _mel_eval
+
+    api = types.ModuleType("maya.api")
+    api.__path__ = []
+    api_open_maya = StubModule("maya.api.OpenMaya")
+    for cls in API_CLASSES:
+        setattr(api_open_maya, cls.__name__, cls)
+    api_open_maya.MPlug = Plug
+    api_open_maya.MObject = Node
+    api_open_maya_anim = StubModule("maya.api.OpenMayaAnim")
+    api_open_maya_anim.MFnSkinCluster = MFnSkinCluster
+
+    open_maya = StubModule("maya.OpenMaya")
+    for name in ("MGlobal_displayInfo", "MGlobal_displayWarning", "MGlobal_displayError"):
+        setattr(open_maya, name, _display)
+
+    maya.cmds = cmds
+    maya.mel = mel
+    maya.api = api
+    maya.OpenMaya = open_maya
+    maya.OpenMayaAnim = StubModule("maya.OpenMayaAnim")
+    maya.OpenMayaUI = StubModule("maya.OpenMayaUI")
+    api.OpenMaya = api_open_maya
+    api.OpenMayaAnim = api_open_maya_anim
+
+    qt = types.ModuleType("ThirdParty.Qt")
+    qt.QtCore = StubModule("ThirdParty.Qt.QtCore")
+    qt.QtCore.QSettings = QSettings
+    qt.QtGui = StubModule("ThirdParty.Qt.QtGui")
+    qt.QtWidgets = StubModule("ThirdParty.Qt.QtWidgets")
+
+    sys.modules.update({"maya": maya, "maya.cmds": cmds, "maya.mel": mel, "maya.api": api,
+                        "maya.api.OpenMaya": api_open_maya, "maya.api.OpenMayaAnim": api_open_maya_anim,
+                        "maya.OpenMaya": open_maya, "maya.OpenMayaAnim": maya.OpenMayaAnim,
+                        "maya.OpenMayaUI": maya.OpenMayaUI, "ThirdParty.Qt": qt,
+                        "shiboken": StubModule("shiboken"), "shiboken2": StubModule("shiboken2")})
+    return SCENE
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# SCENE BUILDERS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def load_template(template_path=BIPED_TEMPLATE):
+    """
+    :return: the template data, {module network node: [attribute data, joint mover data]}.
+    """
+
+    with open(template_path) as fobj:
+        return json.load(fobj)
+
+
+def _attr_type(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "double"
+    return "string"
+
+
+def create_module_node(scene, node_name, attr_data, character=None):
+    """
+    Creates a module network node with the template's attribute data, connected to the character node if given.
+
+    :return: the network Node.
+    """
+
+    node = scene.create("network", node_name)
+    node.add_attr("parent", "message", user=True)
+    node.add_attr("controls", "message", user=True)
+    for attr in sorted(attr_data):
+        value = attr_data[attr]
+        node.add_attr(attr, _attr_type(value), value, user=True)
+    if character is not None:
+        scene.connect((character, "rigModules"), (node, "parent"))
+    return node
+
+
+def create_movers(scene, mover_data):
+    """
+    Creates the joint movers named in a template's joint mover data, with the attributes it sets, in place of the
+    joint mover file a module imports. Values are left at their defaults.
+    """
+
+    for plug in sorted(mover_data):
+        mover, separator, attr = plug.partition(".")
+        node = scene.nodes.get(mover) or scene.create("transform", mover)
+        if attr not in node.attrs:
+            node.add_attr(attr, "double", 0.0, keyable=True, user=True)
+
+
+def build_rig_scene(scene, data, namespace="biped", vertices=20000, influences_per_vertex=4, seed=0):
+    """
+    Fills the scene with a built rig referenced under the namespace: the character node, one network node per template
+    module, the module control nodes, joints, controls with pick-walk connections, module settings nodes and a skinned
+    mesh. Every module gets fk controls for its joints, and modules with an IK rig a pair of ik controls. Arms and legs
+    are left in FK mode.
+
+    :param vertices: vertex count of the skinned mesh.
+    :param influences_per_vertex: non-zero weights per vertex.
+    :param seed: random seed for the weights.
+    :return: the character node name.
+    """
+
+    prefix = namespace + ":"
+    character = scene.create("network", prefix + "ART_RIG_ROOT")
+    character.add_attr("rigModules", "message", user=True)
+    character.add_attr("namespace", "string", namespace, user=True)
+    character.add_attr("state", "double", 2.0, user=True)
+    scene.create("transform", prefix + "rig_settings")
+
+    # modules, parents first so every joint can be parented when created
+    modules = sorted(data, key=lambda module: (module != "ART_Root_Module", module != "ART_Torso_Module", module))
+    joints = []
+    for module in modules:
+        attr_data = data[module][0]
+        node = create_module_node(scene, prefix + module, attr_data, character)
+        bones = [bone for bone in attr_data["Created_Bones"].split("::") if bone]
+        parent = attr_data.get("parentModuleBone")
+        for bone in bones:
+            joint = scene.create("joint", prefix + bone, prefix + parent if parent else None)
+            joints.append(joint)
+            parent = bone
+
+        control_node = scene.create("network", prefix + module + "_Controls")
+        control_node.add_attr("parentModule", "message", user=True)
+        scene.connect((node, "controls"), (control_node, "parentModule"))
+
+        groups = [("fkControls", ["fk_" + bone + "_anim" for bone in bones])]
+        if attr_data.get("buildIK_V1") or attr_data.get("buildIK"):
+            groups.append(("ikControls", ["ik_" + attr_data["moduleName"] + "_anim",
+                                          "ik_" + attr_data["moduleName"] + "_pv_anim"]))
+        for group, controls in groups:
+            control_node.add_attr(group, "message", user=True)
+            previous = None
+            for name in controls:
+                control = scene.create("transform", prefix + name)
+                control.add_attr("controlClass", "message", user=True)
+                control.add_attr("pickWalkUp", "message", user=True)
+                control.add_attr("pickWalkDown", "message", user=True)
+                scene.connect((control_node, group), (control, "controlClass"))
+                if previous is not None:
+                    scene.connect((control, "message"), (previous, "pickWalkDown"))
+                    scene.connect((previous, "message"), (control, "pickWalkUp"))
+                previous = control
+
+        if attr_data["moduleType"] in ("ART_Arm_Standard", "ART_Leg_Standard"):
+            settings = scene.create("transform", prefix + attr_data["moduleName"] + "_settings")
+            settings.add_attr("mode", "double", 0.0, keyable=True, user=True)
+
+    # skinned mesh
+    transform = scene.create("transform", prefix + "body_geo")
+    shape = scene.create("mesh", prefix + "body_geoShape", transform.name)
+    shape.data["vertices"] = vertices
+    skin = scene.create("skinCluster", prefix + "skinCluster1")
+    for attr, value in SKIN_ATTRS.items():
+        skin.add_attr(attr, _attr_type(value), value)
+
+    random.seed(seed)
+    count = len(joints)
+    weights = [0.0] * (vertices * count)
+    for vertex in range(vertices):
+        columns = random.sample(range(count), min(influences_per_vertex, count))
+        values = [random.random() for column in columns]
+        total = sum(values)
+        for column, value in zip(columns, values):
+            weights[vertex * count + column] = value / total
+    skin.data.update({"geometry": shape, "influences": joints, "weights": weights,
+                      "blendWeights": [0.0] * vertices})
+
+    return character.name
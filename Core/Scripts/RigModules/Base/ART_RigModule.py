@@ -3238,21 +3238,17 @@ class ART_RigModule():
             win.show()
             return None
 
-        controlNode = cmds.listConnections(networkNode + ".controls")[0]
-
-        # get all attrs on the controlNode
-        attrs = cmds.listAttr(controlNode, ud=True)
+        # get the control groups of the module from the character's control map
+        characterNode = cmds.listConnections(networkNode + ".parent")[0]
+        groups = dict(utils.get_control_map(characterNode)).get(networkNode, [])
 
-        # loop through attrs, getting connections
         returnControls = []
-        for attr in attrs:
-            connections = cmds.listConnections(controlNode + "." + attr, source=False)
-            if connections is not None:
-                if all is True:
-                    returnControls.append(connections)
-                if attribute is not None:
-                    if attr == attribute:
-                        returnControls = connections
+        for attr, connections in groups:
+            if all is True:
+                returnControls.append(list(connections))
+            if attribute is not None:
+                if attr == attribute:
+                    returnControls = list(connections)
         return returnControls
 
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -3335,11 +3331,7 @@ class ART_RigModule():
 
         """
 
-        modules = cmds.ls(type="network")
-        for module in modules:
-            attrs = cmds.listAttr(module)
-            if "rigModules" in attrs:
-                return module
+        return utils.returnCharacterModule()
 
     @property
     def getAllModules(self):
@@ -3350,14 +3342,7 @@ class ART_RigModule():
 
         """
 
-        modules = cmds.ls(type="network")
-        returnMods = []
-        for module in modules:
-            attrs = cmds.listAttr(module)
-            if "parent" in attrs:
-                returnMods.append(module)
-
-        return returnMods
+        return utils.returnRigModules()
 
     @property
     def returnNetworkNode(self):
@@ -3368,12 +3353,9 @@ class ART_RigModule():
 
         """
         networkNode = None
-        networkNodes = cmds.ls(type="network")
-        for node in networkNodes:
-            attrs = cmds.listAttr(node)
-            if "moduleName" in attrs:
-                if cmds.getAttr(node + ".moduleName") == self.name:
-                    networkNode = node
+        for node in utils.returnRigModules():
+            if cmds.getAttr(node + ".moduleName") == self.name:
+                networkNode = node
 
         return networkNode
 
@@ -3388,23 +3370,20 @@ class ART_RigModule():
 
         """
         modules = []
-        networkNodes = cmds.ls(type="network")
-        for node in networkNodes:
-            attrs = cmds.listAttr(node)
-            if "moduleName" in attrs:
-                if cmds.getAttr(node + ".moduleName") == self.name:
-                    characterNode = cmds.listConnections(node + ".parent")[0]
-                    if cmds.objExists(characterNode + ".namespace"):
-                        if cmds.getAttr(characterNode + ".namespace") == self.namespace.partition(":")[0]:
-                            networkNode = node
-                            return networkNode
-                    else:
-                        # if there is no namespace attr, then the character is not referenced in, so we can just return
-                        # the one network node
+        for node in utils.returnRigModules():
+            if cmds.getAttr(node + ".moduleName") == self.name:
+                characterNode = cmds.listConnections(node + ".parent")[0]
+                if cmds.objExists(characterNode + ".namespace"):
+                    if cmds.getAttr(characterNode + ".namespace") == self.namespace.partition(":")[0]:
+                        networkNode = node
+                        return networkNode
+                else:
+                    # if there is no namespace attr, then the character is not referenced in, so we can just return
+                    # the one network node
 
-                        # check .moduleName attr and see if it matches self.name
-                        if cmds.getAttr(node + ".moduleName") == self.name:
-                            return node
+                    # check .moduleName attr and see if it matches self.name
+                    if cmds.getAttr(node + ".moduleName") == self.name:
+                        return node
 
     @property
     def returnClassObject(self):
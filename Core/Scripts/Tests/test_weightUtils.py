@@ -0,0 +1,33 @@
+"""
+Tests of the pure python weight file code in Utilities.weightUtils. Run with Core/Scripts on the path:
+
+    python -m unittest Tests.test_weightUtils
+"""
+
+import io
+import json
+import unittest
+
+import Utilities.weightUtils as weightUtils
+
+
+class JSONStreamReaderTest(unittest.TestCase):
+
+    # numbers that have shorter numbers as prefixes ("0.", "1e", "1e-"), so a chunk can end inside each of them
+    DOCUMENT = u'{"weights": [0.25, 1e-05, -12.5E+3, 0, 10, 2.0e2, 0.125], "name": "joint_01", "blend": [1.5, 3]}'
+
+    def test_numbers_split_across_chunks(self):
+        expected = json.loads(self.DOCUMENT)
+        for chunk_size in range(1, len(self.DOCUMENT) + 1):
+            reader = weightUtils.JSONStreamReader(io.StringIO(self.DOCUMENT), chunk_size)
+            data = {}
+            for key in reader.iter_object():
+                if key == "weights":
+                    data[key] = list(reader.read_array("d"))
+                else:
+                    data[key] = reader.read_value()
+            self.assertEqual(data, expected, "chunk size {0}".format(chunk_size))
+
+
+if __name__ == "__main__":
+    unittest.main()
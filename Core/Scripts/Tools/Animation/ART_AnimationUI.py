@@ -489,12 +489,7 @@ class ART_AnimationUI(QtWidgets.QMainWindow):
 
         """
 
-        allNodes = cmds.ls(type="network")
-        characterNodes = []
-        for node in allNodes:
-            attrs = cmds.listAttr(node)
-            if "rigModules" in attrs:
-                characterNodes.append(node)
+        characterNodes = utils.returnCharacterModules()
 
         if len(characterNodes) == 0:
             return False
@@ -2155,7 +2150,8 @@ class ART_AnimationUI(QtWidgets.QMainWindow):
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def getModuleInst(self, module):
         """
-        Takes the given module and instantiates it, returning the memory address for the created instance.
+        Takes the given module and returns its instance from the module instance pool (see
+        utils.ModuleInstancePool), instantiating it the first time.
 
         :param module: The name of the module to instantiate.
 
@@ -2163,15 +2159,7 @@ class ART_AnimationUI(QtWidgets.QMainWindow):
 
         """
 
-        modType = cmds.getAttr(module + ".moduleType")
-        modName = cmds.getAttr(module + ".moduleName")
-        mod = __import__("RigModules." + modType, {}, {}, [modType])
-
-        # get the class name from that module file (returns Modules.ART_Root.ART_Root for example)
-        moduleClass = getattr(mod, mod.className)
-
-        # find the instance of that module
-        moduleInst = moduleClass(self, modName)
+        moduleInst = utils.get_module_pool().get(module, self)
 
         return moduleInst
 
@@ -1089,12 +1089,7 @@ class ART_ExportMotion(object):
 
         characterInfo = []
 
-        allNodes = cmds.ls(type="network")
-        characterNodes = []
-        for node in allNodes:
-            attrs = cmds.listAttr(node)
-            if "rigModules" in attrs:
-                characterNodes.append(node)
+        characterNodes = utils.returnCharacterModules()
 
         # go through each node, find the character name, the namespace on the node, and the picker attribute
         for node in characterNodes:
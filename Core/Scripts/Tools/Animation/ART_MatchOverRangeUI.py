@@ -40,27 +40,19 @@ class Match(object):
         currentMode = cmds.evaluationManager(q=True, mode=True)[0]
         cmds.evaluationManager(mode="off")
 
+        # get each module's instance once, with the namespace set, from the module instance pool
+        pool = utils.get_module_pool()
+        instances = []
+        for each in self.module_match_info:
+            instances.append([pool.get(each[0], self, self.character + ":"), each[1]])
+
         # loop through frame range, calling each module's match function given the match method
-        if len(self.module_match_info) > 0:
+        if len(instances) > 0:
             for i in range(self.start_frame, self.end_frame + 1):
                 cmds.currentTime(i)
-                for each in self.module_match_info:
-                    # get inst
-                    modType = cmds.getAttr(each[0] + ".moduleType")
-                    modName = cmds.getAttr(each[0] + ".moduleName")
-                    mod = __import__("RigModules." + modType, {}, {}, [modType])
-
-                    # get the class name from that module file (returns Modules.ART_Root.ART_Root for example)
-                    moduleClass = getattr(mod, mod.className)
-
-                    # find the instance of that module
-                    moduleInst = moduleClass(self, modName)
-
-                    # set namespace for instance
-                    moduleInst.namespace = self.character + ":"
-
+                for moduleInst, matchMethod in instances:
                     # call on module's match function (method, checkbox, match over range)
-                    moduleInst.switchMode(each[1], None, True)
+                    moduleInst.switchMode(matchMethod, None, True)
 
         cmds.evaluationManager(mode=currentMode)
 
@@ -208,12 +200,7 @@ class ART_MatchOverRange(object):
         QtWidgets.QMainWindow.closeEvent(self.mainWin, event)
 
     def _find_characters(self):
-        allNodes = cmds.ls(type="network")
-        characterNodes = []
-        for node in allNodes:
-            attrs = cmds.listAttr(node)
-            if "rigModules" in attrs:
-                characterNodes.append(node)
+        characterNodes = utils.returnCharacterModules()
 
         # go through each node, find the character name, the namespace on the node, and the picker attribute
         for node in characterNodes:
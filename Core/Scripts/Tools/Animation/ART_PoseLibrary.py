@@ -2230,22 +2230,7 @@ def get_controls(character, partial_pose=False):
     character_controls = []
 
     if cmds.objExists(character + ":" + "ART_RIG_ROOT"):
-        modules = cmds.listConnections(character + ":ART_RIG_ROOT.rigModules")
-
-        if modules is not None:
-            for mod in modules:
-                controls = cmds.listConnections(mod + ".controls")
-
-                if controls is not None:
-                    for control in controls:
-                        # get all attrs on the controlNode
-                        attrs = cmds.listAttr(control, ud=True)
-
-                        # loop through attrs, getting connections
-                        for attr in attrs:
-                            connections = cmds.listConnections(control + "." + attr, source=False)
-                            if connections is not None:
-                                character_controls.extend(connections)
+        character_controls = utils.get_all_controls(False, character + ":" + "ART_RIG_ROOT")
 
     if len(selection) > 0:
         for each in selection:
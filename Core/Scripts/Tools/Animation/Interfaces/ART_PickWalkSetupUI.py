@@ -314,14 +314,7 @@ class ART_PickWalkSetupUI(interfaceUtils.baseWindow):
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def _populate_characters(self, comboBox):
 
-        network_nodes = cmds.ls(type="network")
-        characters = []
-
-        for node in network_nodes:
-            attrs = cmds.listAttr(node, ud=True)
-            if "rigModules" in attrs:
-                if node not in characters:
-                    characters.append(node)
+        characters = utils.returnCharacterModules()
 
         for character in characters:
             if cmds.objExists(character + ".namespace"):
@@ -5,7 +5,6 @@ Author: Jeremy Ernst
 from functools import partial
 import os
 import maya.cmds as cmds
-import maya.mel as mel
 
 import Utilities.riggingUtils as riggingUtils
 import Utilities.utils as utils
@@ -160,6 +159,24 @@ class ART_AddOrRemoveInfluences():
         self.addRemoveInfsWin_removeUnusedInfBtn.clicked.connect(partial(self.addOrRemoveInfs_addInf, False, True))
         self.addRemoveInfsWin_removeUnusedInfBtn.setObjectName("settings")
 
+        # prune options: threshold and max influences (0 keeps the skinCluster's max influences)
+        self.addRemoveInfsWin_pruneValue = QtWidgets.QDoubleSpinBox()
+        self.addRemoveInfsWin_rightSideLayout.addWidget(self.addRemoveInfsWin_pruneValue)
+        self.addRemoveInfsWin_pruneValue.setMaximumWidth(110)
+        self.addRemoveInfsWin_pruneValue.setDecimals(3)
+        self.addRemoveInfsWin_pruneValue.setRange(0.0, 1.0)
+        self.addRemoveInfsWin_pruneValue.setSingleStep(.001)
+        self.addRemoveInfsWin_pruneValue.setValue(riggingUtils.PRUNE_THRESHOLD)
+        self.addRemoveInfsWin_pruneValue.setToolTip("Prune weights below this value.")
+
+        self.addRemoveInfsWin_maxInfs = QtWidgets.QSpinBox()
+        self.addRemoveInfsWin_rightSideLayout.addWidget(self.addRemoveInfsWin_maxInfs)
+        self.addRemoveInfsWin_maxInfs.setMaximumWidth(110)
+        self.addRemoveInfsWin_maxInfs.setRange(0, 30)
+        self.addRemoveInfsWin_maxInfs.setValue(0)
+        self.addRemoveInfsWin_maxInfs.setToolTip("Max influences per vertex. 0 uses the skinCluster's max influences "
+                                                 "if it maintains them, otherwise there is no limit.")
+
         self.addRemoveInfsWin_pruneBtn = QtWidgets.QPushButton("Prune Weights")
         self.addRemoveInfsWin_rightSideLayout.addWidget(self.addRemoveInfsWin_pruneBtn)
         self.addRemoveInfsWin_pruneBtn.setMinimumSize(110, 35)
@@ -314,12 +331,11 @@ class ART_AddOrRemoveInfluences():
 
             # removed unused influences
             if removeUnused:
-                weightedInfs = cmds.skinCluster(skinCluster, q=True, weightedInfluence=True)
-                allInfs = cmds.skinCluster(skinCluster, q=True, inf=True)
-
-                for inf in allInfs:
-                    if inf not in weightedInfs:
-                        cmds.skinCluster(skinCluster, edit=True, ri=inf)
+                # use the skin tools' weight cache when it holds this skinCluster
+                weightCache = getattr(self.mainUI, "weightCache", None)
+                if weightCache is not None and weightCache.skin_cluster != skinCluster:
+                    weightCache = None
+                riggingUtils.remove_unused_influences(skinCluster, weightCache)
 
                 cmds.select(currentSelection)
                 self.addOrRemoveInfs_RefreshSelection()
@@ -346,15 +362,32 @@ class ART_AddOrRemoveInfluences():
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def addOrRemoveInfs_prune(self):
         """
-        Calls on Maya's built in prune skin weights tool.
+        Prunes the weights of the selected meshes below the prune value, keeps only the largest weights up to the max
+        influences and normalizes, in one pass over each weight matrix (riggingUtils.clean_skin_weights). A max
+        influences of 0 uses the skinCluster's max influences when maintainMaxInfluences is on, and no limit
+        otherwise. How many vertices changed, and by how much, is reported in the script editor.
 
         """
 
-        mel.eval("PruneSmallWeightsOptions;")
-
         # get current selection in scene
         currentSelection = cmds.ls(sl=True)
 
+        threshold = self.addRemoveInfsWin_pruneValue.value()
+        maxInfs = self.addRemoveInfsWin_maxInfs.value()
+
+        cmds.undoInfo(openChunk=True)
+        try:
+            for each in cmds.ls(currentSelection, objectsOnly=True):
+                skinCluster = riggingUtils.findRelatedSkinCluster(each)
+                if skinCluster is None:
+                    continue
+                skinMaxInfs = maxInfs
+                if not skinMaxInfs and cmds.skinCluster(skinCluster, q=True, mmi=True):
+                    skinMaxInfs = cmds.skinCluster(skinCluster, q=True, mi=True)
+                riggingUtils.clean_skin_weights(each, skinCluster, threshold, skinMaxInfs)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
         # refresh lists
         cmds.select(currentSelection)
         self.addOrRemoveInfs_RefreshSelection()
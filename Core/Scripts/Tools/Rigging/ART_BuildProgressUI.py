@@ -8,6 +8,7 @@ import Utilities.utils as utils
 
 import Utilities.interfaceUtils as interfaceUtils
 import Utilities.riggingUtils as riggingUtils
+import Utilities.weightUtils as weightUtils
 from ThirdParty.Qt import QtGui, QtCore, QtWidgets
 
 
@@ -44,6 +45,9 @@ class ART_BuildProgress_UI():
         self.warnings = 0
         self.errors = 0
 
+        # skin weights held in memory while the skeleton is rebuilt
+        self.weightSnapshots = weightUtils.WeightSnapshotStore(riggingUtils.WEIGHT_SNAPSHOT_SPILL_SIZE)
+
         # build the UI
         if cmds.window("ART_BuildProgressWin", exists=True):
             cmds.deleteUI("ART_BuildProgressWin", wnd=True)
@@ -143,10 +147,12 @@ class ART_BuildProgress_UI():
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def exportWeights(self):
         """
-        Exports all skin weights of meshes that have skinClusters to a .weights file (JSON). It also has
-        functionality to deal with morph targets, making sure they are preserved when history on the meshes is deleted.
+        Saves all skin weights of meshes that have skinClusters to an in-memory snapshot (self.weightSnapshots),
+        which ART_BuildProgressUI.importWeights() restores after the skeleton is rebuilt. Nothing is written to disk
+        unless the snapshots exceed riggingUtils.WEIGHT_SNAPSHOT_SPILL_SIZE. It also has functionality to deal with
+        morph targets, making sure they are preserved when history on the meshes is deleted.
 
-        .. seealso:: riggingUtils.export_skin_weights()
+        .. seealso:: riggingUtils.snapshot_skin_weights()
 
         """
 
@@ -168,11 +174,10 @@ class ART_BuildProgress_UI():
         self.currentTask.setValue(0)
 
         # save out weights of meshes
+        self.weightSnapshots.clear()
         for mesh in weightedMeshes:
-            filePath = utils.returnFriendlyPath(os.path.join(cmds.internalVar(utd=True), mesh[0] + ".WEIGHTS"))
-
-            # export skin weights
-            riggingUtils.export_skin_weights(filePath, mesh[0])
+            # snapshot skin weights
+            riggingUtils.snapshot_skin_weights(self.weightSnapshots, mesh[0])
 
             # CHECK FOR MORPH TARGETS
             blendshapeList = []
@@ -323,10 +328,10 @@ class ART_BuildProgress_UI():
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def importWeights(self):
         """
-        Imports skin weights back onto the asset geometry after having rebuilt the skeleton in rig pose. Then calls
-        on ART_BuildProgressUI.preScript().
+        Restores the skin weights snapshot by ART_BuildProgressUI.exportWeights() back onto the asset geometry after
+        having rebuilt the skeleton in rig pose. Then calls on ART_BuildProgressUI.preScript().
 
-        .. seealso:: ART_BuildProgressUI.preScript()
+        .. seealso:: riggingUtils.restore_skin_weights(), ART_BuildProgressUI.preScript()
 
         """
 
@@ -338,19 +343,14 @@ class ART_BuildProgress_UI():
         self.infoText.append("|| IMPORTING SKIN WEIGHTS ||")
 
         for mesh in meshes:
-            filePath = utils.returnFriendlyPath(os.path.join(cmds.internalVar(utd=True), mesh + ".WEIGHTS"))
-
-            if os.path.exists(filePath):
-                riggingUtils.import_skin_weights(filePath, mesh, True)
+            if mesh in self.weightSnapshots:
+                riggingUtils.restore_skin_weights(self.weightSnapshots, mesh, True)
 
                 # update progress and info
                 self.infoText.append("    Imported Skin Weights for " + mesh)
                 curVal = self.currentTask.value()
                 self.currentTask.setValue(curVal + 1)
 
-                # remove skin file
-                os.remove(filePath)
-
             else:
                 # update progress and info
                 self.infoText.setTextColor(QtGui.QColor(236, 217, 0))
@@ -361,6 +361,9 @@ class ART_BuildProgress_UI():
                 curVal = self.currentTask.value()
                 self.currentTask.setValue(curVal + 1)
 
+        # drop snapshots of meshes that were not restored
+        self.weightSnapshots.clear()
+
         # update main progress bar
         self.totalProgress.setValue(5)
         QtWidgets.QApplication.processEvents()
@@ -508,27 +511,36 @@ class ART_BuildProgress_UI():
         # create the driver skeleton
         riggingUtils.createDriverSkeleton()
 
+        # the skinned meshes don't change while the modules build, so the control scale factor is only computed once
+        riggingUtils.begin_scale_factor_cache()
+
         # Loop through modules, building rigs
-        for inst in self.mainUI.moduleInstances:
-            self.infoText.append(" \n")
-            self.infoText.append("    Building: " + str(inst.name))
+        try:
+            for inst in self.mainUI.moduleInstances:
+                self.infoText.append(" \n")
+                self.infoText.append("    Building: " + str(inst.name))
+
+                # build module rigs
+                try:
+                    inst.buildRig(self.infoText, self)
+                    cmds.refresh()
+                except StandardError:
+                    import sys
+                    error_type, value, traceback = sys.exc_info()
+                    tb = utils.get_traceback(traceback)
+                    print tb
+                finally:
+                    networkNode = inst.returnNetworkNode
+                    cmds.lockNode(networkNode, lock=True)
+
+                # update progress bar
+                curVal = self.currentTask.value()
+                self.currentTask.setValue(curVal + 1)
+        finally:
+            savedQueries = riggingUtils.end_scale_factor_cache()
 
-            # build module rigs
-            try:
-                inst.buildRig(self.infoText, self)
-                cmds.refresh()
-            except StandardError:
-                import sys
-                error_type, value, traceback = sys.exc_info()
-                tb = utils.get_traceback(traceback)
-                print tb
-            finally:
-                networkNode = inst.returnNetworkNode
-                cmds.lockNode(networkNode, lock=True)
-
-            # update progress bar
-            curVal = self.currentTask.value()
-            self.currentTask.setValue(curVal + 1)
+        self.infoText.append(" \n")
+        self.infoText.append("    Scale factor queries saved by the build cache: " + str(savedQueries))
 
         # =======================================================================
         # #Setup the rig parenting
@@ -646,6 +658,14 @@ class ART_BuildProgress_UI():
         if cmds.objExists("ART_RIG_ROOT.state"):
             cmds.setAttr("ART_RIG_ROOT.state", 2)
 
+        # =======================================================================
+        # #store the control map on the main network node
+        # =======================================================================
+        utils.save_control_map("ART_RIG_ROOT")
+
+        # module instances created before the build are out of date
+        utils.get_module_pool().invalidate()
+
         # =======================================================================
         # #hide all joints
         # =======================================================================
@@ -66,28 +66,24 @@ class artv2_kneeTwist():
         cmds.refresh()
 
     def getCharacters(self):
-        nodes = cmds.ls(type='network')
         controls = []
         selection = cmds.ls(sl = True)
 
-        for node in nodes:
-            attrs = cmds.listAttr(node, ud=True)
-            if attrs is not None:
-                if "rigModules" in attrs:
-                    rigModules = cmds.listConnections(node + ".rigModules")
-                    for module in rigModules:
-                        if cmds.getAttr(module + ".moduleType") == "ART_Leg_Standard":
+        for node in utils.returnCharacterModules():
+            rigModules = cmds.listConnections(node + ".rigModules")
+            for module in rigModules:
+                if cmds.getAttr(module + ".moduleType") == "ART_Leg_Standard":
 
-                            controlNode = cmds.listConnections(module + ".controls")[0]
-                            ikControls = cmds.listConnections(controlNode + ".ikV1Controls")
-                            ikControls = sorted(ikControls)
+                    controlNode = cmds.listConnections(module + ".controls")[0]
+                    ikControls = cmds.listConnections(controlNode + ".ikV1Controls")
+                    ikControls = sorted(ikControls)
 
-                            for each in ikControls:
-                                if each in selection:
-                                    self.footControl = ikControls[0]
-                                    self.side = cmds.getAttr(module + ".side")
-                                    controls = ikControls
-                                    return controls
+                    for each in ikControls:
+                        if each in selection:
+                            self.footControl = ikControls[0]
+                            self.side = cmds.getAttr(module + ".side")
+                            controls = ikControls
+                            return controls
 
 
 
@@ -177,21 +173,17 @@ class ARTv2_Add_Rig(object):
         ART_AnimationUI.run()
 
     def _knee_twist_manip(self):
-        nodes = cmds.ls(type='network')
-        for node in nodes:
-            attrs = cmds.listAttr(node, ud=True)
-            if attrs is not None:
-                if "rigModules" in attrs:
-                    rigModules = cmds.listConnections(node + ".rigModules")
-                    for module in rigModules:
-                        if cmds.getAttr(module + ".moduleType") == "ART_Leg_Standard":
-
-                            if not cmds.objExists("artv2_kneeTwistScript"):
-                                # create the script node
-                                cmds.scriptNode(st=2, bs=kneeTwistScript, n='artv2_kneeTwistScript', stp='python')
-
-                                # eval the script right away, as the script node won't execute until file load.
-                                exec kneeTwistScript
+        for node in utils.returnCharacterModules():
+            rigModules = cmds.listConnections(node + ".rigModules")
+            for module in rigModules:
+                if cmds.getAttr(module + ".moduleType") == "ART_Leg_Standard":
+
+                    if not cmds.objExists("artv2_kneeTwistScript"):
+                        # create the script node
+                        cmds.scriptNode(st=2, bs=kneeTwistScript, n='artv2_kneeTwistScript', stp='python')
+
+                        # eval the script right away, as the script node won't execute until file load.
+                        exec kneeTwistScript
 
 
 class ARTv2_Edit_Rig(object):
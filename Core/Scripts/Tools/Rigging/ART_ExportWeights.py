@@ -278,13 +278,16 @@ class ART_ExportSkinWeights():
         Gather the information from the interface and export the skin weights with that information.
 
         For each piece of geometry, built the path of the .weight file by joining the output path and the .weight
-        file name, then call on export_skin_weights from riggingUtils, passing in the .weight file path and the mesh.
+        file name. The skin data of every mesh is then gathered and written by export_skin_weights_batch from
+        riggingUtils. Only the file I/O runs on worker threads, while the next meshes are being read, so the export
+        time is still close to the sum of the meshes.
 
         """
 
         # get the export path
         exportPath = self.exportSkinWeights_lineEdit.text()
         value = False
+        jobs = []
 
         # find each lineEdit in the scrollArea and get the entered text
         for i in range(self.exportSkinWeights_VLayout.count()):
@@ -313,15 +316,19 @@ class ART_ExportSkinWeights():
                     # create the full path
                     fullPath = utils.returnNicePath(exportPath, fileName + ".weights")
                     if value:
-                        # if the checkbox is checked, export skin weights
-
-                        # export the skin data
-                        riggingUtils.export_skin_weights(fullPath, dagname)
-
-                        # add exportPath attribute to geometry if it doesn't exist
-                        if not cmds.objExists(dagname + ".weightFile"):
-                            cmds.addAttr(dagname, longName="weightFile", dt="string", keyable=True)
-                        cmds.setAttr(dagname + ".weightFile", fullPath, type="string")
+                        # if the checkbox is checked, queue the mesh for export
+                        jobs.append((fullPath, dagname))
+
+        # export the skin data, with one progress bar for gathering and writing all meshes
+        if jobs:
+            progBar = interfaceUtils.progressDialog((0, len(jobs) * 2), label="Exporting skin weights...", freq=1)
+            riggingUtils.export_skin_weights_batch(jobs, progress=lambda step: progBar.setValue(step - 1))
+
+        for fullPath, dagname in jobs:
+            # add exportPath attribute to geometry if it doesn't exist
+            if not cmds.objExists(dagname + ".weightFile"):
+                cmds.addAttr(dagname, longName="weightFile", dt="string", keyable=True)
+            cmds.setAttr(dagname + ".weightFile", fullPath, type="string")
 
         # close the UI
         self.exportSkinWeights_Win.close()
@@ -61,13 +61,7 @@ class ART_RigCreator_UI(QtWidgets.QMainWindow):
         self.up = cmds.upAxis(q=True, ax=True)
 
         # check to see if the root of our rig network exists
-        exists = False
-        networkNodes = cmds.ls(type="network")
-        for node in networkNodes:
-            attrs = cmds.listAttr(node)
-
-            if "rigModules" in attrs:
-                exists = True
+        exists = utils.returnCharacterModule() is not None
 
         # if the root of the rig network did not exist, create it now as well as our root module
         if exists is False:
@@ -158,12 +152,7 @@ class ART_RigCreator_UI(QtWidgets.QMainWindow):
         self.nodeNetworkList.clear()
 
         # get network nodes and add to list widget
-        modules = cmds.ls(type="network")
-        returnMods = []
-        for module in modules:
-            attrs = cmds.listAttr(module)
-            if "parent" in attrs:
-                returnMods.append(module)
+        returnMods = utils.returnRigModules()
 
         mainNode = cmds.listConnections(returnMods[0] + ".parent")[0]
         self.nodeNetworkList.addItem(mainNode)
@@ -1379,6 +1368,9 @@ class ART_RigCreator_UI(QtWidgets.QMainWindow):
 
             to_do.pop("ART_Root_Module")
 
+            # parent bones are looked up in the joint index, which picks up each module's bones as they are created
+            joint_index = utils.get_joint_index()
+
             while len(to_do) > 0:
                 for each in data:
                     if each not in completed:
@@ -1387,9 +1379,8 @@ class ART_RigCreator_UI(QtWidgets.QMainWindow):
                         attr_data = module_info[0]
                         mover_data = module_info[1]
                         module_parent_bone = attr_data.get("parentModuleBone")
-                        available_parents = utils.getViableParents()
 
-                        if module_parent_bone in available_parents:
+                        if module_parent_bone in joint_index:
                             currentAmount = cmds.progressWindow(query=True, progress=True)
                             cmds.progressWindow(edit=True, progress=currentAmount + amount, status="Working on " + each)
                             self._load_template_data_for_module(attr_data, mover_data)
@@ -1604,8 +1595,9 @@ class ART_RigCreator_UI(QtWidgets.QMainWindow):
             if cmds.objExists(networkNode + ".modelPose"):
                 inst.setReferencePose("modelPose")
 
-        # remove weight table script job
+        # remove weight table script job and the weights it cached
         cmds.scriptJob(kill=self.skinToolsInst.wtScriptJob)
+        self.skinToolsInst.weightTable_releaseWeightCache()
 
         # show index 0 of stacked widget
         self.toolModeStack.setCurrentIndex(0)
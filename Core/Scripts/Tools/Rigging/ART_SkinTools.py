@@ -1,4 +1,3 @@
-import math
 import os
 from functools import partial
 
@@ -43,13 +42,17 @@ class ART_SkinTools(QtWidgets.QMainWindow):
         # build the UI
         self.buildSkinToolsUI(attachToRigInterface)
 
-        # UI Skin Cluster
+        # UI Skin Cluster, and the cached weights of it the weight table reads from
         self.skinCluster = None
+        self.weightCache = None
 
         # how to run the UI
         if attachToRigInterface:
             self.mainUI.toolModeStack.addWidget(self.deformationTabWidget)
 
+            # release the weight cache when the rig creator is deleted
+            cmds.scriptJob(uiDeleted=[self.mainUI.objectName(), self.weightTable_releaseWeightCache], runOnce=True)
+
         # standalone (WORK IN PROGRESS)
         else:
             self.setSizePolicy(QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed))
@@ -201,7 +204,7 @@ class ART_SkinTools(QtWidgets.QMainWindow):
         self.weightTable_fixWeightsBtn.setIcon(icon)
         self.weightTable_fixWeightsBtn.setFont(headerFont)
         self.weightTable_fixWeightsBtn.clicked.connect(riggingUtils.fixSkinWeights)
-        text = "Fix Skin Weights Tool. Copies the mesh, deletes history, and transfers the weights to the mesh."
+        text = "Fix Skin Weights Tool. Prunes tiny weights, enforces max influences and normalizes the weights."
         self.weightTable_fixWeightsBtn.setToolTip(text)
 
         buttonBkrd = utils.returnNicePath(self.iconsPath, "System/hammer.png")
@@ -1629,79 +1632,28 @@ class ART_SkinTools(QtWidgets.QMainWindow):
                     cmds.warning("No vertices selected.")
                     return
 
-            # find total number of vertices in object
-            totalNumVerts = cmds.polyEvaluate(objectName, v=True)
-            cmds.select(objectName + ".vtx[*]")
-            allVerts = cmds.ls(sl=True, flatten=True)
-            mirrorVertices = []
-
-            # find all joints in the object's skinCluster
-            skinClusters = cmds.ls(type='skinCluster')
-
-            # go through each found skin cluster, and if we find a skin cluster whose geometry matches our selection, get influences
-            for cluster in skinClusters:
-                geometry = cmds.skinCluster(cluster, q=True, g=True)[0]
-                geoTransform = cmds.listRelatives(geometry, parent=True)[0]
-                if geoTransform == objectName:
-                    skinCluster = cluster
-                    influences = cmds.skinCluster(cluster, q=True, inf=True)
-
-            # create the master list that will hold the vertex, its mirror, the influences of the vertex, the influences of the mirror, and the values
-            masterInfDataList = []
-            mirrorVertex = None
-
-            for vert in selectedVerts:
-                pos = cmds.pointPosition(vert)
-                mirrorVertPosition = [pos[0] * -1, pos[1], pos[2]]
-                mirrorVertPosX = mirrorVertPosition[0] * 1000
-                mirrorVertPosX = math.floor(mirrorVertPosX)
-
-                for i in range(totalNumVerts):
-                    testPos = cmds.pointPosition(allVerts[i])
-                    if testPos == mirrorVertPosition:
-                        mirrorVertex = allVerts[i]
-                        mirrorVertices.append(mirrorVertex)
-
-                # get this vert's influence information
-                vertexInfs = cmds.skinPercent(skinCluster, vert, q=True, ignoreBelow=0.0001, transform=None)
-                infValues = cmds.skinPercent(skinCluster, vert, q=True, ignoreBelow=0.0001, value=True)
-
-                # get the world position of the vertexInfs
-                mirrorInfs = []
-                for inf in vertexInfs:
-                    worldPos = cmds.xform(inf, q=True, ws=True, t=True)
-
-                    # try to get the mirror influence
-                    mirrorPos = [round(worldPos[0] * -1, 2), round(worldPos[1], 2), round(worldPos[2], 2)]
-
-                    for each in influences:
-                        infPos = cmds.xform(each, q=True, ws=True, t=True)
-                        newPos = [round(infPos[0], 2), round(infPos[1], 2), round(infPos[2], 2)]
-                        if newPos == mirrorPos:
-                            mirrorInfs.append(each)
-
-                # now we have all of the data needed to perform the mirror
-                data = [vert, mirrorVertex, vertexInfs, mirrorInfs, infValues]
-
-                # perform mirror
-                vert = data[1]
-                infs = data[3]
-                vals = data[4]
-
-                # transformValueList
-                if vert != None:
-                    if len(data[2]) == len(data[3]):
-                        cmds.skinPercent(skinCluster, vert, transformValue=[infs[0], 1.0])
-
-                        transformValueList = []
-                        for i in range(len(infs)):
-                            transformValueList.append((str(infs[i]), float(vals[i])))
-
-                        cmds.skinPercent(skinCluster, vert, transformValue=transformValueList)
-
-                    else:
-                        cmds.warning("skipping " + str(data[1]) + ". Missing symmetrical influence.")
+            # find the object's skinCluster
+            skinCluster = riggingUtils.findRelatedSkinCluster(objectName)
+            if skinCluster is None:
+                cmds.warning("No skinCluster found on " + objectName)
+                return
+
+            # mirror the weights through the symmetry map of the mesh (built once, then stored on the mesh)
+            cmds.undoInfo(openChunk=True)
+            try:
+                mirrored, skipped = riggingUtils.mirror_skin_weights(objectName, skinCluster,
+                                                                     riggingUtils.get_vertex_indices(selectedVerts))
+            finally:
+                cmds.undoInfo(closeChunk=True)
+
+            for vertex in skipped:
+                cmds.warning("skipping " + objectName + ".vtx[" + str(vertex) + "]. Missing symmetrical vertex.")
+
+            # re-read the mirrored vertices into the weight table's cache
+            if self.weightCache is not None and self.weightCache.skin_cluster == skinCluster:
+                self.weightCache.update(mirrored)
 
+            mirrorVertices = utils.component_ranges(objectName + ".vtx", sorted(set(mirrored)))
             if len(mirrorVertices) > 0:
                 cmds.select(mirrorVertices)
             else:
@@ -1745,13 +1697,37 @@ class ART_SkinTools(QtWidgets.QMainWindow):
 
     def paintSkinWeights_hammerSkinWeights(self):
 
-        try:
-            mel.eval("weightHammerVerts;")
-
-        except:
+        selection = cmds.ls(sl=True, flatten=True)
+        if not self.paintSkinWeights_smoothSkinWeights(selection):
             cmds.confirmDialog(icon="warning", title="Hammer Skin Weights",
                                message="The weight hammer works on polygon vertices.  Please select at least 1 vertex.")
 
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    def paintSkinWeights_smoothSkinWeights(self, vertices, iterations=1, strength=1.0):
+
+        # smooth the given vertices towards their neighbours (locked influences are kept), in one undoable step
+        vertices = [each for each in vertices if each.find(".vtx") != -1]
+        if not vertices:
+            return False
+
+        objectName = vertices[0].partition(".vtx")[0]
+        skinCluster = riggingUtils.findRelatedSkinCluster(objectName)
+        if skinCluster is None:
+            cmds.warning("No skinCluster found on " + objectName)
+            return False
+
+        indices = riggingUtils.get_vertex_indices(vertices)
+        cmds.undoInfo(openChunk=True)
+        try:
+            riggingUtils.smooth_skin_weights(objectName, skinCluster, indices, iterations, strength)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+        # re-read the smoothed vertices into the weight table's cache
+        if self.weightCache is not None and self.weightCache.skin_cluster == skinCluster:
+            self.weightCache.update(indices)
+        return True
+
 
         # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
         # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -1915,6 +1891,9 @@ class ART_SkinTools(QtWidgets.QMainWindow):
         if lockInfs:
             self.weightTable_lockInfs(selectedTransform, lockInfs, cluster, False)
 
+        # re-read the edited vertices into the weight cache
+        self.weightTable_updateWeightCache()
+
         # refresh UI
         self.weightTable_getInfs()
 
@@ -2122,6 +2101,10 @@ class ART_SkinTools(QtWidgets.QMainWindow):
             for inf in self.influences:
                 self.weightTable_skinJoints.addItem(inf)
 
+        # the weight table reads weights from a cache of the active skinCluster
+        if self.skinCluster is not None:
+            self.weightTable_getWeightCache(self.skinCluster)
+
         # return info
         if self.skinCluster != None:
             return self.skinCluster
@@ -2134,18 +2117,72 @@ class ART_SkinTools(QtWidgets.QMainWindow):
         # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
         # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
-    def weightTable_populateVertexJoints(self, vertices, cluster):
+    def weightTable_getWeightCache(self, cluster):
+
+        # (re)create the weight cache when the active skinCluster changes
+        if self.weightCache is None or self.weightCache.skin_cluster != cluster:
+            self.weightTable_releaseWeightCache()
+            self.weightCache = riggingUtils.SkinWeightCache(cluster)
+        return self.weightCache
+
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    def weightTable_releaseWeightCache(self):
+
+        # remove the weight cache's callbacks (which keep it alive) and its weights
+        if self.weightCache is not None:
+            self.weightCache.remove_callbacks()
+            self.weightCache = None
+
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    def closeEvent(self, event):
+
+        # standalone window: stop the weight table script job and release the weight cache
+        try:
+            cmds.scriptJob(kill=self.wtScriptJob, force=True)
+        except Exception:
+            pass
+        self.weightTable_releaseWeightCache()
+        QtWidgets.QMainWindow.closeEvent(self, event)
+
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    def weightTable_updateWeightCache(self, vertices=None):
+
+        # re-read the weights of the given (or selected) vertices after the tool edited them
+        if self.weightCache is None:
+            return
 
-        # find all of the influences of the selected vertices
-        influenceJoints = []
-        for vertex in vertices:
-            infs = cmds.skinPercent(cluster, vertex, q=True, transform=None, ib=.001)
-            for inf in infs:
-                influenceJoints.append(inf)
+        if vertices is None:
+            vertices = cmds.ls(sl=True)
+        vertices = [each for each in vertices if each.find(".") != -1]
+        if vertices:
+            self.weightCache.update(riggingUtils.get_vertex_indices(vertices))
 
-        # remove duplicates from the influence joints list
-        vertInfluences = []
-        vertInfluences = list(set(influenceJoints))
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+    def weightTable_populateVertexJoints(self, vertices, cluster):
+
+        # find all of the influences of the selected vertices, from the cached weights
+        weightCache = self.weightTable_getWeightCache(cluster)
+        vertInfluences = weightCache.vertex_influences(riggingUtils.get_vertex_indices(vertices), .001)
 
         # re-create the headers
         headerFont = QtGui.QFont()
@@ -2188,15 +2225,9 @@ class ART_SkinTools(QtWidgets.QMainWindow):
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     def weightTable_populateAvgWeight(self, vertices, cluster, influences):
 
-        # find the infleunce values for each vertex
-        averages = []
-        for influence in influences:
-            data = []
-            for vert in vertices:
-                value = cmds.skinPercent(cluster, vert, q=True, transform=influence)
-                data.append(value)
-            avg = sum(data) / float(len(data))
-            averages.append(avg)
+        # find the average influence values over the vertices, from the cached weights
+        weightCache = self.weightTable_getWeightCache(cluster)
+        averages = weightCache.average_weights(riggingUtils.get_vertex_indices(vertices), influences)
 
         # recreate the header
         customColor = QtGui.QColor(25, 175, 255)
@@ -2256,6 +2287,9 @@ class ART_SkinTools(QtWidgets.QMainWindow):
             if lockInfs:
                 self.weightTable_lockInfs(selectedTransform, lockInfs, cluster, False)
 
+            # re-read the edited vertices into the weight cache
+            self.weightTable_updateWeightCache()
+
         # refresh UI
         self.weightTable_getInfs()
 
@@ -2305,6 +2339,9 @@ class ART_SkinTools(QtWidgets.QMainWindow):
         if lockInfs:
             self.weightTable_lockInfs(selectedTransform, lockInfs, cluster, False)
 
+        # re-read the edited vertices into the weight cache
+        self.weightTable_updateWeightCache()
+
         # refresh UI
         self.weightTable_getInfs()
 
@@ -2368,6 +2405,8 @@ class ART_SkinTools(QtWidgets.QMainWindow):
                 except:
                     pass
 
+            # re-read the edited vertices into the weight cache
+            self.weightTable_updateWeightCache()
             self.weightTable_getInfs()
 
 
@@ -2400,8 +2439,8 @@ class ART_SkinTools(QtWidgets.QMainWindow):
 
         vertsToBlend = cmds.ls(sl=True, flatten=True)
 
-        # weight hammer
-        mel.eval("weightHammerVerts;")
+        # smooth the ring of grown vertices (updates the weight cache)
+        self.paintSkinWeights_smoothSkinWeights(vertsToBlend)
 
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -2438,27 +2477,22 @@ class ART_SkinTools(QtWidgets.QMainWindow):
             cmds.warning("Please select only 1 joint in the list.")
         if len(selected) == 1:
             joint = selected[0].text()
-            cmds.selectMode(component=True)
-            cmds.skinCluster(self.skinCluster, edit=True, siv=joint)
-            newSelection = cmds.ls(sl=True, fl=True)
-
-            # if the new selection is nothing new, select the original selection and put the mesh in the correct selectMode
-            if len(newSelection) == 1:
-                if cmds.nodeType(newSelection[0]) == "mesh":
-                    if len(currentSelection) == 1:
-                        cmds.selectMode(object=True)
-                    cmds.select(currentSelection)
-                    cmds.warning("No influenced vertices for that joint.")
-
-            # if inSelection arg is True, compare the original selection to the new selection
-            if inSelection:
-                selectSet = []
-                for each in newSelection:
-                    if each in currentSelection:
-                        selectSet.append(each)
-
-                # select new selectSet
-                cmds.select(selectSet)
+
+            # find the influenced vertices from the cached weights
+            weightCache = self.weightTable_getWeightCache(self.skinCluster)
+            influenced = weightCache.influenced_vertices(joint)
+
+            # if inSelection arg is True, only keep the influenced vertices in the original selection
+            if inSelection and influenced:
+                selectedVerts = set(riggingUtils.get_vertex_indices(currentSelection))
+                influenced = [vertex for vertex in influenced if vertex in selectedVerts]
+
+            # if there is nothing to select, keep the original selection
+            if not influenced:
+                cmds.warning("No influenced vertices for that joint.")
+            else:
+                cmds.selectMode(component=True)
+                cmds.select(utils.component_ranges(weightCache.mesh + ".vtx", influenced))
 
             # refresh UI
             self.weightTable_getInfs()
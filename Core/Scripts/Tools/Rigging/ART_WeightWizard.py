@@ -411,6 +411,7 @@ class WeightWizard(QtWidgets.QMainWindow):
         self.page5ImportOptions.addItem("World Position")
         self.page5ImportOptions.addItem("Local Position")
         self.page5ImportOptions.addItem("UV Position")
+        self.page5ImportOptions.addItem("Surface Position")
         layout.addWidget(self.page5ImportOptions)
         self.page5ImportOptions.setMinimumWidth(155)
         self.page5ImportOptions.setMaximumWidth(155)
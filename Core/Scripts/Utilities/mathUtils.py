@@ -3,171 +3,693 @@ Math utilities
 2015, Epic Games
 """
 
+import array
+import hashlib
+import heapq
+import json
 import math
+import os
+import struct
 
 import maya.api.OpenMaya as om
 import maya.cmds as cmds
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# bumped whenever the layout written by KDTree.save changes, so stale cached trees are rebuilt
+KDTREE_FILE_VERSION = 1
+
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # CLASSES
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
-class KDTreeNode():
-    def __init__(self, point, left, right):
-        self.point = point
-        self.left = left
-        self.right = right
-
-    def is_leaf(self):
-        return (self.left is None and self.right is None)
+class KDTree(object):
+    """ Array-backed KDTree. The tree is stored in flat per-node lists (range into the point index permutation,
+        split axis/value and child node ids) instead of one object per node, and every query returns point
+        indices, so duplicate positions are not a problem for callers.
 
+        The tree is built once by partitioning an index permutation around the median of each node (numpy
+        argpartition when the data is a numpy array, a quickselect otherwise), leaves hold up to leaf_size points.
+        Queries keep the k best candidates in a heap.
 
-class KDTreeNeighbours():
-    """ Internal structure used in nearest-neighbours search.
+        Example usage:
+            tree = KDTree(points)
+            nearest = tree.query(point, k=4)  # indices of the nearest 4 points
+            nearest = tree.query_batch(points, k=1)  # one list of indices per point
+            inside = tree.query_radius(point, 2.0)  # indices of the points within a radius
     """
 
-    def __init__(self, query_point, t):
-        self.query_point = query_point
-        self.t = t  # neighbours wanted
-        self.largest_distance = 0  # squared
-        self.current_best = []
+    # per-node arrays and their typecodes, as written by save()
+    NODE_ARRAYS = (("_lo", "i"), ("_hi", "i"), ("_axis", "i"), ("_split", "d"), ("_left", "i"), ("_right", "i"))
+
+    def __init__(self, data, leaf_size=8):
+        """
+        :param data: sequence of points (tuples/lists), or a numpy array of shape (numPoints, dimensions).
+        :param leaf_size: maximum number of points in a leaf.
+        """
 
-    def calculate_largest(self):
-        if self.t >= len(self.current_best):
-            self.largest_distance = self.current_best[-1][1]
+        if numpy is not None and isinstance(data, numpy.ndarray):
+            array_data = numpy.asarray(data, dtype=float).reshape(len(data), -1)
+            self.points = [tuple(point) for point in array_data.tolist()]
         else:
-            self.largest_distance = self.current_best[self.t - 1][1]
+            array_data = None
+            self.points = [tuple(point) for point in data]
+
+        self.size = len(self.points)
+        self.dim = len(self.points[0]) if self.size else 0
+        for point in self.points:
+            if len(point) != self.dim:
+                raise ValueError("KDTREE: point {0} does not have {1} dimensions.".format(point, self.dim))
+        self.leaf_size = max(1, leaf_size)
+
+        # per node: index range, split axis and value, children (-1 for leaves)
+        self._lo = []
+        self._hi = []
+        self._axis = []
+        self._split = []
+        self._left = []
+        self._right = []
+        self._build(array_data)
 
-    def add(self, point):
-        sd = square_distance(point, self.query_point)
-        # run through current_best, try to find appropriate place
-        for i, e in enumerate(self.current_best):
-            if i == self.t:
-                return  # enough neighbours, this one is farther, let's forget it
-            if e[1] > sd:
-                self.current_best.insert(i, [point, sd])
-                self.calculate_largest()
-                return
-        # append it to the end otherwise
-        self.current_best.append([point, sd])
-        self.calculate_largest()
+    @staticmethod
+    def construct_from_data(data):
+        tree = KDTree(data)
+        return tree
 
-    def get_best(self):
-        return [element[0] for element in self.current_best[:self.t]]
+    def _build(self, array_data):
+        if array_data is not None:
+            index = numpy.arange(self.size)
+        else:
+            index = list(range(self.size))
+        columns = [[point[axis] for point in self.points] for axis in range(self.dim)]
 
+        if not self.size:
+            self.index = []
+            return
 
-class KDTree():
-    """ KDTree implementation built from http://en.wikipedia.org/wiki/K-d_tree as a starting point
+        self._new_node(0, self.size)
+        stack = [(0, 0)]
+        while stack:
+            node, depth = stack.pop()
+            lo, hi = self._lo[node], self._hi[node]
+            if hi - lo <= self.leaf_size:
+                continue
 
-        Example usage:
-            from kdtree import KDTree
+            # select axis based on depth modulo tested dimension
+            axis = depth % self.dim
+            mid = (lo + hi) // 2
+            if array_data is not None:
+                segment = index[lo:hi]
+                index[lo:hi] = segment[numpy.argpartition(array_data[segment, axis], mid - lo)]
+                split = array_data[index[mid], axis]
+            else:
+                column = columns[axis]
+                _select_nth(index, lo, hi, mid, column)
+                split = column[index[mid]]
+
+            self._axis[node] = axis
+            self._split[node] = float(split)
+            self._left[node] = self._new_node(lo, mid)
+            self._right[node] = self._new_node(mid, hi)
+            stack.append((self._left[node], depth + 1))
+            stack.append((self._right[node], depth + 1))
+
+        self.index = [int(i) for i in index]
+
+    def _new_node(self, lo, hi):
+        self._lo.append(lo)
+        self._hi.append(hi)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        return len(self._lo) - 1
+
+    def query(self, query_point, k=1, distance_upper_bound=None, return_distance=False):
+        """
+        Finds the k nearest points.
+
+        :param query_point: point to search from.
+        :param k: number of neighbours wanted.
+        :param distance_upper_bound: if given, only points closer than this are returned.
+        :param return_distance: also return the distances.
+        :return: list of point indices, nearest first (and a list of distances if return_distance).
+        """
+
+        if not self.size:
+            return ([], []) if return_distance else []
+
+        query_point = tuple(query_point)
+        worst = float("inf") if distance_upper_bound is None else distance_upper_bound ** 2
+        best = []  # max-heap of (-squared distance, point index)
+
+        points, index = self.points, self.index
+        lo_list, hi_list, axis_list = self._lo, self._hi, self._axis
+        split_list, left_list, right_list = self._split, self._left, self._right
+
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+
+            axis = axis_list[node]
+            if axis == -1:
+                for i in index[lo_list[node]:hi_list[node]]:
+                    distance = 0.0
+                    for a, b in zip(points[i], query_point):
+                        distance += (a - b) * (a - b)
+                    if distance < worst:
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, i))
+                        else:
+                            heapq.heapreplace(best, (-distance, i))
+                        if len(best) == k:
+                            worst = -best[0][0]
+                continue
+
+            # figure out which subtree is farther than the other, and search the near one first
+            diff = query_point[axis] - split_list[node]
+            if diff < 0:
+                near, far = left_list[node], right_list[node]
+            else:
+                near, far = right_list[node], left_list[node]
+            stack.append((far, diff * diff))
+            stack.append((near, bound))
+
+        best.sort(reverse=True)
+        result = [i for distance, i in best]
+        if return_distance:
+            return result, [math.sqrt(-distance) for distance, i in best]
+        return result
 
-            tree = KDTree.construct_from_data(data)
-            nearest = tree.query(point, t=4) # find nearest 4 points
+    def query_batch(self, query_points, k=1, distance_upper_bound=None, return_distance=False):
+        """
+        Answers query() for every point in one call.
+
+        :param query_points: sequence of points, or a numpy array of shape (numPoints, dimensions).
+        :return: one list of point indices per query point (and one list of distances per point if
+                 return_distance).
+        """
+
+        if numpy is not None and isinstance(query_points, numpy.ndarray):
+            query_points = query_points.reshape(len(query_points), -1).tolist()
+
+        indices = []
+        distances = []
+        for query_point in query_points:
+            result = self.query(query_point, k, distance_upper_bound, return_distance)
+            if return_distance:
+                indices.append(result[0])
+                distances.append(result[1])
+            else:
+                indices.append(result)
+        if return_distance:
+            return indices, distances
+        return indices
+
+    def query_radius(self, query_point, radius):
+        """
+        Finds every point within the given radius.
+
+        :param query_point: point to search from.
+        :param radius: search radius.
+        :return: list of point indices, in no particular order.
+        """
+
+        result = []
+        if not self.size:
+            return result
+
+        query_point = tuple(query_point)
+        limit = radius * radius
+        points, index = self.points, self.index
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            axis = self._axis[node]
+            if axis == -1:
+                for i in index[self._lo[node]:self._hi[node]]:
+                    distance = 0.0
+                    for a, b in zip(points[i], query_point):
+                        distance += (a - b) * (a - b)
+                    if distance <= limit:
+                        result.append(i)
+                continue
+
+            diff = query_point[axis] - self._split[node]
+            if diff < 0:
+                near, far = self._left[node], self._right[node]
+            else:
+                near, far = self._right[node], self._left[node]
+            stack.append(near)
+            if diff * diff <= limit:
+                stack.append(far)
+        return result
+
+    def save(self, file_path):
+        """
+        Writes the built tree to disk (a small JSON header followed by packed arrays), so it can be loaded again
+        without rebuilding.
+
+        :param file_path: path to write to.
+        """
+
+        header = json.dumps({"version": KDTREE_FILE_VERSION, "size": self.size, "dim": self.dim,
+                             "leaf_size": self.leaf_size, "nodes": len(self._lo)}).encode("utf-8")
+        with open(file_path, "wb") as fobj:
+            fobj.write(struct.pack("<I", len(header)))
+            fobj.write(header)
+            array.array("d", [value for point in self.points for value in point]).tofile(fobj)
+            array.array("i", self.index).tofile(fobj)
+            for name, typecode in self.NODE_ARRAYS:
+                array.array(typecode, getattr(self, name)).tofile(fobj)
+
+    @classmethod
+    def load(cls, file_path):
+        """
+        Loads a tree written by save().
+
+        :param file_path: path of the file to read.
+        :return: KDTree instance.
+        """
+
+        with open(file_path, "rb") as fobj:
+            header_size = struct.unpack("<I", fobj.read(4))[0]
+            header = json.loads(fobj.read(header_size).decode("utf-8"))
+            if header["version"] != KDTREE_FILE_VERSION:
+                raise IOError("{0} was written by an unsupported KDTree version.".format(file_path))
+
+            tree = cls.__new__(cls)
+            tree.size, tree.dim, tree.leaf_size = header["size"], header["dim"], header["leaf_size"]
+
+            flat = _read_array(fobj, "d", tree.size * tree.dim)
+            tree.points = list(zip(*[iter(flat)] * tree.dim)) if tree.dim else []
+            tree.index = list(_read_array(fobj, "i", tree.size))
+            for name, typecode in cls.NODE_ARRAYS:
+                setattr(tree, name, list(_read_array(fobj, typecode, header["nodes"])))
+        return tree
+
+
+class TriangleBVH(object):
+    """ Bounding volume hierarchy over the triangles of a mesh, stored in flat per-node lists like KDTree. Used to
+        find the closest point on a surface, with the barycentric coordinates of that point in its triangle.
+
+        The tree is built once by partitioning the triangles around the median centroid (a quickselect) along the
+        longest axis of each node's bounds, leaves hold up to leaf_size triangles. Queries descend nearest box first
+        and skip every box farther away than the best point found so far.
+
+        Example usage:
+            bvh = TriangleBVH(points, triangles)
+            triangle, (u, v, w), distance = bvh.closest_point(point)
+            results = bvh.closest_point_batch(points)
     """
 
-    def __init__(self, data):
-        def build_kdtree(point_list, depth):
-            if not point_list:
-                return None
+    def __init__(self, points, triangles, leaf_size=4):
+        """
+        :param points: sequence of 3d points.
+        :param triangles: flat sequence of point indices, three per triangle.
+        :param leaf_size: maximum number of triangles in a leaf.
+        """
+
+        self.points = [tuple(float(value) for value in point) for point in points]
+        self.triangles = [tuple(triangles[i:i + 3]) for i in range(0, len(triangles) - 2, 3)]
+        self.leaf_size = max(1, leaf_size)
+
+        # per node: index range into the triangle permutation, bounds, children (-1 for leaves)
+        self._lo = []
+        self._hi = []
+        self._min = []
+        self._max = []
+        self._left = []
+        self._right = []
+        self._build()
+
+    def _build(self):
+        points = self.points
+        corners = [(points[a], points[b], points[c]) for a, b, c in self.triangles]
+        centroids = [[(a[axis] + b[axis] + c[axis]) / 3.0 for a, b, c in corners] for axis in range(3)]
+        self.index = list(range(len(self.triangles)))
+        if not self.index:
+            return
 
-            # check that all points share the same dimensions
-            dim = len(point_list[0])
-            for point in point_list:
-                if len(point) != dim:
-                    print 'KDTREE: point', point, 'does not have', dim, 'dimensions.'
+        stack = [self._new_node(0, len(self.index), corners)]
+        while stack:
+            node = stack.pop()
+            lo, hi = self._lo[node], self._hi[node]
+            if hi - lo <= self.leaf_size:
+                continue
+
+            # split at the median centroid along the longest axis of the node
+            extent = [self._max[node][axis] - self._min[node][axis] for axis in range(3)]
+            axis = extent.index(max(extent))
+            mid = (lo + hi) // 2
+            _select_nth(self.index, lo, hi, mid, centroids[axis])
+
+            self._left[node] = self._new_node(lo, mid, corners)
+            self._right[node] = self._new_node(mid, hi, corners)
+            stack.append(self._left[node])
+            stack.append(self._right[node])
+
+    def _new_node(self, lo, hi, corners):
+        node_points = [corner for i in self.index[lo:hi] for corner in corners[i]]
+        self._lo.append(lo)
+        self._hi.append(hi)
+        self._min.append(tuple(min(point[axis] for point in node_points) for axis in range(3)))
+        self._max.append(tuple(max(point[axis] for point in node_points) for axis in range(3)))
+        self._left.append(-1)
+        self._right.append(-1)
+        return len(self._lo) - 1
+
+    def _box_distance(self, node, point):
+        distance = 0.0
+        for value, low, high in zip(point, self._min[node], self._max[node]):
+            if value < low:
+                distance += (low - value) * (low - value)
+            elif value > high:
+                distance += (value - high) * (value - high)
+        return distance
+
+    def closest_point(self, query_point):
+        """
+        Finds the closest point on the surface.
+
+        :param query_point: point to search from.
+        :return: (triangle index, (u, v, w) barycentric weights of the triangle's points, distance), or None if the
+                 tree has no triangles.
+        """
+
+        if not self.index:
+            return None
+
+        query_point = tuple(query_point)
+        best = None
+        worst = float("inf")
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+
+            left = self._left[node]
+            if left == -1:
+                for i in self.index[self._lo[node]:self._hi[node]]:
+                    a, b, c = self.triangles[i]
+                    weights, distance = closest_point_on_triangle(query_point, self.points[a], self.points[b],
+                                                                  self.points[c])
+                    if distance < worst:
+                        worst = distance
+                        best = (i, weights)
+                continue
+
+            # visit the nearer box first
+            right = self._right[node]
+            left_bound = self._box_distance(left, query_point)
+            right_bound = self._box_distance(right, query_point)
+            if left_bound < right_bound:
+                stack.append((right, right_bound))
+                stack.append((left, left_bound))
+            else:
+                stack.append((left, left_bound))
+                stack.append((right, right_bound))
 
-            # select axis based on depth modulo tested dimension
-            axis = depth % dim
+        return best[0], best[1], math.sqrt(worst)
 
-            # sort point list
-            point_list.sort(key=lambda point: point[axis])
-            # choose the median
-            median = len(point_list) / 2
+    def closest_point_batch(self, query_points):
+        """
+        Answers closest_point() for every point in one call.
 
-            # create node and recursively construct subtrees
-            node = KDTreeNode(point=point_list[median],
-                              left=build_kdtree(point_list[0:median], depth + 1),
-                              right=build_kdtree(point_list[median + 1:], depth + 1))
-            return node
+        :param query_points: sequence of points.
+        :return: list with one closest_point() result per point.
+        """
 
-        self.root_node = build_kdtree(data, depth=0)
+        return [self.closest_point(point) for point in query_points]
 
-    @staticmethod
-    def construct_from_data(data):
-        tree = KDTree(data)
-        return tree
 
-    def query(self, query_point, t=1, debug=1):
-        stats = {'nodes_visited': 0, 'far_search': 0, 'leafs_reached': 0}
+class SpatialIndexCache(object):
+    """ On-disk cache of built KDTrees. Trees are keyed by a hash of the points they were built from plus a
+        caller-supplied tag (the match mode, for example), so a later request for the same points loads the
+        prebuilt tree instead of building it again.
 
-        def nn_search(node, query_point, t, depth, best_neighbours):
-            if node is None:
-                return
+        The cache directory is kept under max_size bytes by evicting the least recently used trees.
 
-            stats['nodes_visited'] += 1
+        Example usage:
+            cache = SpatialIndexCache(directory)
+            tree = cache.get_tree(points, tag="World Position")
+    """
 
-            # if we have reached a leaf, let's add to current best neighbours,
-            # (if it's better than the worst one or if there is not enough neighbours)
-            if node.is_leaf():
-                # statistics['leafs_reached'] += 1
-                best_neighbours.add(node.point)
-                return
+    EXTENSION = ".kdtree"
 
-            # this node is no leaf
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        """
+        :param directory: folder holding the cached trees. Created on first write.
+        :param max_size: total size in bytes the cache folder may grow to.
+        """
 
-            # select dimension for comparison (based on current depth)
-            axis = depth % len(query_point)
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
 
-            # figure out which subtree to search
-            near_subtree = None  # near subtree
-            far_subtree = None  # far subtree (perhaps we'll have to traverse it as well)
+    @staticmethod
+    def make_key(points, tag=""):
+        """
+        :param points: sequence of points.
+        :param tag: anything else the tree depends on (the match mode, for example).
+        :return: hex digest identifying the points and tag.
+        """
+
+        digest = hashlib.sha1(str(tag).encode("utf-8"))
+        digest.update(struct.pack("<II", len(points), KDTREE_FILE_VERSION))
+        digest.update(array.array("d", [float(value) for point in points for value in point]))
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.EXTENSION)
+
+    def get_tree(self, points, tag="", leaf_size=8):
+        """
+        Returns a KDTree over the given points, loaded from the cache if it has one and built (and cached)
+        otherwise.
+
+        :param points: sequence of points.
+        :param tag: anything else the tree depends on (the match mode, for example).
+        :param leaf_size: leaf size used when the tree has to be built.
+        :return: KDTree instance.
+        """
+
+        key = self.make_key(points, "{0}|{1}".format(tag, leaf_size))
+        path = self.path_for(key)
+
+        if os.path.exists(path):
+            try:
+                tree = KDTree.load(path)
+                # bump the file so eviction sees it as recently used
+                os.utime(path, None)
+                self.hits += 1
+                return tree
+            except (IOError, OSError, ValueError, struct.error):
+                self._remove(path)
+
+        self.misses += 1
+        tree = KDTree(points, leaf_size)
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            tree.save(path)
+            self.evict()
+        except (IOError, OSError):
+            # a read-only or full weights folder should never stop an import
+            self._remove(path)
+        return tree
 
-            # compare query_point and point of current node in selected dimension
-            # and figure out which subtree is farther than the other
-            if query_point[axis] < node.point[axis]:
-                near_subtree = node.left
-                far_subtree = node.right
-            else:
-                near_subtree = node.right
-                far_subtree = node.left
+    def evict(self):
+        """
+        Deletes the least recently used trees until the cache folder is under max_size.
+        """
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.EXTENSION):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(entry[1] for entry in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """
+        Deletes every cached tree.
+        """
+
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(self.EXTENSION):
+                    self._remove(os.path.join(self.directory, name))
 
-            # recursively search through the tree until a leaf is found
-            nn_search(near_subtree, query_point, t, depth + 1, best_neighbours)
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
-            # while unwinding the recursion, check if the current node
-            # is closer to query point than the current best,
-            # also, until t points have been found, search radius is infinity
-            best_neighbours.add(node.point)
 
-            # check whether there could be any points on the other side of the
-            # splitting plane that are closer to the query point than the current best
-            if (node.point[axis] - query_point[axis]) ** 2 < best_neighbours.largest_distance:
-                # statistics['far_search'] += 1
-                nn_search(far_subtree, query_point, t, depth + 1, best_neighbours)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# METHODS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 
+def _select_nth(index, lo, hi, nth, values):
+    # quickselect: rearranges index[lo:hi] in place so index[nth] holds what a full sort by values would put there,
+    # with nothing larger before it and nothing smaller after it, in expected linear time
+    hi -= 1
+    while hi - lo > 16:
+        # median of three pivot
+        a, b, c = values[index[lo]], values[index[(lo + hi) // 2]], values[index[hi]]
+        pivot = max(min(a, b), min(max(a, b), c))
+
+        i, j = lo, hi
+        while i <= j:
+            while values[index[i]] < pivot:
+                i += 1
+            while values[index[j]] > pivot:
+                j -= 1
+            if i <= j:
+                index[i], index[j] = index[j], index[i]
+                i += 1
+                j -= 1
+
+        if nth <= j:
+            hi = j
+        elif nth >= i:
+            lo = i
+        else:
             return
 
-        # if there's no tree, there's no neighbors
-        if self.root_node is not None:
-            neighbours = KDTreeNeighbours(query_point, t)
-            nn_search(self.root_node, query_point, t, depth=0, best_neighbours=neighbours)
-            result = neighbours.get_best()
-        else:
-            result = []
+    index[lo:hi + 1] = sorted(index[lo:hi + 1], key=values.__getitem__)
 
-        # print statistics
-        return result
+
+def _read_array(fobj, typecode, count):
+    values = array.array(typecode)
+    if count:
+        values.fromfile(fobj, count)
+    return values
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-# METHODS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def closest_point_on_triangle(p, a, b, c):
+    """
+    Closest point on triangle abc to point p, by testing which Voronoi region of the triangle p projects into
+    (Ericson, Real-Time Collision Detection, 5.1.5).
+
+    :return: ((u, v, w) barycentric weights of a, b and c, squared distance from p)
+    """
+
+    ab = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+    ac = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+    ap = (p[0] - a[0], p[1] - a[1], p[2] - a[2])
+    d1 = ab[0] * ap[0] + ab[1] * ap[1] + ab[2] * ap[2]
+    d2 = ac[0] * ap[0] + ac[1] * ap[1] + ac[2] * ap[2]
+    if d1 <= 0 and d2 <= 0:
+        weights = (1.0, 0.0, 0.0)
+    else:
+        bp = (p[0] - b[0], p[1] - b[1], p[2] - b[2])
+        d3 = ab[0] * bp[0] + ab[1] * bp[1] + ab[2] * bp[2]
+        d4 = ac[0] * bp[0] + ac[1] * bp[1] + ac[2] * bp[2]
+        cp = (p[0] - c[0], p[1] - c[1], p[2] - c[2])
+        d5 = ab[0] * cp[0] + ab[1] * cp[1] + ab[2] * cp[2]
+        d6 = ac[0] * cp[0] + ac[1] * cp[1] + ac[2] * cp[2]
+        vc = d1 * d4 - d3 * d2
+        vb = d5 * d2 - d1 * d6
+        va = d3 * d6 - d5 * d4
+
+        if d3 >= 0 and d4 <= d3:
+            weights = (0.0, 1.0, 0.0)
+        elif d6 >= 0 and d5 <= d6:
+            weights = (0.0, 0.0, 1.0)
+        elif vc <= 0 and d1 >= 0 and d3 <= 0:
+            v = d1 / (d1 - d3)
+            weights = (1.0 - v, v, 0.0)
+        elif vb <= 0 and d2 >= 0 and d6 <= 0:
+            w = d2 / (d2 - d6)
+            weights = (1.0 - w, 0.0, w)
+        elif va <= 0 and (d4 - d3) >= 0 and (d5 - d6) >= 0:
+            w = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+            weights = (0.0, 1.0 - w, w)
+        else:
+            total = va + vb + vc
+            if total == 0:
+                # degenerate triangle
+                weights = (1.0, 0.0, 0.0)
+            else:
+                v = vb / total
+                w = vc / total
+                weights = (1.0 - v - w, v, w)
+
+    u, v, w = weights
+    closest = [u * a[axis] + v * b[axis] + w * c[axis] for axis in range(3)]
+    distance = sum((p[axis] - closest[axis]) * (p[axis] - closest[axis]) for axis in range(3))
+    return weights, distance
+
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def build_symmetry_map(points, axis=0, tolerance=0.001):
+    """
+    Pairs every point with the point closest to its reflection across the plane through the origin perpendicular
+    to axis, using one KDTree over the points.
+
+    :param points: sequence of points.
+    :param axis: index of the mirrored coordinate (0 for x).
+    :param tolerance: largest distance between a reflected point and its match.
+    :return: (list with the index of the mirror of each point, -1 when none is within tolerance,
+              report dictionary with the "exact", "inexact" and "unmatched" counts, the "maxDistance" of the
+              matches and the "unmatchedPoints" indices)
+    """
+
+    tree = KDTree(points)
+    reflected = []
+    for point in points:
+        point = list(point)
+        point[axis] = -point[axis]
+        reflected.append(point)
+
+    matches, distances = tree.query_batch(reflected, 1, tolerance, True)
+
+    mirror = []
+    report = {"exact": 0, "inexact": 0, "unmatched": 0, "maxDistance": 0.0, "unmatchedPoints": []}
+    for index, (match, distance) in enumerate(zip(matches, distances)):
+        if not match:
+            mirror.append(-1)
+            report["unmatched"] += 1
+            report["unmatchedPoints"].append(index)
+            continue
+
+        mirror.append(match[0])
+        if distance[0] > 0.0:
+            report["inexact"] += 1
+            report["maxDistance"] = max(report["maxDistance"], distance[0])
+        else:
+            report["exact"] += 1
+    return mirror, report
+
 
-def square_distance(self, pointA, pointB):
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def square_distance(pointA, pointB):
     # squared euclidean distance
     distance = 0
     dimensions = len(pointA)  # assumes both points have the same dimensions
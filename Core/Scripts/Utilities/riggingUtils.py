@@ -5,15 +5,27 @@ This module is a collection of utility functions for generic rigging and skinnin
 There are also classes in the module that deal with saving and loading skin weight files.
 """
 
+import array
+import hashlib
 import json
+import multiprocessing
 import os
 import time
+from multiprocessing.pool import ThreadPool
 
 import maya.cmds as cmds
-from maya import OpenMaya, OpenMayaAnim
+from maya import OpenMaya
+import maya.api.OpenMaya as api
+import maya.api.OpenMayaAnim as apiAnim
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 import mathUtils as mathUtils
 import utils as utils
+import weightUtils as weightUtils
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -25,6 +37,48 @@ ATTRIBUTES = ['skinningMethod', 'normalizeWeights', 'dropoffRate',
               'useComponents', 'normalizeWeights', 'weightDistribution',
               'heatmapFalloff']
 
+# number of vertices processed between progress bar updates
+PROGRESS_CHUNK = 1000
+
+# plugin/command wrapping MFnSkinCluster.setWeights in an undoable command, and the weights queued for it
+SKIN_WEIGHTS_PLUGIN = "ARTv2_Skin_Weights"
+SKIN_WEIGHTS_COMMAND = "ARTv2_setSkinWeights"
+_PENDING_WEIGHTS = []
+
+# shared geometry -> skinCluster index, see get_skin_cluster_index
+_SKIN_CLUSTER_INDEX = None
+
+# vertex adjacency of meshes, see get_vertex_adjacency
+_ADJACENCY_CACHE = {}
+
+# scale factor memoized during rig builds, and the queries it saved, see begin_scale_factor_cache
+_SCALE_FACTOR = None
+_SCALE_FACTOR_SAVED = 0
+
+# default prune threshold of fixSkinWeights and clean_skin_weights
+PRUNE_THRESHOLD = 0.001
+
+# worker threads used to write weight files in export_skin_weights_batch (only the file I/O overlaps with the main
+# thread, the encoding holds the GIL)
+EXPORT_THREADS = min(multiprocessing.cpu_count(), 8)
+
+# rig rebuilds keep weight snapshots in memory; above this many bytes they are spilled to disk (None: never spill)
+WEIGHT_SNAPSHOT_SPILL_SIZE = None
+
+# prebuilt KDTrees of weight file vertices are cached in this folder next to the weight files, up to this size
+SPATIAL_CACHE_FOLDER = ".spatial_cache"
+SPATIAL_CACHE_SIZE = 256 * 1024 * 1024
+
+# largest distance between a reflected vertex and the vertex it is paired with when mirroring weights
+SYMMETRY_TOLERANCE = 0.001
+
+# symmetry data of meshes that could not store it (referenced or locked), by mesh name, see _set_symmetry_data
+_SYMMETRY_DATA = {}
+
+# match modes of SkinWeights.applySkinWeights and the vertex data they compare
+APPLY_MODES = {'World Position': 'world', 'Local Position': 'local', 'UV Space': 'uv', 'UV Position': 'uv',
+               'Surface Position': 'world'}
+
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # FUNCTIONS (STAND-ALONE)
@@ -55,6 +109,12 @@ def getModuleScaleFactor(elements, attribute, standard):
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 def getScaleFactor():
+    global _SCALE_FACTOR_SAVED
+
+    # during a rig build the geometry doesn't change, see begin_scale_factor_cache
+    if _SCALE_FACTOR is not None:
+        _SCALE_FACTOR_SAVED += 1
+        return _SCALE_FACTOR
 
     upAxis = cmds.upAxis(q=True, ax=True)
     index = 5
@@ -82,6 +142,32 @@ def getScaleFactor():
     return scaleFactor
 
 
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def begin_scale_factor_cache():
+    """Computes the scale factor once and has getScaleFactor return it,
+    without querying the skinned meshes again, until
+    end_scale_factor_cache is called. Meant to wrap a rig build, where
+    every createControl call asks for it.
+    """
+    global _SCALE_FACTOR, _SCALE_FACTOR_SAVED
+    _SCALE_FACTOR = None
+    _SCALE_FACTOR = getScaleFactor()
+    _SCALE_FACTOR_SAVED = 0
+    return _SCALE_FACTOR
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def end_scale_factor_cache():
+    """Stops memoizing the scale factor. Returns the number of
+    getScaleFactor calls that were answered from the cache.
+    """
+    global _SCALE_FACTOR, _SCALE_FACTOR_SAVED
+    saved = _SCALE_FACTOR_SAVED
+    _SCALE_FACTOR = None
+    _SCALE_FACTOR_SAVED = 0
+    return saved
+
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 def createDriverSkeleton():
     # Original Author: Jeremy Ernst
@@ -120,15 +206,31 @@ def createDriverSkeleton():
 def buildSkeleton():
     # get all of the rig modules in the scene
     modules = utils.returnRigModules()
+    jointIndex = utils.get_joint_index()
     renamed = []
 
     returnData = []
     # go through each one, and find the created bones for that modules
     createdJoints = []
     for module in modules:
+        moduleData = jointIndex.module_data(module)
         if module != "ART_Root_Module":
-            joints = cmds.getAttr(module + ".Created_Bones")
-            splitJoints = joints.split("::")
+            splitJoints = moduleData["bones"]
+
+            # find prefix/suffix if available
+            moduleName = moduleData["moduleName"]
+            baseName = moduleData["baseName"]
+            prefix = moduleName.partition(baseName)[0]
+            suffix = moduleName.partition(baseName)[2]
+            if prefix == "":
+                prefixSeparator = " "
+            else:
+                prefixSeparator = prefix
+
+            if suffix == "":
+                suffixSeparator = " "
+            else:
+                suffixSeparator = suffix
 
             for bone in splitJoints:
                 if bone != "":
@@ -140,23 +242,6 @@ def buildSkeleton():
                     newJoint = cmds.joint(name=str(bone))
                     cmds.select(clear=True)
 
-                    # find the LRA control
-                    moduleName = cmds.getAttr(module + ".moduleName")
-                    baseName = cmds.getAttr(module + ".baseName")
-
-                    # find prefix/suffix if available
-                    prefix = moduleName.partition(baseName)[0]
-                    suffix = moduleName.partition(baseName)[2]
-                    if prefix == "":
-                        prefixSeparator = " "
-                    else:
-                        prefixSeparator = prefix
-
-                    if suffix == "":
-                        suffixSeparator = " "
-                    else:
-                        suffixSeparator = suffix
-
                     # get the bone name (for example, thigh)
                     if prefix == "":
                         boneName = bone.partition(suffixSeparator)[0]
@@ -203,13 +288,13 @@ def buildSkeleton():
                                     createdJoints.append([bone, parent])
                                 break
                     else:
-                        parent = cmds.getAttr(module + ".parentModuleBone")
+                        parent = moduleData["parentModuleBone"]
                         if [bone, parent] not in createdJoints:
                             createdJoints.append([bone, parent])
 
         # if this is the root module, it's a bit simpler
         else:
-            jointName = cmds.getAttr(module + ".Created_Bones")
+            jointName = moduleData["Created_Bones"]
             # create the joint
             if cmds.objExists(jointName):
                 cmds.warning(
@@ -914,43 +999,62 @@ def colorControl(control, value=False):
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-def fixSkinWeights():
-    # get selection
+def fixSkinWeights(*args):
+    """Cleans up the skin weights of the selected meshes in place: prunes
+    weights below PRUNE_THRESHOLD, enforces the max influences of each
+    skinCluster that has maintainMaxInfluences on and renormalizes (see
+    clean_skin_weights).
+    """
     selection = cmds.ls(sl=True)
-    newSelection = []
-
-    # loop through selection getting the shapes and meshes
-    for each in selection:
-        shapes = cmds.listRelatives(each, shapes=True, pa=True)
-        meshes = cmds.ls(shapes, type="mesh")
-
-        # duplicate the object
-        duplicateObject = cmds.duplicate(each, rr=True)
-        cmds.delete(duplicateObject[0], ch=True)
 
-        newShapes = cmds.listRelatives(duplicateObject[0], shapes=True, pa=True)
-        newMeshes = cmds.ls(newShapes, type="mesh")
+    cmds.undoInfo(openChunk=True)
+    try:
+        for each in selection:
+            skin_cluster = findRelatedSkinCluster(each)
+            if skin_cluster is None:
+                continue
+            max_influences = 0
+            if cmds.skinCluster(skin_cluster, q=True, mmi=True):
+                max_influences = cmds.skinCluster(skin_cluster, q=True, mi=True)
+            clean_skin_weights(each, skin_cluster, PRUNE_THRESHOLD, max_influences)
+    finally:
+        cmds.undoInfo(closeChunk=True)
 
-        # find skinCluster of original object
-        skinCluster = findRelatedSkinCluster(each)
+    cmds.select(selection)
 
-        # find bones in skinCluster
-        bones = cmds.listConnections(skinCluster + ".matrix", d=True)
-        maxInfs = cmds.skinCluster(skinCluster, q=True, mi=True)
-        newSkin = cmds.skinCluster(bones, duplicateObject[0], mi=maxInfs, dr=4)[0]
-        cmds.copySkinWeights(ss=skinCluster, ds=newSkin, nm=True)
 
-        # rename
-        cmds.delete(each)
-        newObj = cmds.rename(duplicateObject, each)
-        newSelection.append(newObj)
+def clean_skin_weights(mesh, skin_cluster, threshold=PRUNE_THRESHOLD, max_influences=0, normalize=True):
+    """Prunes, caps to max_influences and renormalizes the whole weight
+    matrix of a skinCluster (weightUtils.clean_weights), reading and
+    setting the weights in one call each, and reports what changed.
+    Returns the report dictionary of weightUtils.clean_weights.
+    @PARAMS:
+        mesh: string
+        skin_cluster: string
+        threshold: float, weights below this value are pruned
+        max_influences: int, largest number of influences per vertex, 0 for no limit
+        normalize: bool
+    """
+    influences, weights, count = get_skin_weights(skin_cluster, mesh)
+    weights, report = weightUtils.clean_weights(weights, count, threshold, max_influences, normalize)
+    if report["changed"]:
+        set_skin_weights(skin_cluster, mesh, api.MDoubleArray(list(weights)))
 
-    cmds.select(newSelection)
+    OpenMaya.MGlobal_displayInfo("{0}: weights of {1} of {2} vertices changed, {3} weights pruned (largest change "
+                                 "{4:.4f}, average {5:.4f}).".format(mesh, report["changed"], report["vertices"],
+                                                                    report["pruned"], report["maxDelta"],
+                                                                    report["averageDelta"]))
+    return report
 
 
-def export_skin_weights(file_path=None, geometry=None):
-    """Exports out skin weight from selected geometry"""
-    data = list()
+def export_skin_weights(file_path=None, geometry=None, binary=True, epsilon=0.0):
+    """Exports out skin weight from selected geometry.
+    @PARAMS:
+        file_path: string
+        geometry: string
+        binary: bool, write the binary .weights format instead of legacy JSON
+        epsilon: float, weights at or below this value are pruned
+    """
     # error handling
     if not file_path:
         return OpenMaya.MGlobal_displayError("No file path given.")
@@ -959,60 +1063,160 @@ def export_skin_weights(file_path=None, geometry=None):
         if not geometry:
             return OpenMaya.MGlobal_displayError("No valid geometry.")
 
-    # build up skin data
+    data = gather_skin_weights(geometry, epsilon)
+    write_skin_weights(file_path, data, binary)
+    _display_export_message(file_path, data)
+
+
+def _display_export_message(file_path, data):
+    for skin_data in data:
+        export_message = "SkinCluster: {0} has " \
+                         "been exported to {1}.".format(skin_data["skinCluster"], file_path)
+        OpenMaya.MGlobal_displayInfo(export_message)
+
+
+def gather_skin_weights(geometry, epsilon=0.0):
+    """Reads the skin data records of every skinCluster on the geometry.
+    This is the part of an export that has to run on the main thread.
+    @PARAMS:
+        geometry: string
+        epsilon: float, weights at or below this value are pruned
+    """
+    data = list()
     skin_clusters = find_skin_clusters(geometry)
     if not skin_clusters:
         skin_message = "No skin clusters found on {0}.".format(geometry)
         OpenMaya.MGlobal_displayWarning(skin_message)
     for skin_cluster in skin_clusters:
         skin_data_init = SkinData(skin_cluster)
-        skin_data = skin_data_init.gather_data()
-        data.append(skin_data)
-        args = [skin_data_init.skin_cluster, file_path]
-        export_message = "SkinCluster: {0} has " \
-                         "been exported to {1}.".format(*args)
-        OpenMaya.MGlobal_displayInfo(export_message)
+        data.append(skin_data_init.gather_data(epsilon))
+    return data
 
-    # dump data
+
+def write_skin_weights(file_path, data, binary=True):
+    """Serializes gathered skin data records and writes them to disk.
+    Makes no Maya calls, so it is safe to run on a worker thread.
+    @PARAMS:
+        file_path: string
+        data: list, records returned by gather_skin_weights
+        binary: bool, write the binary .weights format instead of legacy JSON
+    """
     file_path = utils.win_path_convert(file_path)
-    data = json.dumps(data, sort_keys=True, ensure_ascii=True, indent=2)
+    if binary:
+        weightUtils.write_weights_file(file_path, data)
+        return file_path
+
+    records = list()
+    for skin_data in data:
+        record = dict(skin_data)
+        record["weights"] = record.pop("sparseWeights").to_influence_dict()
+        record["blendWeights"] = list(record["blendWeights"])
+        records.append(record)
+    records = json.dumps(records, sort_keys=True, ensure_ascii=True, indent=2)
     fobj = open(file_path, 'wb')
-    fobj.write(data)
+    fobj.write(records)
     fobj.close()
+    return file_path
+
+
+def export_skin_weights_batch(jobs, binary=True, epsilon=0.0, threads=None, progress=None):
+    """Exports the skin weights of several meshes. Skin data is gathered
+    and pruned on the main thread, and each file is handed to a thread
+    pool as soon as its data is read. Encoding is pure Python and holds
+    the GIL, so only the file I/O overlaps with the gathering of the next
+    meshes: the total time is still about the sum of the meshes.
+    @PARAMS:
+        jobs: list of (file_path, geometry) tuples
+        binary: bool, write the binary .weights format instead of legacy JSON
+        epsilon: float, weights at or below this value are pruned
+        threads: int, worker threads, defaults to EXPORT_THREADS
+        progress: callable, called on the main thread with the number of
+                  finished steps (two per job: gather and write)
+    """
+    pool = ThreadPool(min(threads or EXPORT_THREADS, max(len(jobs), 1)))
+    pending = list()
+    step = 0
+    try:
+        for file_path, geometry in jobs:
+            data = gather_skin_weights(geometry, epsilon)
+            pending.append((file_path, data, pool.apply_async(write_skin_weights, (file_path, data, binary))))
+            step += 1
+            if progress:
+                progress(step)
+
+        written = list()
+        for file_path, data, result in pending:
+            written.append(result.get())
+            _display_export_message(file_path, data)
+            step += 1
+            if progress:
+                progress(step)
+    finally:
+        pool.close()
+        pool.join()
+    return written
+
+
+def load_skin_weights_file(file_path):
+    """Loads the skin data records from a weight file, detecting
+    whether it is a binary .weights file or a legacy JSON file.
+    @PARAMS:
+        file_path: string
+    """
+    return weightUtils.read_weight_records(file_path)
+
+
+def compare_skin_weights(file_path, tolerance=weightUtils.DIFF_TOLERANCE):
+    """Compares the weights saved in a weight file with the current
+    weights of the skinClusters on the same shapes in the scene, for
+    checking that a rebuild or an import left the skinning unchanged.
+    Returns the weightUtils.compare_weights report of each shape (see
+    weightUtils.compare_weight_files for comparing two files).
+    @PARAMS:
+        file_path: string
+        tolerance: float, largest weight change that still passes
+    """
+    source_records = load_skin_weights_file(file_path)
+
+    target_records = []
+    for record in source_records:
+        shape = record["shape"]
+        skin_clusters = find_skin_clusters(shape) if cmds.objExists(shape) else []
+        if skin_clusters:
+            scene_record = SkinData(skin_clusters[0]).gather_data()
+            scene_record["shape"] = shape
+            target_records.append(scene_record)
+
+    reports = weightUtils.compare_weight_records(source_records, target_records, tolerance)
+    for report in reports:
+        result = "passed" if report["passed"] else "FAILED"
+        OpenMaya.MGlobal_displayInfo("{0}: {1} of {2} vertices changed, largest change {3:.6f} ({4}, tolerance "
+                                     "{5}).".format(report["shape"], report["changed"], report["vertices"],
+                                                    report["maxDelta"], result, tolerance))
+    return reports
 
 
 def find_skin_clusters(nodes):
-    """Uses all incoming to search relatives to
-    find associated skinCluster.
+    """Finds the skinClusters deforming the given nodes or any of
+    their descendant shapes.
     @PARAMS:
         nodes: list
     """
-    skin_clusters = list()
     if not isinstance(nodes, list):
         nodes = [nodes]
-    relatives = cmds.listRelatives(nodes, ad=True, path=True)
-    all_incoming = utils.find_all_incoming(relatives)
-    for node in all_incoming:
-        if cmds.nodeType(node) == "skinCluster":
-            if node not in skin_clusters:
-                skin_clusters.append(node)
-    return skin_clusters
+    relatives = cmds.listRelatives(nodes, ad=True, path=True) or []
+    return get_skin_cluster_index().skin_clusters(relatives)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 def findRelatedSkinCluster(object):
-    skinClusters = cmds.ls(type='skinCluster')
-
-    for cluster in skinClusters:
-        geometry = cmds.skinCluster(cluster, q=True, g=True)[0]
-        geoTransform = cmds.listRelatives(geometry, parent=True)[0]
-
-        dagPath = cmds.ls(geoTransform, long=True)[0]
+    if not cmds.objExists(object):
+        return None
 
-        if geoTransform == object:
-            return cluster
-        elif dagPath == object:
-            return cluster
+    shapes = cmds.listRelatives(object, shapes=True, path=True) or []
+    skinClusters = get_skin_cluster_index().skin_clusters(shapes)
+    if skinClusters:
+        return skinClusters[0]
 
 
 def import_skin_weights(file_path=None, geometry=None, remove_unused=None):
@@ -1027,8 +1231,7 @@ def import_skin_weights(file_path=None, geometry=None, remove_unused=None):
         path_message = "Could not find {0} file.".format(file_path)
         return OpenMaya.MGlobal_displayWarning(path_message)
 
-    fobj = open(file_path, "rb")
-    data = json.load(fobj)
+    data = load_skin_weights_file(file_path)
 
     # check verts
     vert_check = _vert_check(data, geometry)
@@ -1039,6 +1242,48 @@ def import_skin_weights(file_path=None, geometry=None, remove_unused=None):
     _import_skin_weights(data, geometry, file_path, remove_unused)
 
 
+def snapshot_skin_weights(store, geometry, epsilon=0.0):
+    """Gathers the skin weights of the geometry into a
+    weightUtils.WeightSnapshotStore instead of a weight file.
+    @PARAMS:
+        store: weightUtils.WeightSnapshotStore
+        geometry: string
+        epsilon: float, weights at or below this value are pruned
+    """
+    data = gather_skin_weights(geometry, epsilon)
+    if data:
+        store.put(geometry, data)
+    return bool(data)
+
+
+def restore_skin_weights(store, geometry, remove_unused=None, transfers=None):
+    """Applies the snapshot taken by snapshot_skin_weights back onto the
+    geometry, and removes it from the store.
+    @PARAMS:
+        store: weightUtils.WeightSnapshotStore
+        geometry: string
+        remove_unused: bool
+        transfers: dict of influence -> influence taking over its weights
+                   before they are applied (see weightUtils.transfer_weights)
+    """
+    data = store.pop(geometry)
+    if not data:
+        return False
+
+    if transfers:
+        for skin_data in data:
+            sparse = weightUtils.sparse_weights_from_record(skin_data)
+            skin_data["sparseWeights"] = weightUtils.transfer_weights(sparse, transfers)
+
+    # check verts
+    vert_check = _vert_check(data, geometry)
+    if not vert_check:
+        return False
+
+    _import_skin_weights(data, geometry, "snapshot of " + geometry, remove_unused)
+    return True
+
+
 def _import_skin_weights(data, geometry, file_path, remove_unused=None):
     # loop through skin data
     for skin_data in data:
@@ -1058,9 +1303,9 @@ def _import_skin_weights(data, geometry, file_path, remove_unused=None):
             skin_cluster[0].set_data(skin_data)
         if remove_unused:
             if skin_clusters:
-                _remove_unused_influences(skin_clusters[0])
+                remove_unused_influences(skin_clusters[0])
             else:
-                _remove_unused_influences(skin_cluster[1])
+                remove_unused_influences(skin_cluster[1])
         OpenMaya.MGlobal_displayInfo("Imported {0}".format(file_path))
 
 
@@ -1076,9 +1321,18 @@ def _vert_check(data, geometry):
     return True
 
 
+def _skin_data_influences(skin_data):
+    # binary files store the influence order, legacy JSON files only the weight dict
+    if "sparseWeights" in skin_data:
+        return list(skin_data["sparseWeights"].influences)
+    if "influences" in skin_data:
+        return list(skin_data["influences"])
+    return skin_data["weights"].keys()
+
+
 def _create_new_skin_cluster(skin_data, geometry):
     # check joints
-    joints = skin_data["weights"].keys()
+    joints = _skin_data_influences(skin_data)
     unused_joints = list()
     scene_joints = set([utils.remove_namespace(joint) for joint \
                         in cmds.ls(type="joint")])
@@ -1098,20 +1352,893 @@ def _create_new_skin_cluster(skin_data, geometry):
         pass
 
 
-def _remove_unused_influences(skin_cluster):
-    influences_to_remove = list()
-    weighted_influences = cmds.skinCluster(skin_cluster, q=True, wi=True)
-    final_transforms = cmds.skinCluster(skin_cluster, q=True, inf=True)
-    for influence in final_transforms:
-        if influence not in weighted_influences:
-            influences_to_remove.append(influence)
-    for influence in influences_to_remove:
-        cmds.skinCluster(skin_cluster, e=True, ri=influence)
+def get_unused_influences(skin_cluster, cache=None):
+    """Returns the influences of the skinCluster that carry no weight,
+    found from the column sums of its weight matrix.
+    @PARAMS:
+        skin_cluster: string
+        cache: SkinWeightCache of the skinCluster, to use its matrix
+               instead of reading the weights
+    """
+    if cache is not None:
+        influences, weights, count = cache.influences, cache.matrix(), cache.count
+    else:
+        influences, weights, count = get_skin_weights(skin_cluster)
+    return [influences[column] for column in weightUtils.unused_columns(weights, count)]
+
+
+def remove_unused_influences(skin_cluster, cache=None, compact=False):
+    """Removes every influence that carries no weight with a single
+    skinCluster edit, rather than one edit (and re-evaluation) per
+    influence. Returns the removed influences.
+    @PARAMS:
+        skin_cluster: string
+        cache: SkinWeightCache of the skinCluster, see get_unused_influences
+        compact: bool, close the gaps left in the influence indices
+                 afterwards. This can't be undone and clears the
+                 undo queue (see compact_influences)
+    """
+    unused = get_unused_influences(skin_cluster, cache)
+    if unused:
+        cmds.skinCluster(skin_cluster, e=True, ri=unused)
+    if compact:
+        compact_influences(skin_cluster)
+    return unused
+
+
+def compact_influences(skin_cluster):
+    """Moves the influences of the skinCluster to consecutive matrix
+    indices, closing the gaps left by removed influences, and rewrites
+    the weights to match. The weight list is rebuilt through the API,
+    so this step can't be undone: undo is off while it runs, and the
+    undo queue is flushed afterwards, since undoing any earlier edit
+    would leave influences and weights on different indices. Returns
+    the moved influences.
+    @PARAMS:
+        skin_cluster: string
+    """
+    undo_state = cmds.undoInfo(q=True, state=True)
+    cmds.undoInfo(stateWithoutFlush=False)
+    try:
+        moves = _compact_influences(skin_cluster)
+    finally:
+        cmds.undoInfo(stateWithoutFlush=undo_state)
+    if moves:
+        cmds.flushUndo()
+    return moves
+
+
+def _compact_influences(skin_cluster):
+    skin_fn = get_skin_cluster_fn(skin_cluster)
+    influence_paths = skin_fn.influenceObjects()
+    moves = []
+    for column in xrange(len(influence_paths)):
+        index = skin_fn.indexForInfluenceObject(influence_paths[column])
+        if index != column:
+            moves.append((index, column, influence_paths[column].partialPathName()))
+    if not moves:
+        return []
+
+    # the columns of the weight matrix keep their order, only the indices behind them change
+    mesh = skin_fn.getPathAtIndex(0).partialPathName()
+    influences, weights, count = get_skin_weights(skin_cluster, mesh)
+
+    existing = {}
+    for attr in ("matrix", "bindPreMatrix", "lockWeights", "influenceColor"):
+        existing[attr] = set(cmds.getAttr(skin_cluster + "." + attr, multiIndices=True) or [])
+
+    for index, column, influence in sorted(moves):
+        for attr in ("matrix", "lockWeights", "influenceColor"):
+            old_plug = "{0}.{1}[{2}]".format(skin_cluster, attr, index)
+            for source in cmds.listConnections(old_plug, s=True, d=False, plugs=True) or []:
+                cmds.connectAttr(source, "{0}.{1}[{2}]".format(skin_cluster, attr, column), force=True)
+
+        bind_pre_matrix = cmds.getAttr("{0}.bindPreMatrix[{1}]".format(skin_cluster, index))
+        cmds.setAttr("{0}.bindPreMatrix[{1}]".format(skin_cluster, column), bind_pre_matrix, type="matrix")
+
+        for attr in ("matrix", "bindPreMatrix", "lockWeights", "influenceColor"):
+            if index in existing[attr]:
+                cmds.removeMultiInstance("{0}.{1}[{2}]".format(skin_cluster, attr, index), b=True)
+
+    # drop the weights still stored under the old indices, then write them back under the new ones
+    weight_list = api.MFnDependencyNode(skin_fn.object()).findPlug("weightList", False)
+    modifier = api.MDGModifier()
+    for index in weight_list.getExistingArrayAttributeIndices():
+        modifier.removeMultiInstance(weight_list.elementByLogicalIndex(index), True)
+    modifier.doIt()
+
+    set_skin_weights(skin_cluster, mesh, weights)
+    return [influence for index, column, influence in moves]
+
+
+def get_spatial_index_cache(weight_file=None):
+    """Returns the on-disk KDTree cache for the given weight file. Trees
+    are stored in a folder next to the weight file, or in Maya's temp
+    folder when there is no file.
+    @PARAMS:
+        weight_file: string
+    """
+    if weight_file:
+        directory = os.path.join(os.path.dirname(os.path.abspath(weight_file)), SPATIAL_CACHE_FOLDER)
+    else:
+        directory = os.path.join(cmds.internalVar(utd=True), "artv2", SPATIAL_CACHE_FOLDER)
+    return mathUtils.SpatialIndexCache(directory, SPATIAL_CACHE_SIZE)
+
+
+def get_skin_cluster_index():
+    """Returns the shared SkinClusterIndex, creating it on first use.
+    """
+    global _SKIN_CLUSTER_INDEX
+    if _SKIN_CLUSTER_INDEX is None:
+        _SKIN_CLUSTER_INDEX = SkinClusterIndex()
+    return _SKIN_CLUSTER_INDEX
+
+
+def get_dag_path(node):
+    """Returns the API 2.0 MDagPath of the given node.
+    @PARAMS:
+        node: string
+    """
+    selection_list = api.MSelectionList()
+    selection_list.add(node)
+    return selection_list.getDagPath(0)
+
+
+def get_mesh_points(mesh, world=True):
+    """Reads every vertex position of a mesh in one call, in the same
+    units cmds.pointPosition returns.
+    @PARAMS:
+        mesh: string
+        world: bool, world space if True, local (object) space otherwise
+    """
+    space = api.MSpace.kWorld if world else api.MSpace.kObject
+    points = api.MFnMesh(get_dag_path(mesh)).getPoints(space)
+    scale = api.MDistance.internalToUI(1.0)
+    if scale == 1.0:
+        return [(point.x, point.y, point.z) for point in points]
+    return [(point.x * scale, point.y * scale, point.z * scale) for point in points]
+
+
+def get_vertex_uvs(mesh, uv_set=None):
+    """Returns, for every vertex, the flat [u, v, u, v, ...] list of the
+    UVs assigned to it, ordered by UV index like
+    polyListComponentConversion + polyEditUV return them.
+    @PARAMS:
+        mesh: string
+        uv_set: string, defaults to the current UV set
+    """
+    mesh_fn = api.MFnMesh(get_dag_path(mesh))
+    if uv_set is None:
+        uv_set = mesh_fn.currentUVSetName()
+    us, vs = mesh_fn.getUVs(uv_set)
+    polygon_counts, vertex_list = mesh_fn.getVertices()
+    uv_counts, uv_ids = mesh_fn.getAssignedUVs(uv_set)
+
+    vertex_uv_ids = [set() for vertex in xrange(mesh_fn.numVertices)]
+    vertex_index = 0
+    uv_index = 0
+    for polygon_count, uv_count in zip(polygon_counts, uv_counts):
+        # faces without UVs have no entries in uv_ids
+        if uv_count:
+            for count in xrange(polygon_count):
+                vertex_uv_ids[vertex_list[vertex_index + count]].add(uv_ids[uv_index + count])
+        vertex_index += polygon_count
+        uv_index += uv_count
+
+    vertex_uvs = []
+    for ids in vertex_uv_ids:
+        uvs = []
+        for uv_id in sorted(ids):
+            uvs.extend((us[uv_id], vs[uv_id]))
+        vertex_uvs.append(uvs)
+    return vertex_uvs
+
+
+def get_skin_cluster_fn(skin_cluster):
+    """Returns an API 2.0 MFnSkinCluster for the given skinCluster.
+    @PARAMS:
+        skin_cluster: string
+    """
+    selection_list = api.MSelectionList()
+    selection_list.add(skin_cluster)
+    return apiAnim.MFnSkinCluster(selection_list.getDependNode(0))
+
+
+def get_skin_influences(skin_cluster):
+    """Returns the influence names of a skinCluster in physical index
+    order, which is the column order of getWeights/setWeights.
+    @PARAMS:
+        skin_cluster: string or MFnSkinCluster
+    """
+    skin_fn = skin_cluster
+    if not isinstance(skin_fn, apiAnim.MFnSkinCluster):
+        skin_fn = get_skin_cluster_fn(skin_cluster)
+    influence_paths = skin_fn.influenceObjects()
+    return [influence_paths[index].partialPathName() for index in xrange(len(influence_paths))]
+
+
+def get_skin_geometry_path(skin_fn, mesh=None):
+    """Returns the dag path of the shape a skinCluster deforms, as the
+    skinCluster reports it. A given mesh, transform or shape, only picks
+    which of the skinCluster's output shapes that is, so weights are
+    never read from or written to a path the skinCluster doesn't deform.
+    @PARAMS:
+        skin_fn: MFnSkinCluster
+        mesh: string, defaults to the first geometry of the skinCluster
+    """
+    if not mesh:
+        return skin_fn.getPathAtIndex(0)
+
+    mesh_path = get_dag_path(mesh).fullPathName()
+    for shape in skin_fn.getOutputGeometry():
+        dag_path = skin_fn.getPathAtIndex(skin_fn.indexForOutputShape(shape))
+        transform_path = api.MDagPath(dag_path)
+        transform_path.pop()
+        if mesh_path in (dag_path.fullPathName(), transform_path.fullPathName()):
+            return dag_path
+    raise RuntimeError("{0} is not deformed by {1}.".format(mesh, skin_fn.name()))
+
+
+def set_skin_weights(skin_cluster, mesh, weights, influences=None, normalize=False, vertices=None):
+    """Sets the weight matrix of a skinCluster, or the rows of some of
+    its vertices, with a single MFnSkinCluster.setWeights call. The call
+    goes through the undoable ARTv2_setSkinWeights command; if that
+    plugin can't be loaded the weights are still set, but without undo.
+    @PARAMS:
+        skin_cluster: string
+        mesh: string, transform or shape deformed by the skinCluster
+              (see get_skin_geometry_path)
+        weights: flat, vertex-major sequence of weights
+        influences: list of influence indices (columns), defaults to all
+        normalize: bool
+        vertices: sorted list of the vertex indices the weights are the
+                  rows of, defaults to every vertex
+    """
+    if not isinstance(weights, api.MDoubleArray):
+        weights = api.MDoubleArray(weights)
+    if influences is None:
+        influences = range(len(get_skin_influences(skin_cluster)))
+    payload = {"skinCluster": skin_cluster, "mesh": mesh, "influences": list(influences),
+               "weights": weights, "normalize": normalize, "vertices": vertices}
+
+    try:
+        if not cmds.pluginInfo(SKIN_WEIGHTS_PLUGIN, q=True, loaded=True):
+            cmds.loadPlugin(SKIN_WEIGHTS_PLUGIN)
+    except RuntimeError:
+        cmds.warning("Could not load " + SKIN_WEIGHTS_PLUGIN + ". Skin weights will be set without undo.")
+        skin_fn = get_skin_cluster_fn(skin_cluster)
+        dag_path = get_skin_geometry_path(skin_fn, mesh)
+        if vertices is None:
+            components = get_complete_vertex_component(dag_path)
+        else:
+            components = get_vertex_component(vertices)
+        skin_fn.setWeights(dag_path, components, api.MIntArray(payload["influences"]), weights, normalize)
+        return
+
+    _PENDING_WEIGHTS.append(payload)
+    try:
+        getattr(cmds, SKIN_WEIGHTS_COMMAND)()
+    finally:
+        # never leave stale weights behind for the next call if the command failed
+        if payload in _PENDING_WEIGHTS:
+            _PENDING_WEIGHTS.remove(payload)
+
+
+def pop_pending_weights():
+    """Hands the weights queued by set_skin_weights over to the
+    ARTv2_setSkinWeights command."""
+    if _PENDING_WEIGHTS:
+        return _PENDING_WEIGHTS.pop()
+
+
+def get_mesh_triangles(mesh):
+    """Returns the flat list of vertex indices of every triangle of the
+    mesh (three per triangle), as Maya triangulates it.
+    @PARAMS:
+        mesh: string
+    """
+    triangle_counts, triangle_vertices = api.MFnMesh(get_dag_path(mesh)).getTriangles()
+    return list(triangle_vertices)
+
+
+def get_symmetry_map(mesh, axis=0, tolerance=SYMMETRY_TOLERANCE):
+    """Returns the vertex -> mirror vertex table of the mesh (-1 for
+    vertices without a mirror) and the tolerance report of
+    mathUtils.build_symmetry_map. The table is stored on the mesh (in
+    memory for meshes that can't be edited) and only rebuilt when its
+    vertex positions change.
+    @PARAMS:
+        mesh: string
+        axis: int, mirrored axis (0 for x)
+        tolerance: float, largest distance between a reflected vertex and its match
+    """
+    points = get_mesh_points(mesh, world=True)
+    digest = hashlib.md5(array.array("d", [value for point in points for value in point]))
+    key = "{0}:{1}:{2}".format(digest.hexdigest(), axis, tolerance)
+
+    data = _get_symmetry_data(mesh)
+    if data.get("key") == key:
+        if "mirror" in data:
+            return list(data["mirror"]), data["report"]
+        if cmds.objExists(mesh + ".symmetryMap"):
+            return list(cmds.getAttr(mesh + ".symmetryMap")), data["report"]
+
+    mirror, report = mathUtils.build_symmetry_map(points, axis, tolerance)
+    _set_symmetry_data(mesh, {"key": key, "report": report, "mirror": mirror})
+    return mirror, report
+
+
+def get_influence_mirror_map(mesh, influences, axis=0, tolerance=0.01):
+    """Returns a dict mapping each influence to its mirror influence.
+    Pairs come from the Created_Bones of rig modules and their
+    mirrorModule. Influences outside of mirrored modules are matched by
+    reflected world position, and map to themselves when nothing is
+    found. The map is stored on the mesh with the symmetry map, and
+    rebuilt when the modules, the influences or their positions change.
+    @PARAMS:
+        mesh: string
+        influences: list of influence names
+        axis: int, mirrored axis (0 for x)
+        tolerance: float, largest distance between a reflected influence and its match
+    """
+    # module name, mirrorModule and Created_Bones of each rig module
+    modules = {}
+    for module in utils.returnRigModules():
+        if cmds.objExists(module + ".Created_Bones"):
+            mirror_name = None
+            if cmds.objExists(module + ".mirrorModule"):
+                mirror_name = cmds.getAttr(module + ".mirrorModule")
+            modules[cmds.getAttr(module + ".moduleName")] = (mirror_name, cmds.getAttr(module + ".Created_Bones"))
+    positions = [list(cmds.xform(influence, q=True, ws=True, t=True)) for influence in influences]
+
+    digest = hashlib.md5(json.dumps([sorted(modules.items()), list(influences), positions], sort_keys=True))
+    key = "{0}:{1}:{2}".format(digest.hexdigest(), axis, tolerance)
+    data = _get_symmetry_data(mesh)
+    if data.get("influenceKey") == key:
+        return data["influences"]
+
+    # pairs from the mirrorModule setting of each rig module
+    pairs = {}
+    for mirror_name, created_bones in modules.values():
+        if mirror_name not in modules:
+            continue
+        bones = [bone for bone in created_bones.split("::") if bone != ""]
+        mirror_bones = [bone for bone in modules[mirror_name][1].split("::") if bone != ""]
+        if len(bones) == len(mirror_bones):
+            pairs.update(zip(bones, mirror_bones))
+
+    names = dict((influence.rpartition("|")[2], influence) for influence in influences)
+    influence_map = {}
+    for influence in influences:
+        mirror = names.get(pairs.get(influence.rpartition("|")[2]))
+        if mirror is not None:
+            influence_map[influence] = mirror
+
+    # everything else by position
+    unmatched = [influence for influence in influences if influence not in influence_map]
+    if unmatched:
+        tree = mathUtils.KDTree(positions)
+        for influence in unmatched:
+            position = list(positions[influences.index(influence)])
+            position[axis] = -position[axis]
+            match = tree.query(position, 1, tolerance)
+            influence_map[influence] = influences[match[0]] if match else influence
+
+    data["influenceKey"] = key
+    data["influences"] = influence_map
+    _set_symmetry_data(mesh, data)
+    return influence_map
+
+
+def mirror_skin_weights(mesh, skin_cluster, vertices, axis=0, tolerance=SYMMETRY_TOLERANCE):
+    """Copies the weights of the given vertices onto their mirror
+    vertices, swapping each influence for its mirror influence. The
+    weight matrix is read once, permuted, and set back in one call.
+    Returns the mirror vertices that were set and the vertices that have
+    no mirror.
+    @PARAMS:
+        mesh: string
+        skin_cluster: string
+        vertices: list of vertex indices
+        axis: int, mirrored axis (0 for x)
+        tolerance: float, largest distance between a reflected vertex and its match
+    """
+    mirror, report = get_symmetry_map(mesh, axis, tolerance)
+    if report["inexact"] or report["unmatched"]:
+        OpenMaya.MGlobal_displayInfo("Symmetry of {0}: {1} exact, {2} within {3} (largest offset {4}), "
+                                     "{5} without a mirror.".format(mesh, report["exact"], report["inexact"],
+                                                                    tolerance, report["maxDistance"],
+                                                                    report["unmatched"]))
+
+    influences, weights, count = get_skin_weights(skin_cluster)
+    influence_map = get_influence_mirror_map(mesh, influences, axis)
+    columns = dict((influence, column) for column, influence in enumerate(influences))
+    permutation = [columns[influence_map[influence]] for influence in influences]
+
+    sources = [vertex for vertex in vertices if mirror[vertex] != -1]
+    skipped = [vertex for vertex in vertices if mirror[vertex] == -1]
+    targets = [mirror[vertex] for vertex in sources]
+
+    if numpy is not None:
+        matrix = numpy.array(weights).reshape(-1, count)
+        rows = numpy.zeros((len(sources), count))
+        numpy.add.at(rows, (slice(None), permutation), matrix[sources])
+        matrix[targets] = rows
+        weights = matrix.ravel()
+    else:
+        source_weights = list(weights)
+        weights = list(source_weights)
+        for source, target in zip(sources, targets):
+            row = [0.0] * count
+            base = source * count
+            for column in range(count):
+                row[permutation[column]] += source_weights[base + column]
+            weights[target * count:(target + 1) * count] = row
+
+    set_skin_weights(skin_cluster, mesh, api.MDoubleArray(list(weights)))
+    return targets, skipped
+
+
+def _get_symmetry_data(mesh):
+    if mesh in _SYMMETRY_DATA:
+        return dict(_SYMMETRY_DATA[mesh])
+    if not cmds.objExists(mesh + ".symmetryData"):
+        return {}
+    try:
+        return json.loads(cmds.getAttr(mesh + ".symmetryData") or "{}")
+    except ValueError:
+        return {}
+
+
+def _set_symmetry_data(mesh, data):
+    # the mirror table, when given, goes to its own attribute
+    stored = dict(data)
+    mirror = stored.pop("mirror", None)
+    try:
+        if mirror is not None:
+            if not cmds.objExists(mesh + ".symmetryMap"):
+                cmds.addAttr(mesh, longName="symmetryMap", dt="Int32Array")
+            cmds.setAttr(mesh + ".symmetryMap", mirror, type="Int32Array")
+        if not cmds.objExists(mesh + ".symmetryData"):
+            cmds.addAttr(mesh, longName="symmetryData", dt="string")
+        cmds.setAttr(mesh + ".symmetryData", json.dumps(stored), type="string")
+    except RuntimeError:
+        # referenced or locked meshes can't take the attributes, keep the data in memory for this session instead
+        _SYMMETRY_DATA[mesh] = data
+    else:
+        _SYMMETRY_DATA.pop(mesh, None)
+
+
+def get_vertex_adjacency(mesh):
+    """Returns the vertex adjacency of the mesh in CSR form (offsets,
+    neighbors): the neighbours of vertex v are
+    neighbors[offsets[v]:offsets[v + 1]]. Built from the polygon edges
+    in one pass and cached per mesh until its topology changes.
+    @PARAMS:
+        mesh: string
+    """
+    dag_path = get_dag_path(mesh)
+    mesh_fn = api.MFnMesh(dag_path)
+    handle = api.MObjectHandle(dag_path.node())
+    key = handle.hashCode()
+    topology = (mesh_fn.numVertices, mesh_fn.numEdges, mesh_fn.numFaceVertices)
+
+    # hash codes can collide, so the entry also has to be for this mesh
+    cached = _ADJACENCY_CACHE.get(key)
+    if cached is not None and cached[0].isValid() and cached[0].object() == dag_path.node() and \
+            cached[1] == topology:
+        return cached[2]
+
+    face_counts, face_vertices = mesh_fn.getVertices()
+    adjacent = [set() for vertex in range(mesh_fn.numVertices)]
+    start = 0
+    for count in face_counts:
+        face = face_vertices[start:start + count]
+        start += count
+        for i in range(count):
+            a, b = face[i], face[(i + 1) % count]
+            adjacent[a].add(b)
+            adjacent[b].add(a)
+
+    offsets = array.array("I", [0])
+    neighbors = array.array("I")
+    for vertex_neighbors in adjacent:
+        neighbors.extend(sorted(vertex_neighbors))
+        offsets.append(len(neighbors))
+
+    _ADJACENCY_CACHE[key] = (handle, topology, (offsets, neighbors))
+    return offsets, neighbors
+
+
+def get_locked_influences(skin_cluster, influences=None):
+    """Returns the influences of the skinCluster whose weights are
+    locked (as set by the weight table's lock/unlock). The
+    lockInfluenceWeights attribute of every influence is read through
+    the API in one pass.
+    @PARAMS:
+        skin_cluster: string
+        influences: list, defaults to all influences of the skinCluster
+    """
+    wanted = None if influences is None else set(influences)
+    influence_paths = get_skin_cluster_fn(skin_cluster).influenceObjects()
+
+    locked = []
+    for index in xrange(len(influence_paths)):
+        influence = influence_paths[index].partialPathName()
+        if wanted is not None and influence not in wanted:
+            continue
+        node_fn = api.MFnDependencyNode(influence_paths[index].node())
+        if node_fn.hasAttribute("lockInfluenceWeights") and node_fn.findPlug("lockInfluenceWeights", False).asBool():
+            locked.append(influence)
+    return locked
+
+
+def smooth_skin_weights(mesh, skin_cluster, vertices, iterations=1, strength=1.0):
+    """Smooths the weights of the given vertices towards the average of
+    their neighbours (weightUtils.smooth_weights), keeping locked
+    influences and renormalizing. Weights are read in bulk, and only the
+    rows of the smoothed vertices are set back.
+    @PARAMS:
+        mesh: string
+        skin_cluster: string
+        vertices: list of vertex indices
+        iterations: int, number of smoothing passes
+        strength: float, 1.0 replaces the weights with the neighbour average
+    """
+    vertices = sorted(set(vertices))
+    offsets, neighbors = get_vertex_adjacency(mesh)
+    influences, weights, count = get_skin_weights(skin_cluster, mesh)
+    locked = set(get_locked_influences(skin_cluster, influences))
+    locked_columns = [column for column, influence in enumerate(influences) if influence in locked]
+
+    weights = weightUtils.smooth_weights(weights, count, offsets, neighbors, vertices, iterations, strength,
+                                         locked_columns)
+    rows = [float(value) for vertex in vertices for value in weights[vertex * count:(vertex + 1) * count]]
+    set_skin_weights(skin_cluster, mesh, api.MDoubleArray(rows), vertices=vertices)
+
+
+def get_vertex_component(indices):
+    """Returns an API 2.0 vertex component holding the given indices.
+    @PARAMS:
+        indices: list of vertex indices
+    """
+    component_fn = api.MFnSingleIndexedComponent()
+    components = component_fn.create(api.MFn.kMeshVertComponent)
+    component_fn.addElements(list(indices))
+    return components
+
+
+def get_vertex_indices(components):
+    """Returns the sorted vertex indices of the given components, in any
+    notation (flat or ranges). Faces and edges are converted to their
+    vertices.
+    @PARAMS:
+        components: list of component names
+    """
+    vertices = cmds.polyListComponentConversion(components, toVertex=True) or []
+    selection_list = api.MSelectionList()
+    for vertex in vertices:
+        selection_list.add(vertex)
+
+    indices = set()
+    for i in range(selection_list.length()):
+        dag_path, component = selection_list.getComponent(i)
+        if not component.isNull():
+            indices.update(api.MFnSingleIndexedComponent(component).getElements())
+    return sorted(indices)
+
+
+def get_complete_vertex_component(dag_path):
+    """Returns a vertex component covering every point of the shape.
+    @PARAMS:
+        dag_path: MDagPath (API 2.0)
+    """
+    component_fn = api.MFnSingleIndexedComponent()
+    components = component_fn.create(api.MFn.kMeshVertComponent)
+    component_fn.setCompleteData(api.MItGeometry(dag_path).count())
+    return components
+
+
+def get_skin_weights(skin_cluster, mesh=None):
+    """Reads the whole weight matrix of a skinCluster in one call.
+    Returns the influence names (as skinPercent reports them), the flat,
+    vertex-major MDoubleArray of weights and the number of influences.
+    @PARAMS:
+        skin_cluster: string
+        mesh: string, transform or shape deformed by the skinCluster,
+              defaults to its first geometry (see get_skin_geometry_path)
+    """
+    skin_fn = get_skin_cluster_fn(skin_cluster)
+
+    dag_path = get_skin_geometry_path(skin_fn, mesh)
+    components = get_complete_vertex_component(dag_path)
+
+    influences = get_skin_influences(skin_fn)
+    weights, influence_count = skin_fn.getWeights(dag_path, components)
+    return influences, weights, influence_count
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 # CLASSES
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class SkinClusterIndex(object):
+    '''
+    Maps every deformed shape in the scene to the skinClusters deforming it, built in one pass over the skinClusters.
+    Nodes are tracked by MObjectHandle, so renaming or reparenting geometry keeps the index valid. Shapes are looked
+    up by handle hash code, which is not unique, so each entry keeps the shape's handle to confirm a match. The index
+    is rebuilt lazily after a skinCluster is created or deleted, a connection to a deformer or shape changes, or a new
+    scene is opened.
+    '''
+
+    def __init__(self):
+        self._index = None
+        self._callbacks = []
+        self.builds = 0
+
+    def __del__(self):
+        self.remove_callbacks()
+
+    def invalidate(self, *args):
+        self._index = None
+
+    def build(self):
+        """
+        Scans all skinClusters and records the output geometry of each one.
+        """
+
+        if not self._callbacks:
+            self.add_callbacks()
+
+        index = {}
+        iterator = api.MItDependencyNodes(api.MFn.kSkinClusterFilter)
+        while not iterator.isDone():
+            skin_cluster = iterator.thisNode()
+            handle = api.MObjectHandle(skin_cluster)
+            for geometry in apiAnim.MFnSkinCluster(skin_cluster).getOutputGeometry():
+                geometry_handle = api.MObjectHandle(geometry)
+                index.setdefault(geometry_handle.hashCode(), []).append((geometry_handle, handle))
+            iterator.next()
+
+        self._index = index
+        self.builds += 1
+
+    def skin_clusters(self, shapes):
+        """
+        :param shapes: list of shape node names.
+        :return: names of the skinClusters deforming any of the shapes, without duplicates.
+        """
+
+        if self._index is None:
+            self.build()
+
+        skin_clusters = []
+        for shape in shapes:
+            try:
+                selection_list = api.MSelectionList()
+                selection_list.add(shape)
+                shape_object = selection_list.getDependNode(0)
+            except RuntimeError:
+                continue
+
+            for geometry_handle, handle in self._index.get(api.MObjectHandle(shape_object).hashCode(), []):
+                if not handle.isValid() or not geometry_handle.isValid():
+                    self.invalidate()
+                    return self.skin_clusters(shapes)
+                # hash codes can collide, so check the entry is this shape
+                if geometry_handle.object() != shape_object:
+                    continue
+                name = api.MFnDependencyNode(handle.object()).name()
+                if name not in skin_clusters:
+                    skin_clusters.append(name)
+        return skin_clusters
+
+    def add_callbacks(self):
+        """
+        Registers the scene callbacks that invalidate the index.
+        """
+
+        self._callbacks.append(api.MDGMessage.addNodeAddedCallback(self.invalidate, "skinCluster"))
+        self._callbacks.append(api.MDGMessage.addNodeRemovedCallback(self.invalidate, "skinCluster"))
+        self._callbacks.append(api.MDGMessage.addConnectionCallback(self._connection_changed))
+        for message in (api.MSceneMessage.kAfterNew, api.MSceneMessage.kAfterOpen):
+            self._callbacks.append(api.MSceneMessage.addCallback(message, self.invalidate))
+
+    def remove_callbacks(self):
+        """
+        Removes the callbacks registered by add_callbacks.
+        """
+
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def _connection_changed(self, source_plug, destination_plug, made, *args):
+        if self._index is None:
+            return
+        for plug in (source_plug, destination_plug):
+            node = plug.node()
+            if node.hasFn(api.MFn.kGeometryFilt) or node.hasFn(api.MFn.kShape):
+                self.invalidate()
+                return
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class SkinWeightCache(object):
+    '''
+    Keeps the weight matrix of one skinCluster in memory, so tools can look up weights of many vertices without a
+    skinPercent query per vertex and influence.
+
+    The matrix is read in one call the first time it is needed. Edits made by the owning tool are picked up with
+    update(), which re-reads only the edited vertices. Weights set from anywhere else (paint tool, other scripts) are
+    caught by an attribute-changed callback on the skinCluster: the touched vertices are re-read on the next lookup,
+    and influence changes, undo and redo throw the whole matrix away.
+
+    The callbacks hold bound methods, so the cache is never garbage collected while they are registered: owners must
+    call remove_callbacks() when they are done with it.
+    '''
+
+    def __init__(self, skin_cluster):
+        self.skin_cluster = skin_cluster
+        self.skin_fn = get_skin_cluster_fn(skin_cluster)
+        self.dag_path = self.skin_fn.getPathAtIndex(0)
+        self.mesh = self.dag_path.partialPathName()
+        self.influences = []
+        self.columns = {}
+        self.count = 0
+        self.weights = None
+        self.dirty = set()
+        self.loads = 0
+        self._callbacks = []
+        self.add_callbacks()
+
+    def __del__(self):
+        self.remove_callbacks()
+
+    def invalidate(self, *args):
+        self.weights = None
+        self.dirty = set()
+
+    def load(self):
+        """
+        Reads the whole weight matrix.
+        """
+
+        self.influences, weights, self.count = get_skin_weights(self.skin_cluster)
+        self.weights = array.array("d", weights)
+        self.columns = dict((name, column) for column, name in enumerate(self.influences))
+        for column, name in enumerate(self.influences):
+            self.columns.setdefault(name.rpartition("|")[2], column)
+        self.dirty = set()
+        self.loads += 1
+
+    def update(self, vertices=None):
+        """
+        Re-reads the weights of the given vertices, or of the vertices marked dirty by the callbacks.
+
+        :param vertices: list of vertex indices.
+        """
+
+        if self.weights is None:
+            self.load()
+            return
+
+        indices = sorted(set(vertices) | self.dirty if vertices is not None else self.dirty)
+        self.dirty = set()
+        if not indices:
+            return
+
+        components = get_vertex_component(indices)
+        weights, count = self.skin_fn.getWeights(self.dag_path, components)
+        if count != self.count:
+            self.load()
+            return
+
+        weights = array.array("d", weights)
+
+        for row, vertex in enumerate(api.MFnSingleIndexedComponent(components).getElements()):
+            self.weights[vertex * count:(vertex + 1) * count] = weights[row * count:(row + 1) * count]
+
+    def matrix(self):
+        """
+        :return: the flat, vertex-major weight matrix, refreshed if needed.
+        """
+
+        if self.weights is None:
+            self.load()
+        elif self.dirty:
+            self.update()
+        return self.weights
+
+    def vertex_influences(self, vertices, ignore_below=0.0):
+        """
+        :param vertices: list of vertex indices.
+        :param ignore_below: weights at or below this value do not count.
+        :return: names of the influences weighted on any of the vertices, in skinCluster order.
+        """
+
+        weights, count = self.matrix(), self.count
+        used = set()
+        for vertex in vertices:
+            base = vertex * count
+            for column in range(count):
+                if weights[base + column] > ignore_below:
+                    used.add(column)
+        return [self.influences[column] for column in sorted(used)]
+
+    def average_weights(self, vertices, influences):
+        """
+        :param vertices: list of vertex indices.
+        :param influences: list of influence names.
+        :return: the average weight of each influence over the vertices.
+        """
+
+        weights, count = self.matrix(), self.count
+        averages = []
+        for influence in influences:
+            column = self.columns.get(influence)
+            if column is None or not vertices:
+                averages.append(0.0)
+                continue
+            averages.append(sum(weights[vertex * count + column] for vertex in vertices) / float(len(vertices)))
+        return averages
+
+    def influenced_vertices(self, influence, ignore_below=0.0):
+        """
+        :param influence: influence name.
+        :param ignore_below: weights at or below this value do not count.
+        :return: indices of the vertices the influence is weighted on.
+        """
+
+        weights, count = self.matrix(), self.count
+        column = self.columns.get(influence)
+        if column is None:
+            return []
+        return [vertex for vertex, weight in enumerate(weights[column::count]) if weight > ignore_below]
+
+    def add_callbacks(self):
+        """
+        Registers the callbacks that mark external edits.
+        """
+
+        skin_object = self.skin_fn.object()
+        self._callbacks.append(api.MNodeMessage.addAttributeChangedCallback(skin_object, self._attribute_changed))
+        self._callbacks.append(api.MNodeMessage.addNodePreRemovalCallback(skin_object, self.invalidate))
+        for event in ("Undo", "Redo"):
+            self._callbacks.append(api.MEventMessage.addEventCallback(event, self.invalidate))
+
+    def remove_callbacks(self):
+        """
+        Removes the callbacks registered by add_callbacks, and drops the weight matrix.
+        """
+
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.invalidate()
+
+    def _attribute_changed(self, message, plug, other_plug, *args):
+        if self.weights is None:
+            return
+
+        # influences added or removed
+        if message & (api.MNodeMessage.kConnectionMade | api.MNodeMessage.kConnectionBroken):
+            self.invalidate()
+            return
+
+        if not message & (api.MNodeMessage.kAttributeSet | api.MNodeMessage.kAttributeArrayAdded |
+                          api.MNodeMessage.kAttributeArrayRemoved):
+            return
+
+        name = plug.partialName(False, False, False, False, True, True)
+        if not name.startswith("weightList"):
+            return
+        if name.startswith("weightList[") and "]" in name:
+            self.dirty.add(int(name[len("weightList["):name.index("]")]))
+        else:
+            self.invalidate()
+
+
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
 class SkinWeights(object):
     '''
@@ -1128,6 +2255,7 @@ class SkinWeights(object):
         self.numVerts = None
         self.skinDict = None
         self.joints = []
+        self.triangles = None
         self.applied = False
 
         # TODO: check that the file is really on disk
@@ -1156,7 +2284,6 @@ class SkinWeights(object):
 
     def exportSkinWeights(self, filePath, qtProgbar=None, freq=1):
         time1 = time.time()
-        vertPoints = cmds.getAttr(self.mesh + '.vtx[*]')
 
         f = {}
         header = {}
@@ -1178,27 +2305,35 @@ class SkinWeights(object):
         elif qtProgbar:
             qtProgbar.setRange(0, numVerts)
             qtProgbar.setValue(0)
+
+        # read everything up front with the API instead of querying every vertex
+        worldPoints = get_mesh_points(self.mesh, world=True)
+        localPoints = get_mesh_points(self.mesh, world=False)
+        uvPoints = get_vertex_uvs(self.mesh, header['uvSet'])
+        joints, weights, numInfs = get_skin_weights(skin, self.mesh)
+
         for vtx in range(0, numVerts):
             vtxDict[vtx] = {}
-            vtxDict[vtx]['world'] = tuple(cmds.pointPosition(self.mesh + '.vtx[' + str(vtx) + ']', w=1))
-            vtxDict[vtx]['local'] = tuple(cmds.pointPosition(self.mesh + '.vtx[' + str(vtx) + ']', l=1))
+            vtxDict[vtx]['world'] = worldPoints[vtx]
+            vtxDict[vtx]['local'] = localPoints[vtx]
             # we will loop all the skinning influences of this vertex and record their names and values
             vtxDict[vtx]['skinning'] = []
 
-            joints = cmds.skinPercent(skin, self.mesh + '.vtx[' + str(vtx) + ']', q=1, t=None)
-            influence_value = cmds.skinPercent(skin, self.mesh + '.vtx[' + str(vtx) + ']', q=True, v=True)
+            influence_value = weights[vtx * numInfs:(vtx + 1) * numInfs]
 
             for jnt, val in zip(joints, influence_value):
                 if val > 0:
                     vtxDict[vtx]['skinning'].append([jnt, val])
 
-            uv = cmds.polyListComponentConversion(self.mesh + ".vtx[" + str(vtx) + "]", fv=True, tuv=True)
-            vtxDict[vtx]['uv'] = cmds.polyEditUV(uv, q=True)
+            vtxDict[vtx]['uv'] = uvPoints[vtx]
             if qtProgbar:
-                qtProgbar.setValue(vtx)
+                if vtx % PROGRESS_CHUNK == 0 or (vtx + 1) == numVerts:
+                    qtProgbar.setValue(vtx + 1)
 
         f['header'] = header
         f['vtxDict'] = vtxDict
+        # source topology, needed to match by closest point on the surface
+        f['triangles'] = get_mesh_triangles(self.mesh)
         wFile = file(filePath, mode='w')
         wFile.write(json.dumps(f, wFile, indent=4))
         wFile.close()
@@ -1209,23 +2344,20 @@ class SkinWeights(object):
         return True
 
     def importSkinFile(self, filePath):
-        import json
         if os.path.exists(filePath):
-            f = open(filePath, 'r')
-            self.skinDict = json.load(f)
-            f.close()
-
-            self.skin = self.skinDict['header']['skinCluster']
-            self.mesh = self.skinDict['header']['mesh']
-            self.uvSet = self.skinDict['header']['uvSet']
-            self.numVerts = self.skinDict['header']['numVerts']
-            self.vertices = self.skinDict['vtxDict']
-
-            for vtx in self.skinDict['vtxDict']:
-                # build joint list
-                for inf in self.skinDict['vtxDict'][vtx]['skinning']:
-                    if inf[0] not in self.joints:
-                        self.joints.append(inf[0])
+            # vertices are streamed into compact arrays rather than loaded as one big dict
+            skinDict = weightUtils.read_vertex_weights_file(filePath)
+
+            self.skin = skinDict['header']['skinCluster']
+            self.mesh = skinDict['header']['mesh']
+            self.uvSet = skinDict['header']['uvSet']
+            self.numVerts = skinDict['header']['numVerts']
+            self.vertices = skinDict['vtxDict']
+            # files written before 'Surface Position' existed have no triangles
+            self.triangles = skinDict.get('triangles')
+
+            # joint list, collected while reading the vertices
+            self.joints = list(self.vertices.joints)
 
     # This validates that the influence joints exist
     def verifiedInfluences(self, joints):
@@ -1276,147 +2408,192 @@ class SkinWeights(object):
             self.skin = cmds.skinCluster(skinMethod=0, name=(mesh.split('|')[-1] + "_skinCluster"))[0]
             cmds.select(sel)
 
-        if self.skin:
-            # build kdTree if required
-            vtxDict = {}
-            vtxList = []
-            vtxTree = None
-
-            # parse weight file
-            if applyBy == 'World Position':
-                for vtx in self.vertices:
-                    pos = self.vertices[vtx]['world']
-                    vtxDict[str(pos)] = vtx
-                    vtxList.append(pos)
-                start = time.time()
-                vtxTree = mathUtils.KDTree.construct_from_data(vtxList)
-                elapsed = (time.time() - start)
-            if applyBy == 'Local Position':
-                for vtx in self.vertices:
-                    pos = self.vertices[vtx]['local']
-                    vtxDict[str(pos)] = vtx
-                    vtxList.append(pos)
-                start = time.time()
-                vtxTree = mathUtils.KDTree.construct_from_data(vtxList)
-                elapsed = (time.time() - start)
-            if applyBy == 'UV Position':
-                for vtx in self.vertices:
-                    pos = self.vertices[vtx]['uv']
-                    # When one vtx has multiple UV locations, we add it to the mapping table once for each location
-                    if len(pos) > 2:
-                        for i in range(0, len(pos), 2):
-                            newPos = [pos[i], pos[i + 1]]
-                            if debug:
-                                print 'NEWPOS:', newPos
-                            if len(newPos) > 2:
-                                cmds.error(newPos + ' not 2d!')
-                            vtxDict[str(newPos)] = vtx
-                            vtxList.append(newPos)
+        if not self.skin:
+            cmds.warning('IMPORT SKIN WEIGHTS: No skinCluster found on: ' + mesh)
+            return
 
-                    else:
-                        vtxDict[str(pos)] = vtx
-                        vtxList.append(pos)
-                if debug:
-                    print 'VTXLIST:', vtxList
-                    print 'VTXDICT:', vtxDict
-                start = time.time()
-                vtxTree = mathUtils.KDTree.construct_from_data(vtxList)
-                elapsed = (time.time() - start)
-
-            verts = cmds.polyEvaluate(mesh, vertex=1)
-            # progress bar
-            if qtProgbar == 'internal':
-                from Utilities.interfaceUtils import progressDialog
-                qtProgbar = progressDialog((0, verts), label="Importing skin weights...")
-            elif qtProgbar:
-                qtProgbar.setRange(0, verts)
-                qtProgbar.setValue(0)
-
-            # set the weights
+        verts = cmds.polyEvaluate(mesh, vertex=1)
+        # progress bar: one step per vertex for the mapping, one for the matrix assembly
+        if qtProgbar == 'internal':
+            from Utilities.interfaceUtils import progressDialog
+            qtProgbar = progressDialog((0, verts * 2), label="Importing skin weights...")
+        elif qtProgbar:
+            qtProgbar.setRange(0, verts * 2)
+            qtProgbar.setValue(0)
+
+        try:
+            time1 = time.time()
+
+            # resolve which source vertex every target vertex takes its weights from
+            if applyBy == 'Vertex Order':
+                # TODO: check if numVerts match
+                mapping = [str(vtx) for vtx in range(0, verts)]
+            elif applyBy == 'Surface Position':
+                mapping = self.mapSurface(mesh, debug)
+            elif applyBy in APPLY_MODES:
+                mapping = self.mapVertices(mesh, APPLY_MODES[applyBy], debug)
+            else:
+                cmds.warning('IMPORT SKIN WEIGHTS: Unknown match mode: ' + str(applyBy))
+                return
+            if qtProgbar:
+                qtProgbar.setValue(verts)
+            time2 = time.time()
+
+            # assemble the full target weight matrix
+            weights, missing = self.buildWeightMatrix(mapping, qtProgbar, verts)
+            for jnt in missing:
+                cmds.warning('SKIN WEIGHT IMPORT: ' + jnt + ' is not an influence of ' + self.skin)
+            time3 = time.time()
+
+            # push it with a single, undoable setWeights call
+            cmds.undoInfo(openChunk=True)
             try:
-                cmds.undoInfo(openChunk=True)
-                time1 = time.time()
-                for vtx in range(0, verts):
-                    if applyBy == 'Vertex Order':
-                        # TODO: check if numVerts match
-                        cmds.skinPercent(self.skin, mesh + ".vtx[" + str(vtx) + "]",
-                                         transformValue=self.vertices[str(vtx)]['skinning'])
-                    if applyBy == 'World Position':
-                        if vtxTree:
-                            vtxPos = \
-                                vtxTree.query(tuple(cmds.pointPosition(mesh + '.vtx[' + str(vtx) + ']', w=1)), t=1)[0]
-                            vtxMaya = mesh + '.vtx[' + str(vtx) + ']'
-                            if debug:
-                                print 'Original vertex', vtxDict[str(vtxPos)], 'maps to new vtx', vtxMaya
-                            cmds.skinPercent(self.skin, vtxMaya,
-                                             transformValue=self.vertices[vtxDict[str(vtxPos)]]['skinning'])
-                        else:
-                            cmds.warning('IMPORT SKIN WEIGHTS: No existing kdTree built.')
-                    if applyBy == 'Local Position':
-                        if vtxTree:
-                            vtxPos = vtxTree.query(tuple(cmds.pointPosition(mesh + '.vtx[' + str(vtx) + ']')), t=1)[0]
-                            vtxMaya = mesh + '.vtx[' + str(vtx) + ']'
-                            if debug:
-                                print 'Original vertex', vtxDict[str(vtxPos)], 'maps to new vtx', vtxMaya
-                            cmds.skinPercent(self.skin, vtxMaya,
-                                             transformValue=self.vertices[vtxDict[str(vtxPos)]]['skinning'])
-                        else:
-                            cmds.warning('IMPORT SKIN WEIGHTS: No existing kdTree built.')
-                    if applyBy == 'UV Space':
-                        if vtxTree:
-                            uvPoint = cmds.polyEditUV(
-                                    cmds.polyListComponentConversion(mesh + ".vtx[" + str(vtx) + "]", fv=True,
-                                                                     tuv=True),
-                                    q=1)
-                            pos = self.uvListToPointArray(uvPoint)
-                            vtxPos = None
-
-                            if debug:
-                                print 'uvPoint:', uvPoint
-                                print 'pos:', pos
-                            # check for multiple uv points assoc with the vert
-                            if len(pos) > 1:
-                                distance = None
-                                vtxPos = None
-                                for p in pos:
-                                    if debug:
-                                        print pos
-                                        print p
-                                    closest = vtxTree.query(tuple(p), t=1)[0]
-                                    dist = self.square_distance(p, closest)
-                                    if not distance:
-                                        distance = dist
-                                        vtxPos = closest
-                                    else:
-                                        if dist < distance:
-                                            distance = dist
-                                            vtxPos = closest
-
-                            else:
-                                vtxPos = vtxTree.query(tuple(pos[0]), t=1)[0]
-                            vtxMaya = mesh + '.vtx[' + str(vtx) + ']'
-                            if debug:
-                                print 'vtxPos:', str(vtxPos)
-                                print 'Original UV vertex', vtxDict[str(vtxPos)], 'maps to new UV vtx', vtxMaya
-                                print 'SKINNING:', self.vertices[vtxDict[str(vtxPos)]]['skinning'], vtxDict[str(vtxPos)]
-                            cmds.skinPercent(self.skin, vtxMaya,
-                                             transformValue=self.vertices[vtxDict[str(vtxPos)]]['skinning'])
-                        else:
-                            cmds.warning('IMPORT SKIN WEIGHTS: No existing kdTree built.')
-
-                    # Update the progressbar, but only every 100th vertex
-                    if qtProgbar:
-                        if vtx % 100 == 0 or (vtx + 1) == verts:
-                            qtProgbar.setValue(vtx + 1)
-                time2 = time.time()
-                print 'importSkinWeights: Weights loaded from %s in %0.3f sec' % (self.skinFile, (time2 - time1))
-            except Exception as e:
-                print e
+                set_skin_weights(self.skin, mesh, weights)
             finally:
                 cmds.undoInfo(closeChunk=True)
+            time4 = time.time()
+
+            if qtProgbar:
+                qtProgbar.setValue(verts * 2)
+            print 'importSkinWeights: Weights loaded from %s in %0.3f sec' % (self.skinFile, (time4 - time1))
+            print '    mapping: %0.3f sec, matrix assembly: %0.3f sec, set: %0.3f sec' % (
+                (time2 - time1), (time3 - time2), (time4 - time3))
+            self.applied = True
+        except Exception as e:
+            print e
+
+    def mapVertices(self, mesh, key, debug=0):
+        """
+        Resolves the source vertex for every vertex of the target mesh in one batch, by nearest world position,
+        local position or UV.
 
+        :param mesh: target mesh.
+        :param key: 'world', 'local' or 'uv'.
+        :return: list of source vertex keys (into self.vertices), one per target vertex.
+        """
+
+        # build kdTree, vtxKeys maps tree point indices back to source vertices
+        vtxKeys = []
+        vtxList = []
+        for vtx in self.vertices:
+            pos = self.vertices[vtx][key]
+            if key == 'uv':
+                # When one vtx has multiple UV locations, we add it to the mapping table once for each location
+                for newPos in self.uvListToPointArray(pos or []):
+                    if not newPos:
+                        continue
+                    vtxKeys.append(vtx)
+                    vtxList.append(newPos)
+            else:
+                vtxKeys.append(vtx)
+                vtxList.append(pos)
+        if debug:
+            print 'VTXLIST:', vtxList
+        vtxTree = get_spatial_index_cache(self.skinFile).get_tree(vtxList, tag=key)
+
+        # read the target positions in bulk
+        if key == 'uv':
+            targets = get_vertex_uvs(mesh)
         else:
-            cmds.warning('IMPORT SKIN WEIGHTS: No skinCluster found on: ' + mesh)
+            targets = get_mesh_points(mesh, world=(key == 'world'))
+
+        if key != 'uv':
+            return [vtxKeys[nearest[0]] if nearest else None for nearest in vtxTree.query_batch(targets, k=1)]
+
+        # a target vertex can have several UVs, query them all and keep the closest match per vertex
+        owners = []
+        queries = []
+        for vtx, target in enumerate(targets):
+            for p in self.uvListToPointArray(target):
+                if p:
+                    owners.append(vtx)
+                    queries.append(p)
+        nearest, distances = vtxTree.query_batch(queries, k=1, return_distance=True)
+
+        mapping = [None] * len(targets)
+        closest = [None] * len(targets)
+        for vtx, found, distance in zip(owners, nearest, distances):
+            if found and (closest[vtx] is None or distance[0] < closest[vtx]):
+                closest[vtx] = distance[0]
+                mapping[vtx] = vtxKeys[found[0]]
+                if debug:
+                    print 'Original UV vertex', vtxKeys[found[0]], 'maps to new UV vtx', vtx
+        return mapping
+
+    def mapSurface(self, mesh, debug=0):
+        """
+        Resolves, for every vertex of the target mesh, the closest point on the source surface. The point's
+        triangle and barycentric coordinates give the three source vertices to blend and their blend factors.
+
+        :param mesh: target mesh.
+        :return: list of [(source vertex key, factor), ...] entries, one per target vertex.
+        """
+
+        if not self.triangles:
+            cmds.warning('IMPORT SKIN WEIGHTS: ' + str(self.skinFile) + ' has no triangles, '
+                         'matching by World Position instead of Surface Position.')
+            return self.mapVertices(mesh, 'world', debug)
+
+        # build the BVH once over the source triangles
+        numVerts = len(self.vertices)
+        points = [self.vertices[str(vtx)]['world'] for vtx in range(numVerts)]
+        bvh = mathUtils.TriangleBVH(points, self.triangles)
+
+        mapping = []
+        for vtx, result in enumerate(bvh.closest_point_batch(get_mesh_points(mesh, world=True))):
+            if result is None:
+                mapping.append(None)
+                continue
+            triangle, factors, distance = result
+            mapping.append([(str(source), factor) for source, factor in zip(bvh.triangles[triangle], factors)
+                            if factor > 0.0])
+            if debug:
+                print 'New vtx', vtx, 'blends', mapping[-1], 'at distance', distance
+        return mapping
+
+    def buildWeightMatrix(self, mapping, qtProgbar=None, progressOffset=0):
+        """
+        Builds the flat, vertex-major weight matrix of self.skin from the skinning data of the mapped source
+        vertices. Target vertices without a match (None) keep their current weights.
+
+        :param mapping: one entry per target vertex: a source vertex key, a list of (source vertex key, factor)
+                        pairs to blend, or None.
+        :return: (MDoubleArray of weights, list of influences from the file that are not in the skinCluster)
+        """
+
+        influences = get_skin_influences(self.skin)
+        influenceCount = len(influences)
+        columns = dict((jnt, index) for index, jnt in enumerate(influences))
+        columns.update((utils.remove_namespace(jnt), index) for index, jnt in enumerate(influences))
+        missing = set()
+
+        unmatched = None in mapping
+        if unmatched:
+            weights = api.MDoubleArray(get_skin_weights(self.skin)[1])
+        else:
+            weights = api.MDoubleArray(len(mapping) * influenceCount, 0.0)
+
+        for vtx, source in enumerate(mapping):
+            if source is None:
+                continue
+            if not isinstance(source, list):
+                source = [(source, 1.0)]
+
+            base = vtx * influenceCount
+            if unmatched:
+                for column in xrange(influenceCount):
+                    weights[base + column] = 0.0
+            for key, factor in source:
+                for jnt, val in self.vertices[key]['skinning']:
+                    column = columns.get(jnt, columns.get(utils.remove_namespace(jnt)))
+                    if column is None:
+                        missing.add(jnt)
+                        continue
+                    weights[base + column] += val * factor
+
+            if qtProgbar and vtx % PROGRESS_CHUNK == 0:
+                qtProgbar.setValue(progressOffset + vtx)
+        return weights, sorted(missing)
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -1431,20 +2608,27 @@ class SkinData(object):
         self.skin_cluster = skin_cluster
         deformer = cmds.deformer(skin_cluster, q=True, g=True)[0]
         self.shape = cmds.listRelatives(deformer, parent=True, path=True)[0]
-        self.mobject = utils.get_mobject(self.skin_cluster)
-        self.skin_set = OpenMayaAnim.MFnSkinCluster(self.mobject)
+        selection_list = api.MSelectionList()
+        selection_list.add(self.skin_cluster)
+        self.mobject = selection_list.getDependNode(0)
+        self.skin_set = apiAnim.MFnSkinCluster(self.mobject)
         self.data = {
-            "weights": dict(),
+            "sparseWeights": None,
             "blendWeights": list(),
             "skinCluster": self.skin_cluster,
             "shape": self.shape
         }
 
-    def gather_data(self):
+    def gather_data(self, epsilon=0.0):
+        """Reads the skinCluster weights (sparse, pruned to weights above
+        epsilon), blend weights and attributes.
+        @PARAMS:
+            epsilon: float
+        """
 
         # get incluence and blend weight data
         dag_path, mobject = self.get_skin_dag_path_and_mobject()
-        self.get_influence_weights(dag_path, mobject)
+        self.get_influence_weights(dag_path, mobject, epsilon)
         self.get_blend_weights(dag_path, mobject)
 
         # add in attribute data
@@ -1455,49 +2639,32 @@ class SkinData(object):
         return self.data
 
     def get_skin_dag_path_and_mobject(self):
-        function_set = OpenMaya.MFnSet(self.skin_set.deformerSet())
-        selection_list = OpenMaya.MSelectionList()
-        function_set.getMembers(selection_list, False)
-        dag_path = OpenMaya.MDagPath()
-        mobject = OpenMaya.MObject()
-        selection_list.getDagPath(0, dag_path, mobject)
-        return dag_path, mobject
-
-    def get_influence_weights(self, dag_path, mobject):
-        weights = self._get_weights(dag_path, mobject)
+        """Returns the dag path of the deformed shape and a complete
+        vertex component covering every point of it."""
+        dag_path = self.skin_set.getPathAtIndex(0)
+        return dag_path, get_complete_vertex_component(dag_path)
 
-        influence_paths = OpenMaya.MDagPathArray()
-        influence_count = self.skin_set.influenceObjects(influence_paths)
-        components_per_influence = weights.length() / influence_count
-        for count in xrange(influence_paths.length()):
-            name = influence_paths[count].partialPathName()
-            name = utils.remove_namespace(name)
-            weight_data = [weights[influence * influence_count + count] \
-                           for influence in xrange(components_per_influence)]
-            self.data["weights"][name] = weight_data
+    def get_influence_names(self):
+        return [utils.remove_namespace(name) for name in get_skin_influences(self.skin_set)]
 
-    def _get_weights(self, dag_path, mobject):
-        """Where the API magic happens."""
-        weights = OpenMaya.MDoubleArray()
-        util = OpenMaya.MScriptUtil()
-        util.createFromInt(0)
-        pointer = util.asUintPtr()
+    def get_influence_weights(self, dag_path, mobject, epsilon=0.0):
+        weights = self._get_weights(dag_path, mobject)
+        self.data["sparseWeights"] = weightUtils.SparseWeights.from_matrix(self.get_influence_names(),
+                                                                           weights, epsilon)
 
-        # magic call
-        self.skin_set.getWeights(dag_path, mobject, weights, pointer);
+    def _get_weights(self, dag_path, mobject):
+        """Where the API magic happens. Returns a flat, vertex-major
+        MDoubleArray of every influence weight."""
+        weights, influence_count = self.skin_set.getWeights(dag_path, mobject)
         return weights
 
     def get_blend_weights(self, dag_path, mobject):
         return self._get_blend_weights(dag_path, mobject)
 
     def _get_blend_weights(self, dag_path, mobject):
-        weights = OpenMaya.MDoubleArray()
-
         # magic call
-        self.skin_set.getBlendWeights(dag_path, mobject, weights)
-        blend_data = [weights[blend_weight] for \
-                      blend_weight in xrange(weights.length())]
-        self.data["blendWeights"] = blend_data
+        weights = self.skin_set.getBlendWeights(dag_path, mobject)
+        self.data["blendWeights"] = weightUtils.to_float_array(weights)
 
     def set_data(self, data):
         """Final point for importing weights. Sets and applies influences
@@ -1512,48 +2679,46 @@ class SkinData(object):
 
         # set skinCluster Attributes
         for attribute in ATTRIBUTES:
-            cmds.setAttr('{0}.{1}'.format(self.skin_cluster, attribute),
-                         self.data[attribute])
+            if attribute in self.data:
+                cmds.setAttr('{0}.{1}'.format(self.skin_cluster, attribute),
+                             self.data[attribute])
 
     def set_influence_weights(self, dag_path, mobject):
-        weights = self._get_weights(dag_path, mobject)
-        influence_paths = OpenMaya.MDagPathArray()
-        influence_count = self.skin_set.influenceObjects(influence_paths)
-        components_per_influence = weights.length() / influence_count
+        influences = self.get_influence_names()
+        influence_count = len(influences)
+        sparse = weightUtils.sparse_weights_from_record(self.data)
 
         # influences
-        unused_influences = list()
-        influences = [influence_paths[inf_count].partialPathName() for \
-                      inf_count in xrange(influence_paths.length())]
-
-        # build influences/weights
-        for imported_influence, imported_weights in self.data['weights'].items():
-            for inf_count in xrange(influence_paths.length()):
-                influence_name = influence_paths[inf_count].partialPathName()
-                influence_name = utils.remove_namespace(influence_name)
-                if influence_name == imported_influence:
-                    # set the weights
-                    for count in xrange(components_per_influence):
-                        weights.set(imported_weights[count],
-                                    count * influence_count + inf_count)
-                    influences.remove(influence_name)
-                    break
-            else:
-                unused_influences.append(imported_influence)
+        unused_influences = [influence for influence in sparse.influences if influence not in influences]
+        missing_influences = [influence for influence in influences if influence not in sparse.influences]
 
         # TODO: make joint remapper
-        if unused_influences and influences:
+        if unused_influences and missing_influences:
             OpenMaya.MGlobal_displayWarning("Make a joint remapper, Aaron!")
 
+        # build influences/weights, only visiting the non-zero entries
+        if not missing_influences:
+            weights = api.MDoubleArray(sparse.to_matrix(influences))
+        else:
+            # influences the data knows nothing about keep their current weights
+            weights = self._get_weights(dag_path, mobject)
+            column_map = sparse.column_map(influences)
+            columns = [column for column in column_map if column is not None]
+            for vertex in xrange(sparse.num_vertices):
+                base = vertex * influence_count
+                for column in columns:
+                    weights[base + column] = 0.0
+                indices, values = sparse.row(vertex)
+                for index, value in zip(indices, values):
+                    column = column_map[index]
+                    if column is not None:
+                        weights[base + column] = float(value)
+
         # set influences
-        influence_array = OpenMaya.MIntArray(influence_count)
-        for count in xrange(influence_count):
-            influence_array.set(count, count)
+        influence_array = api.MIntArray(range(influence_count))
         # set weights
         self.skin_set.setWeights(dag_path, mobject, influence_array, weights, False)
 
     def set_blend_weights(self, dag_path, mobject):
-        blend_weights = OpenMaya.MDoubleArray(len(self.data['blendWeights']))
-        for influence, weight in enumerate(self.data['blendWeights']):
-            blend_weights.set(weight, influence)
+        blend_weights = api.MDoubleArray([float(weight) for weight in self.data['blendWeights']])
         self.skin_set.setBlendWeights(dag_path, mobject, blend_weights)
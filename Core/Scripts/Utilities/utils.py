@@ -10,6 +10,11 @@ Contents
 |       :func:`returnCharacterModule <Utilities.utils.returnCharacterModule>`
 |       :func:`returnCharacterModules <Utilities.utils.returnCharacterModules>`
 |       :func:`returnRigModuleTypes <Utilities.utils.returnRigModuleTypes>`
+|       :func:`get_network_registry <Utilities.utils.get_network_registry>`
+|       :func:`get_joint_index <Utilities.utils.get_joint_index>`
+|       :func:`get_module_pool <Utilities.utils.get_module_pool>`
+|       :func:`get_control_map <Utilities.utils.get_control_map>`
+|       :func:`save_control_map <Utilities.utils.save_control_map>`
 |       :func:`getViableParents <Utilities.utils.getViableParents>`
 |       :func:`deleteChildren <Utilities.utils.deleteChildren>`
 |       :func:`find_all_incoming <Utilities.utils.find_all_incoming>`
@@ -28,6 +33,7 @@ Contents
 |       :func:`exportMesh <Utilities.utils.exportMesh>`
 |       :func:`findExportMeshData <Utilities.utils.findExportMeshData>`
 |       :func:`getFaceMaterials <Utilities.utils.getFaceMaterials>`
+|       :func:`component_ranges <Utilities.utils.component_ranges>`
 |
 |   **Path Utilities:**
 |       :func:`win_path_convert <Utilities.utils.win_path_convert>`
@@ -63,12 +69,32 @@ import interfaceUtils as interfaceUtils
 import riggingUtils as riggingUtils
 from ThirdParty.Qt import QtWidgets, QtCore
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # maya 2016< maya2017> compatability
 try:
     import shiboken as shiboken
 except:
     import shiboken2 as shiboken
 
+# shared registry of the ART network nodes, see get_network_registry
+_NETWORK_REGISTRY = None
+
+# shared index of the joints created by the modules, see get_joint_index
+_JOINT_INDEX = None
+
+# shared pool of module class instances, see get_module_pool
+_MODULE_POOL = None
+
+# module network node attributes read by the JointIndex
+JOINT_INDEX_ATTRS = ("Created_Bones", "moduleName", "moduleType", "baseName", "side", "parentModuleBone")
+
+# control maps by character node, see get_control_map
+_CONTROL_MAPS = {}
+
 
 class MirrorTable(object):
 
@@ -214,44 +240,434 @@ class MirrorTable(object):
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-def returnRigModules():
+class NetworkNodeRegistry(object):
     """
-    Look for all network nodes in the scene. Return network nodes that have a .parent attribute.
+    Classifies the ART network nodes of the scene in one pass: character nodes (a .rigModules attribute and no .parent
+    attribute) and module nodes (a .parent attribute, with their .moduleType). Other network nodes (render setup,
+    HumanIK, etc.) are skipped without listing their attributes.
 
-    :return: list of network nodes that have .parent attr, signifying an ART network node
+    Nodes are tracked by MObjectHandle, so renamed nodes are still found. The registry is rebuilt lazily after a
+    network node is created or deleted, a reference is loaded, unloaded, created or removed, or a scene is opened,
+    created or imported.
     """
 
-    modules = []
-    networkNodes = cmds.ls(type="network")
+    def __init__(self):
+        self._characters = None
+        self._modules = None
+        self._callbacks = []
+        self.builds = 0
+
+    def __del__(self):
+        self.remove_callbacks()
+
+    def invalidate(self, *args):
+        self._characters = None
+        self._modules = None
+
+    def build(self):
+        """
+        Scans all network nodes and records the character and module nodes.
+        """
+
+        if not self._callbacks:
+            self.add_callbacks()
+
+        characters = []
+        modules = []
+        selection = api.MSelectionList()
+        for node in cmds.ls(type="network"):
+            selection.add(node)
+
+        for index in range(selection.length()):
+            node = selection.getDependNode(index)
+            node_fn = api.MFnDependencyNode(node)
+            if node_fn.hasAttribute("parent"):
+                module_type = None
+                if node_fn.hasAttribute("moduleType"):
+                    module_type = node_fn.findPlug("moduleType", False).asString()
+                modules.append((api.MObjectHandle(node), module_type))
+            elif node_fn.hasAttribute("rigModules"):
+                characters.append(api.MObjectHandle(node))
+
+        self._characters = characters
+        self._modules = modules
+        self.builds += 1
+
+    def characters(self):
+        """
+        :return: names of the character network nodes.
+        """
+
+        if self._characters is None:
+            self.build()
+        names = self._names(self._characters)
+        if names is None:
+            self.invalidate()
+            return self.characters()
+        return names
+
+    def modules(self):
+        """
+        :return: names of the module network nodes, ART_Root_Module first.
+        """
+
+        if self._modules is None:
+            self.build()
+        names = self._names([handle for handle, module_type in self._modules])
+        if names is None:
+            self.invalidate()
+            return self.modules()
+
+        if "ART_Root_Module" in names:
+            names.remove("ART_Root_Module")
+            names.insert(0, "ART_Root_Module")
+        return names
+
+    def module_types(self):
+        """
+        :return: the distinct module types (ART_Arm_Standard, ART_Leg_Standard, etc) of the module network nodes.
+        """
+
+        if self._modules is None:
+            self.build()
+
+        module_types = []
+        for handle, module_type in self._modules:
+            if module_type is not None and module_type not in module_types:
+                module_types.append(module_type)
+        return module_types
+
+    def add_callbacks(self):
+        """
+        Registers the scene callbacks that invalidate the registry.
+        """
+
+        self._callbacks.extend(_add_network_callbacks(self.invalidate))
+
+    def remove_callbacks(self):
+        """
+        Removes the callbacks registered by add_callbacks.
+        """
+
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def _names(self, handles):
+        # None if a node was deleted without the registry hearing about it
+        names = []
+        for handle in handles:
+            if not handle.isValid():
+                return None
+            names.append(api.MFnDependencyNode(handle.object()).name())
+        return names
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def get_network_registry():
+    """
+    :return: the shared NetworkNodeRegistry, created on first use.
+    """
+
+    global _NETWORK_REGISTRY
+    if _NETWORK_REGISTRY is None:
+        _NETWORK_REGISTRY = NetworkNodeRegistry()
+    return _NETWORK_REGISTRY
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class JointIndex(object):
+    """
+    Indexes the joints listed in the Created_Bones attribute of the module network nodes. For each joint it gives the
+    module, the module's side and, for the first joint of a module, the parent bone (parentModuleBone). Joint movers
+    found by findMoverNodeFromJointName and findAssociatedMover are remembered in movers.
+
+    A module's attributes are read once, and read again only after its Created_Bones, moduleName, moduleType, baseName,
+    side or parentModuleBone attribute changes or the node is renamed. The whole index is dropped on the same events as
+    the NetworkNodeRegistry.
+    """
+
+    def __init__(self):
+        self._modules = None
+        self._joints = None
+        self._module_data = None
+        self._callbacks = []
+        self._module_callbacks = []
+        self.movers = {}
+        self.reads = 0
+
+    def __del__(self):
+        self.remove_callbacks()
+
+    def __contains__(self, joint):
+        self._update()
+        return joint in self._joints
+
+    def invalidate(self, *args):
+        self._remove_module_callbacks()
+        self._modules = None
+        self._joints = None
+
+    def build(self):
+        """
+        Collects the module network nodes and watches them for changes. Their attributes are read on the next query.
+        """
+
+        if not self._callbacks:
+            self._callbacks.extend(_add_network_callbacks(self.invalidate))
+        self._remove_module_callbacks()
+
+        selection = api.MSelectionList()
+        for node in get_network_registry().modules():
+            selection.add(node)
+
+        modules = []
+        for index in range(selection.length()):
+            node = selection.getDependNode(index)
+            # [handle, module data], the data is None until read
+            entry = [api.MObjectHandle(node), None]
+            self._module_callbacks.append(api.MNodeMessage.addAttributeChangedCallback(node, self._attribute_changed,
+                                                                                       entry))
+            self._module_callbacks.append(api.MNodeMessage.addNameChangedCallback(node, self._name_changed, entry))
+            modules.append(entry)
+
+        self._modules = modules
+        self._joints = None
+
+    def find(self, joint, modules=None):
+        """
+        :param joint: name of the joint.
+        :param modules: if given, only these module network nodes are searched.
+        :return: the data of the first module that creates the joint (see module_data), or None.
+        """
+
+        self._update()
+        for data in self._joints.get(joint, []):
+            if modules is None or data["module"] in modules:
+                return data
+
+    def module_data(self, module):
+        """
+        :param module: name of a module network node.
+        :return: dictionary with the module node name ("module"), its parsed Created_Bones ("bones") and its
+                 JOINT_INDEX_ATTRS attribute values (None if missing), or None if the node is not a module.
+        """
+
+        self._update()
+        return self._module_data.get(module)
+
+    def parent_bone(self, joint):
+        """
+        :param joint: name of the joint.
+        :return: the parentModuleBone of the module, if the joint is the first one the module creates. Otherwise None,
+                 as the parent comes from the joint mover hierarchy.
+        """
+
+        data = self.find(joint)
+        if data is not None and data["bones"] and data["bones"][0] == joint:
+            return data["parentModuleBone"]
+
+    def viable_parents(self):
+        """
+        :return: all created joint names, by module and last joint first within a module (see getViableParents).
+        """
+
+        self._update()
+        parents = []
+        for handle, data in self._modules:
+            parents.extend(reversed(data["bones"]))
+        return parents
+
+    def remove_callbacks(self):
+        """
+        Removes all callbacks registered by the index.
+        """
+
+        self._remove_module_callbacks()
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+    def _update(self):
+        if self._modules is None:
+            self.build()
+        if self._joints is not None:
+            return
+
+        joints = {}
+        module_data = {}
+        for entry in self._modules:
+            handle, data = entry
+            if not handle.isValid():
+                # a node was deleted without the index hearing about it
+                self.invalidate()
+                return self._update()
+            if data is None:
+                data = entry[1] = self._read_module(handle.object())
+            module_data[data["module"]] = data
+            for bone in data["bones"]:
+                joints.setdefault(bone, []).append(data)
+
+        self._joints = joints
+        self._module_data = module_data
+        self.movers = {}
+
+    def _read_module(self, node):
+        node_fn = api.MFnDependencyNode(node)
+        data = {"module": node_fn.name()}
+        for attr in JOINT_INDEX_ATTRS:
+            data[attr] = None
+            if node_fn.hasAttribute(attr):
+                data[attr] = node_fn.findPlug(attr, False).asString()
+
+        data["bones"] = [bone for bone in (data["Created_Bones"] or "").split("::") if bone != ""]
+        self.reads += 1
+        return data
+
+    def _attribute_changed(self, message, plug, other_plug, entry):
+        if message & (api.MNodeMessage.kAttributeSet | api.MNodeMessage.kAttributeAdded |
+                      api.MNodeMessage.kAttributeRemoved):
+            if api.MFnAttribute(plug.attribute()).name in JOINT_INDEX_ATTRS:
+                entry[1] = None
+                self._joints = None
+
+    def _name_changed(self, node, previous_name, entry):
+        entry[1] = None
+        self._joints = None
+
+    def _remove_module_callbacks(self):
+        if self._module_callbacks:
+            api.MMessage.removeCallbacks(self._module_callbacks)
+        self._module_callbacks = []
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def get_joint_index():
+    """
+    :return: the shared JointIndex, created on first use.
+    """
+
+    global _JOINT_INDEX
+    if _JOINT_INDEX is None:
+        _JOINT_INDEX = JointIndex()
+    return _JOINT_INDEX
+
+
+def _add_network_callbacks(function):
+    # callbacks for the events that change which network nodes exist
+    callbacks = [api.MDGMessage.addNodeAddedCallback(function, "network"),
+                 api.MDGMessage.addNodeRemovedCallback(function, "network")]
+    for message in (api.MSceneMessage.kAfterNew, api.MSceneMessage.kAfterOpen, api.MSceneMessage.kAfterImport,
+                    api.MSceneMessage.kAfterCreateReference, api.MSceneMessage.kAfterRemoveReference,
+                    api.MSceneMessage.kAfterLoadReference, api.MSceneMessage.kAfterUnloadReference):
+        callbacks.append(api.MSceneMessage.addCallback(message, function))
+    return callbacks
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class ModuleInstancePool(object):
+    """
+    Keeps the module class instances (ART_Arm_Standard, ART_Leg_Standard, etc) created for module network nodes, by
+    namespace and network node, so tools that work on the same modules repeatedly construct each one once.
+
+    An instance is built again if its module was renamed. The pool is emptied on the same network node and scene
+    events as the NetworkNodeRegistry, which covers reference reloads, and by ART_BuildProgressUI after a rig build.
+    """
+
+    def __init__(self):
+        self._instances = {}
+        self._callbacks = []
+        self.created = 0
+
+    def __del__(self):
+        self.remove_callbacks()
+
+    def invalidate(self, *args):
+        self._instances = {}
+
+    def get(self, network_node, parent=None, namespace=None):
+        """
+        Returns the instance for a module network node, creating it if needed.
+
+        :param network_node: the module network node.
+        :param parent: the interface instance handed to the module class (its rigUiInst).
+        :param namespace: the character namespace, with a trailing ":". Defaults to the namespace of the network node.
+        :return: the module class instance.
+        """
+
+        if not self._callbacks:
+            self._callbacks.extend(_add_network_callbacks(self.invalidate))
+
+        if namespace is None:
+            namespace = get_namespace(network_node)
+
+        data = get_joint_index().module_data(network_node)
+        if data is not None:
+            module_name = data["moduleName"]
+            module_type = data["moduleType"]
+        else:
+            module_name = cmds.getAttr(network_node + ".moduleName")
+            module_type = cmds.getAttr(network_node + ".moduleType")
+
+        key = (namespace, network_node)
+        instance = self._instances.get(key)
+        if instance is None or instance.name != module_name:
+            mod = __import__("RigModules." + module_type, {}, {}, [module_type])
+
+            # find the instance of that module
+            module_class = getattr(mod, mod.className)
+            instance = module_class(parent, module_name)
+            if namespace:
+                instance.namespace = namespace
+            self._instances[key] = instance
+            self.created += 1
+
+        instance.rigUiInst = parent
+        return instance
+
+    def remove_callbacks(self):
+        """
+        Removes the callbacks that empty the pool.
+        """
+
+        if self._callbacks:
+            api.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def get_module_pool():
+    """
+    :return: the shared ModuleInstancePool, created on first use.
+    """
+
+    global _MODULE_POOL
+    if _MODULE_POOL is None:
+        _MODULE_POOL = ModuleInstancePool()
+    return _MODULE_POOL
 
-    if "ART_Root_Module" in networkNodes:
-        modules.append("ART_Root_Module")
-        index = networkNodes.index("ART_Root_Module")
-        networkNodes.pop(index)
 
-    for node in networkNodes:
-        attrs = cmds.listAttr(node)
-        if "parent" in attrs:
-            modules.append(node)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def returnRigModules():
+    """
+    Return the ART module network nodes in the scene: network nodes that have a .parent attribute (see
+    NetworkNodeRegistry).
+
+    :return: list of network nodes that have .parent attr, signifying an ART network node
+    """
 
-    return modules
+    return get_network_registry().modules()
 
 
 def return_module_instances():
 
     network_nodes = returnRigModules()
 
+    pool = get_module_pool()
     instances = []
 
     for node in network_nodes:
-        niceName = cmds.getAttr(node + ".moduleName")
-        moduleType = cmds.getAttr(node + ".moduleType")
-        mod = __import__("RigModules." + moduleType, {}, {}, [moduleType])
-
-        # find the instance of that module
-        moduleClass = getattr(mod, mod.className)
-        moduleInst = moduleClass(None, niceName)
-        instances.append(moduleInst)
+        instances.append(pool.get(node))
 
     return instances
 
@@ -264,13 +680,9 @@ def returnCharacterModule():
     :return: character node that stores character information.
     """
 
-    networkNodes = cmds.ls(type="network")
-    for node in networkNodes:
-        attrs = cmds.listAttr(node)
-
-        if "parent" not in attrs:
-            if "rigModules" in attrs:
-                return node
+    characters = get_network_registry().characters()
+    if characters:
+        return characters[0]
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -281,16 +693,7 @@ def returnCharacterModules():
     :return: list of character network nodes which list details about the character.
     """
 
-    modules = []
-    networkNodes = cmds.ls(type="network")
-    for node in networkNodes:
-        attrs = cmds.listAttr(node)
-
-        if "parent" not in attrs:
-            if "rigModules" in attrs:
-                modules.append(node)
-
-    return modules
+    return get_network_registry().characters()
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -303,17 +706,7 @@ def returnRigModuleTypes():
     :return: list of the different types of modules in our scene (ART_Arm, ART_Leg, etc)
     """
 
-    modTypes = []
-    networkNodes = cmds.ls(type="network")
-    for node in networkNodes:
-        attrs = cmds.listAttr(node)
-
-        if "parent" in attrs:
-            modType = cmds.getAttr(node + ".moduleType")
-            if modType not in modTypes:
-                modTypes.append(modType)
-
-    return modTypes
+    return get_network_registry().module_types()
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -326,25 +719,7 @@ def getViableParents():
     :return: list of all the bone names created by the current modules in the scene.
     """
 
-    # look through the node network and find created bone lists
-    modules = returnRigModules()
-
-    bonesList = []
-    for module in modules:
-        if cmds.objExists(module + ".Created_Bones"):
-            bonesList.append(cmds.getAttr(module + ".Created_Bones"))
-
-    # now we have a long string of all of the created bones. we need to split them up into individual items
-    parents = []
-    for bone in bonesList:
-        bones = bone.split("::")
-
-        for bone in reversed(bones):
-            if bone != "":
-                parents.append(bone)
-
-    # once done, add each one to the comboBox
-    return parents
+    return get_joint_index().viable_parents()
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -360,81 +735,87 @@ def findMoverNodeFromJointName(networkNodes, jointName, offsetMover=True, global
     :return: the name of the associated joint mover for the given joint
     """
 
-    # take the passed in list, and if there is a created_Bones attribute, search it for the jointName
-    for node in networkNodes:
-        boneList = []
-        if cmds.objExists(node + ".Created_Bones"):
-            boneList.append(cmds.getAttr(node + ".Created_Bones"))
-        for bone in boneList:
-            splitBones = bone.split("::")
+    # find the module that creates the joint in the passed in list
+    jointIndex = get_joint_index()
+    data = jointIndex.find(jointName, networkNodes)
+    if data is None:
+        return None
 
-            for joint in splitBones:
-                if joint == jointName:
-                    # get the module name and module class
-                    moduleName = cmds.getAttr(node + ".moduleName")
-                    moduleClass = cmds.getAttr(node + ".moduleType")
+    key = (data["module"], jointName, offsetMover, globalMover)
+    moverName = jointIndex.movers.get(key)
+    if moverName is None:
+        moverName = _findMoverNode(data, jointName, offsetMover, globalMover)
+        if moverName is not None:
+            jointIndex.movers[key] = moverName
+    return moverName
 
-                    if node != "ART_Root_Module":
-                        basename = cmds.getAttr(node + ".baseName")
-                    else:
-                        basename = moduleName
 
-                    # start building up the mover name we need and return it
-                    if offsetMover:
-                        moverName = jointName + "_mover_offset"
-                    if globalMover:
-                        moverName = jointName + "_mover"
+def _findMoverNode(data, jointName, offsetMover, globalMover):
 
-                    if cmds.objExists(moverName):
-                        return moverName
+    # get the module name
+    moduleName = data["moduleName"]
 
-                    else:
-                        if offsetMover:
-                            moverName = jointName + "_mover_offset"
-                        if globalMover:
-                            moverName = jointName + "_mover"
-
-                        # comparing basename and moduleName, get prefix and suffix
-                        prefix = moduleName.partition(basename)[0]
-                        suffix = moduleName.partition(basename)[2]
-
-                        # make sure not partitioning on an empty separator
-                        if prefix == "":
-                            prefix = "&&"
-                        if suffix == "":
-                            suffix = "$$"
-
-                        noPrefix = jointName.partition(prefix)[2]
-                        if noPrefix != "":
-                            moverName = noPrefix
-                        noSuffix = moverName.rpartition(suffix)[0]
-                        if noSuffix != "":
-                            moverName = noSuffix
-
-                        # construct mover name.
-                        if offsetMover:
-                            moverName = moduleName + "_" + moverName
-
-                            if cmds.objExists(moverName):
-                                if moverName.find("_mover") != -1:
-                                    return moverName
-                            else:
-                                moverName += "_mover_offset"
-
-                                if cmds.objExists(moverName):
-                                    return moverName
-
-                        if globalMover:
-                            moverName = moduleName + "_" + moverName
-
-                            if cmds.objExists(moverName):
-                                if moverName.find("_mover") != -1:
-                                    return moverName
-                            else:
-                                moverName += "_mover"
-
-                                if cmds.objExists(moverName):
-                                    return moverName
+    if data["module"] != "ART_Root_Module":
+        basename = data["baseName"]
+    else:
+        basename = moduleName
+
+    # start building up the mover name we need and return it
+    if offsetMover:
+        moverName = jointName + "_mover_offset"
+    if globalMover:
+        moverName = jointName + "_mover"
+
+    if cmds.objExists(moverName):
+        return moverName
+
+    else:
+        if offsetMover:
+            moverName = jointName + "_mover_offset"
+        if globalMover:
+            moverName = jointName + "_mover"
+
+        # comparing basename and moduleName, get prefix and suffix
+        prefix = moduleName.partition(basename)[0]
+        suffix = moduleName.partition(basename)[2]
+
+        # make sure not partitioning on an empty separator
+        if prefix == "":
+            prefix = "&&"
+        if suffix == "":
+            suffix = "$$"
+
+        noPrefix = jointName.partition(prefix)[2]
+        if noPrefix != "":
+            moverName = noPrefix
+        noSuffix = moverName.rpartition(suffix)[0]
+        if noSuffix != "":
+            moverName = noSuffix
+
+        # construct mover name.
+        if offsetMover:
+            moverName = moduleName + "_" + moverName
+
+            if cmds.objExists(moverName):
+                if moverName.find("_mover") != -1:
+                    return moverName
+            else:
+                moverName += "_mover_offset"
+
+                if cmds.objExists(moverName):
+                    return moverName
+
+        if globalMover:
+            moverName = moduleName + "_" + moverName
+
+            if cmds.objExists(moverName):
+                if moverName.find("_mover") != -1:
+                    return moverName
+            else:
+                moverName += "_mover"
+
+                if cmds.objExists(moverName):
+                    return moverName
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -601,18 +982,12 @@ def findMatchingModule(joint):
     :return: associated network node
     """
 
-    # find all network nodes with .Created_Bones attr. find the network node that has the
-    # input bone listed
-    networkNodes = cmds.ls(type="network")
-    for node in networkNodes:
-        attr = cmds.listAttr(node, string="Created_Bones")
-        if attr is not None:
-            splitString = cmds.getAttr(node + "." + attr[0])
-            bones = splitString.split("::")
-            if joint in bones:
-                # get the control node
-                controlNode = cmds.listConnections(node + ".controls")
-                return controlNode
+    # find the network node that has the input bone listed
+    data = get_joint_index().find(joint)
+    if data is not None:
+        # get the control node
+        controlNode = cmds.listConnections(data["module"] + ".controls")
+        return controlNode
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -756,9 +1131,26 @@ def findAssociatedMover(joint, module, useOffset=False):
     if module == "ART_Root_Module":
         return "root_mover"
 
+    jointIndex = get_joint_index()
+    key = (module, joint, useOffset)
+    mover = jointIndex.movers.get(key)
+    if mover is None:
+        mover = _findAssociatedMover(jointIndex, joint, module, useOffset)
+        if mover is not None:
+            jointIndex.movers[key] = mover
+    return mover
+
+
+def _findAssociatedMover(jointIndex, joint, module, useOffset):
+
     # figure out the name
-    moduleName = cmds.getAttr(module + ".moduleName")
-    baseName = cmds.getAttr(module + ".baseName")
+    data = jointIndex.module_data(module)
+    if data is not None:
+        moduleName = data["moduleName"]
+        baseName = data["baseName"]
+    else:
+        moduleName = cmds.getAttr(module + ".moduleName")
+        baseName = cmds.getAttr(module + ".baseName")
 
     moverName = joint + "_mover"
 
@@ -941,16 +1333,16 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
 
     When exporting a LOD skeletal mesh, there are many steps that need to happen:
         * First, the LOD needs to go back to the model pose. If there are any joints this LOD needs to remove, we must
-          save out the skin weight information first.
+          snapshot the skin weight information first (kept in memory, see weightUtils.WeightSnapshotStore).
         * If there is a LOD pose to set, set the pose then while the mesh is still skinned.
         * After setting the LOD pose, search for any connected blendshapes the meshes may have. If there are not true
           copies of the mesh in the scene, manually create new morph target copies by going through each blendshape
           attribute turning them on, one by one, duplicating the mesh each time.
         * After checking for blendshapes, delete history on the meshes. This will bake the LOD pose in.
-        * Next, re-apply the blendshapes now that the pose is baked in and import the skin weights.
-        * If there were bones to remove, before removing the joints, transfer the weighting of those bones to the bone
-          that was specified to transfer weighting to. Usually this is the first valid parent. So if removing all finger
-          bones in an LOD, you would likely transfer all finger weights to the hand bone.
+        * Next, re-apply the blendshapes now that the pose is baked in and re-apply the skin weights. The weighting of
+          the bones to remove is added onto the bone that was specified to transfer weighting to in the weight matrix
+          before it is applied. Usually this is the first valid parent. So if removing all finger bones in an LOD, you
+          would likely transfer all finger weights to the hand bone.
         * Once the weighting is transferred, it is then safe to delete the bones that were to be removed.
         * Now, we start building our selection of things to export. First though, we will check for any incoming
           connections to our joints that we want to export, and break those connections. These are usually connections
@@ -993,21 +1385,14 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
     progBar.setValue(0)
     progBar.show()
 
-    # if joints to remove, save out skinning
+    # if joints to remove, snapshot the skinning
     import Utilities.riggingUtils as riggingUtils
+    import Utilities.weightUtils as weightUtils
 
-    weightFiles = []
+    weightStore = weightUtils.WeightSnapshotStore(riggingUtils.WEIGHT_SNAPSHOT_SPILL_SIZE)
     if exportMeshes and removeBones or removeBones is not None:
 
         for mesh in exportMeshes:
-            skinCluster = riggingUtils.findRelatedSkinCluster(mesh)
-
-            # find a temporary place to save the weights out to
-            fullPath = os.path.join(cmds.internalVar(uwd=True), "artv2")
-            fullPath = os.path.join(fullPath, "weights")
-            if not os.path.exists(fullPath):
-                os.makedirs(fullPath)
-
             meshCheck = False
             # do a check to make sure we don't have naming conflicts
             if mesh.find("|") != -1:
@@ -1031,8 +1416,7 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
 
                     # clean up
                     if ret == QtWidgets.QMessageBox.Ok:
-                        for file in weightFiles:
-                            os.remove(file)
+                        weightStore.clear()
                     return
 
                 else:
@@ -1041,18 +1425,10 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
                 meshCheck = True
 
             if meshCheck:
-                fullPath = os.path.join(fullPath, mesh + ".weights")
-                fullPath = returnFriendlyPath(fullPath)
-
-                # add file to our list so we can delete later
-                weightFiles.append(fullPath)
-
-                # create skin class instance and save weights to location
+                # keep the weights in memory until the history is deleted
                 progBar.setFormat("Exporting Skin Weights..")
                 progBar.setValue(progBar.getValue() + 1)
-                skin = riggingUtils.export_skin_weights(fullPath, mesh)
-                if skin is not None:
-                    skin.exportSkinWeights(fullPath)
+                riggingUtils.snapshot_skin_weights(weightStore, mesh)
 
     if exportMeshes is None:
         msgBox = QtWidgets.QMessageBox()
@@ -1154,24 +1530,21 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
     #     except:
     #         pass
 
-    # import skin weights
+    # re-apply skin weights, moving the weighting of the bones to remove onto their transfer bone in the weight matrix
     if exportMeshes and removeBones or removeBones is not None:
+        transfers = {}
+        for entry in removeBones or []:
+            for joint in entry[1]:
+                transfers[joint] = entry[0]
 
         for mesh in exportMeshes:
             progBar.setFormat("Importing Skin Weights")
             progBar.setValue(progBar.getValue() + 1)
+            riggingUtils.restore_skin_weights(weightStore, mesh, True, transfers)
 
-            fullPath = os.path.join(cmds.internalVar(uwd=True), "artv2")
-            fullPath = os.path.join(fullPath, "weights")
-            fullPath = os.path.join(fullPath, mesh + ".weights")
-            fullPath = returnFriendlyPath(fullPath)
-            if os.path.exists(fullPath):
-                riggingUtils.import_skin_weights(fullPath, mesh, True)
+    weightStore.clear()
 
-    for f in weightFiles:
-        os.remove(f)
-
-    # transfer weighting information
+    # clean up the weighting
     for mesh in exportMeshes:
         skinCluster = riggingUtils.findRelatedSkinCluster(mesh)
 
@@ -1180,34 +1553,8 @@ def exportMesh(mainUI, exportMeshes, exportPath, removeBones, poseDict):
         # prune weights
         cmds.skinPercent(skinCluster, mesh, prw=0.001)
 
-        # remove unused influences
-        weightedInfs = cmds.skinCluster(skinCluster, q=True, weightedInfluence=True)
-        allInfs = cmds.skinCluster(skinCluster, q=True, inf=True)
-        for inf in allInfs:
-            if inf not in weightedInfs:
-                cmds.skinCluster(skinCluster, edit=True, ri=inf)
-
-        # get mesh influences
-        meshInfluences = cmds.skinCluster(skinCluster, q=True, wi=True)
-
-        # transfer weighting
-        if removeBones is not None:
-            for entry in removeBones:
-                transferBone = entry[0]
-                deleteBones = entry[1]
-
-                for joint in deleteBones:
-                    if joint in meshInfluences:
-
-                        currentInfluences = cmds.skinCluster(skinCluster, q=True, inf=True)
-                        if transferBone not in currentInfluences:
-                            cmds.skinCluster(skinCluster, e=True, wt=0, ai=transferBone)
-
-                        for x in range(cmds.polyEvaluate(mesh, v=True)):
-                            value = cmds.skinPercent(skinCluster, (mesh + ".vtx[" + str(x) + "]"), t=joint, q=True)
-                            if value > 0:
-                                cmds.skinPercent(skinCluster, (mesh + ".vtx[" + str(x) + "]"),
-                                                 tmw=[joint, transferBone])
+        # remove unused influences (this includes the bones to remove, their weighting was transferred on import)
+        riggingUtils.remove_unused_influences(skinCluster)
 
         progBar.setFormat("Transferring Weighting..")
         progBar.setValue(progBar.getValue() + 1)
@@ -1418,85 +1765,159 @@ def returnNicePath(toolsPath, imagePath):
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
-def splitMesh(mesh, assetName):
+def splitMesh(mesh, assetName, threshold=None):
     """
     Take the given mesh and break it into chunks based on the influence weights of each bone. For example,
     if the mesh was a leg that was skinned to a thigh bone, a calf bone, and a foot bone, this function will
     split the leg mesh into three new meshes, one for each major influence. This is sometimes known as an
     "anim mesh"
 
+    The weight matrix is read once and every face is assigned in one pass (see _split_mesh_faces). Only the
+    influences that end up owning faces get a mesh.
+
     :param mesh: name of mesh to split up
     :param assetName: name of character or rig (the name given on publish)
+    :param threshold: if None, each face goes to the influence with the highest summed weight over its vertices.
+                      Otherwise a face goes to every influence weighted above threshold on all of its vertices
+                      (0.5 gives the original behavior, which can leave faces unassigned).
     :return: a list of the newly created meshes
     """
 
     # get mesh's skinCluster
     skinCluster = riggingUtils.findRelatedSkinCluster(mesh)
 
-    # get the influences in that skinCluster
-    influences = cmds.skinCluster(skinCluster, q=True, inf=True)
+    if skinCluster is None:
+        cmds.warning(mesh + " has no skinCluster. Skipping.")
+        return []
+
+    # read the influences and the whole weight matrix at once
+    influences, weights, influenceCount = riggingUtils.get_skin_weights(skinCluster)
+    if not influences:
+        cmds.warning("skinCluster " + skinCluster + " on " + mesh + " has no influences. Skipping.")
+        return []
 
     # create a group if it doesn't exist
     if not cmds.objExists(assetName + "_animMeshGrp"):
         cmds.group(empty=True, name=assetName + "_animMeshGrp")
 
+    # if there is only 1 influence, constrain the entire mesh as is
+    if len(influences) <= 1:
+        influenceName = influences[0].rpartition("|")[2]
+        if cmds.objExists(mesh + "_" + influenceName):
+            cmds.warning("Mesh with name: " + mesh + "_" + influenceName + " already exists. Skipping.")
+            return []
+        newMesh = cmds.duplicate(mesh, name=mesh + "_" + influenceName)[0]
+        for attr in [".tx", ".ty", ".tz", ".rx", ".ry", ".rz"]:
+            cmds.setAttr(newMesh + attr, lock=False)
+        cmds.parentConstraint(influences[0], newMesh, mo=True)
+        return []
+
+    # face -> vertices of the mesh, then the faces owned by each influence
+    faceCounts, faceVertices = api.MFnMesh(riggingUtils.get_dag_path(mesh)).getVertices()
+    numFaces = len(faceCounts)
+    faceSets = _split_mesh_faces(weights, influenceCount, faceCounts, faceVertices, threshold)
+
     newMeshes = []
-    # loop through each influence, creating a mesh for that influnece is applicable
-    for influence in influences:
-        # create a new mesh
-        if cmds.objExists(mesh + "_" + influence):
-            cmds.warning("Mesh with name: " + mesh + "_" + influence + " already exists. Skipping.")
-        else:
-            newMesh = cmds.duplicate(mesh, name=mesh + "_" + influence)[0]
+    # create a mesh for each influence that owns faces
+    for index in sorted(faceSets):
+        influence = influences[index]
+        influenceName = influence.rpartition("|")[2]
+        faces = faceSets[index]
+
+        if cmds.objExists(mesh + "_" + influenceName):
+            cmds.warning("Mesh with name: " + mesh + "_" + influenceName + " already exists. Skipping.")
+            continue
 
-            # unlock attrs so we can add a constraint later
-            for attr in [".tx", ".ty", ".tz", ".rx", ".ry", ".rz"]:
-                cmds.setAttr(newMesh + attr, lock=False)
+        newMesh = cmds.duplicate(mesh, name=mesh + "_" + influenceName)[0]
 
-            # if there is only 1 influence, constrain the entire mesh as is
-            if len(influences) <= 1:
-                cmds.parentConstraint(influence, newMesh, mo=True)
+        # unlock attrs so we can add a constraint later
+        for attr in [".tx", ".ty", ".tz", ".rx", ".ry", ".rz"]:
+            cmds.setAttr(newMesh + attr, lock=False)
 
-            # otherwise, loop through each influence getting the components affected by that influence
-            else:
-                verts = []
-                notWeighted = []
+        # delete the faces owned by other influences
+        if len(faces) != numFaces:
+            keep = set(faces)
+            cmds.delete(component_ranges(newMesh + ".f", [face for face in range(numFaces) if face not in keep]))
 
-                for i in range(cmds.polyEvaluate(mesh, v=True)):
-                    value = cmds.skinPercent(skinCluster, mesh + ".vtx[" + str(i) + "]", transform=influence, q=True)
+        # constrain mesh to influence, parent mesh to group
+        cmds.parentConstraint(influence, newMesh, mo=True)
+        cmds.parent(newMesh, assetName + "_animMeshGrp")
 
-                    if value > 0.5:
-                        verts.append(newMesh + ".vtx[" + str(i) + "]")
+        # fill holes, triangulate, and smooth normals
+        cmds.polyCloseBorder(newMesh, ch=False)
+        cmds.polyTriangulate(newMesh, ch=False)
+        cmds.polySoftEdge(newMesh, a=90, ch=False)
+        newMeshes.append(newMesh)
 
-                    else:
-                        notWeighted.append(newMesh + ".vtx[" + str(i) + "]")
+    return (newMeshes)
 
-                # if the amount of non-weighted verts is the same as the number of verts in the mesh, delete the mesh.
-                if len(notWeighted) == cmds.polyEvaluate(mesh, v=True):
-                    cmds.delete(newMesh)
 
-                if verts:
-                    # select all verts
-                    cmds.select(newMesh + ".vtx[*]")
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _split_mesh_faces(weights, influenceCount, faceCounts, faceVertices, threshold=None):
+    """
+    Assigns the faces of a mesh to influences, for splitMesh.
 
-                    # Convert the selection to contained faces
-                    if len(verts) != cmds.polyEvaluate(mesh, v=True):
-                        # unselect the verts we want to keep, convert remaining to faces and delete
-                        cmds.select(verts, tgl=True)
-                        cmds.select(cmds.polyListComponentConversion(fv=True, tf=True, internal=False))
-                        cmds.delete()
+    :param weights: flat, vertex-major weight matrix.
+    :param influenceCount: number of influences (columns of the matrix).
+    :param faceCounts: number of vertices of each face.
+    :param faceVertices: flat list of the vertices of each face.
+    :param threshold: see splitMesh.
+    :return: dictionary of influence index to the list of faces it owns. Influences without faces are left out.
+    """
 
-                    # constrain mesh to influence, parent mesh to group
-                    cmds.parentConstraint(influence, newMesh, mo=True)
-                    cmds.parent(newMesh, assetName + "_animMeshGrp")
+    faceSets = {}
+    if not influenceCount:
+        return faceSets
 
-                    # fill holes, triangulate, and smooth normals
-                    cmds.polyCloseBorder(newMesh, ch=False)
-                    cmds.polyTriangulate(newMesh, ch=False)
-                    cmds.polySoftEdge(newMesh, a=90, ch=False)
-                    newMeshes.append(newMesh)
+    if numpy is not None:
+        matrix = numpy.asarray(weights, dtype=numpy.float64).reshape(-1, influenceCount)
+        counts = numpy.asarray(faceCounts, dtype=numpy.int64)
+        starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+        cornerWeights = matrix[numpy.asarray(faceVertices, dtype=numpy.int64)]
 
-    return (newMeshes)
+        if threshold is None:
+            owners = numpy.add.reduceat(cornerWeights, starts, axis=0).argmax(axis=1)
+            for index in numpy.unique(owners):
+                faceSets[int(index)] = numpy.nonzero(owners == index)[0].tolist()
+        else:
+            owned = numpy.logical_and.reduceat(cornerWeights > threshold, starts, axis=0)
+            for index in numpy.nonzero(owned.any(axis=0))[0]:
+                faceSets[int(index)] = numpy.nonzero(owned[:, index])[0].tolist()
+        return faceSets
+
+    columns = range(influenceCount)
+    start = 0
+    for face, count in enumerate(faceCounts):
+        vertices = faceVertices[start:start + count]
+        start += count
+
+        if threshold is None:
+            sums = [0.0] * influenceCount
+            for vertex in vertices:
+                base = vertex * influenceCount
+                for column in columns:
+                    sums[column] += weights[base + column]
+            faceSets.setdefault(sums.index(max(sums)), []).append(face)
+        else:
+            for column in columns:
+                if all(weights[vertex * influenceCount + column] > threshold for vertex in vertices):
+                    faceSets.setdefault(column, []).append(face)
+    return faceSets
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def component_ranges(prefix, indices):
+    """
+    Collapses sorted component indices into as few "prefix[start:end]" names as possible.
+    """
+
+    ranges = []
+    for index in indices:
+        if ranges and ranges[-1][1] == index - 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ["{0}[{1}:{2}]".format(prefix, start, end) for start, end in ranges]
 
 
 # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -1700,18 +2121,135 @@ def _get_character_controls(character_node):
     character_controls = []
 
     if cmds.objExists(character_node):
-        modules = cmds.listConnections(character_node + ".rigModules")
-        if modules is not None:
-            for module in modules:
-                controls = cmds.listConnections(module + ".controls")
+        for module, groups in get_control_map(character_node):
+            for group, controls in groups:
+                character_controls.extend(controls)
+
+    return character_controls
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def get_control_map(character_node):
+    """
+    Gets the controls of a character, by module and control group:
+
+        [[module network node, [[control group attribute, [controls]], ...]], ...]
+
+    Maps are cached per character node. A cached map, or failing that the one stored on the character node's
+    .controlMap attribute at rig build (see save_control_map), is checked against the character's rig modules and the
+    existence of its controls before it is returned. If the check fails, the map is rebuilt from the connections.
+
+    :param character_node: The character network node (ART_RIG_ROOT, with its namespace).
+    :return: The control map. It is shared, so it should not be modified.
+    """
+
+    control_map = _CONTROL_MAPS.get(character_node)
+    if control_map is None:
+        control_map = _read_control_map(character_node)
+
+    if control_map is None or not _control_map_valid(character_node, control_map):
+        control_map = build_control_map(character_node)
+
+    _CONTROL_MAPS[character_node] = control_map
+    return control_map
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def build_control_map(character_node):
+    """
+    Builds the control map of a character (see get_control_map) from the network node connections. The control
+    nodes of all modules are found in one listConnections call, and all of their control connections in another.
+
+    :param character_node: The character network node.
+    :return: The control map.
+    """
+
+    modules = cmds.listConnections(character_node + ".rigModules")
+    if modules is None:
+        return []
+
+    # module.controls plugs paired with the control nodes connected to them
+    control_nodes = {}
+    connections = cmds.listConnections([module + ".controls" for module in modules], connections=True) or []
+    for index in range(0, len(connections), 2):
+        control_nodes.setdefault(connections[index].partition(".")[0], []).append(connections[index + 1])
+
+    # control node attribute plugs paired with the controls connected to them
+    group_controls = {}
+    all_control_nodes = [node for module in modules for node in control_nodes.get(module, [])]
+    if all_control_nodes:
+        connections = cmds.listConnections(all_control_nodes, source=False, connections=True) or []
+        for index in range(0, len(connections), 2):
+            node, separator, attr = connections[index].partition(".")
+            group_controls.setdefault((node, attr.partition("[")[0]), []).append(connections[index + 1])
+
+    control_map = []
+    for module in modules:
+        groups = []
+        for control_node in control_nodes.get(module, []):
+            for attr in cmds.listAttr(control_node, ud=True) or []:
+                controls = group_controls.get((control_node, attr))
                 if controls is not None:
-                    for control in controls:
-                        attrs = cmds.listAttr(control, ud=True)
+                    groups.append([attr, controls])
+        control_map.append([module, groups])
 
-                        # loop through attrs, getting connections
-                        for attr in attrs:
-                            connections = cmds.listConnections(control + "." + attr, source=False)
-                            if connections is not None:
-                                character_controls.extend(connections)
+    return control_map
 
-    return character_controls
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def save_control_map(character_node):
+    """
+    Builds the control map of a character and stores it on the character node's .controlMap attribute as a compact
+    JSON string, with names relative to the character's namespace. Called at the end of a rig build.
+
+    :param character_node: The character network node.
+    :return: The control map.
+    """
+
+    control_map = build_control_map(character_node)
+    _CONTROL_MAPS[character_node] = control_map
+
+    stored = [[remove_namespace(module), [[group, [remove_namespace(control) for control in controls]]
+                                          for group, controls in groups]] for module, groups in control_map]
+
+    locked = cmds.lockNode(character_node, q=True, lock=True)[0]
+    if locked:
+        cmds.lockNode(character_node, lock=False)
+    if not cmds.objExists(character_node + ".controlMap"):
+        cmds.addAttr(character_node, ln="controlMap", dt="string")
+    cmds.setAttr(character_node + ".controlMap", json.dumps(stored, separators=(",", ":")), type="string")
+    if locked:
+        cmds.lockNode(character_node, lock=True)
+
+    return control_map
+
+
+def _read_control_map(character_node):
+
+    if not cmds.objExists(character_node + ".controlMap"):
+        return None
+    data = cmds.getAttr(character_node + ".controlMap")
+    if not data:
+        return None
+
+    try:
+        stored = json.loads(data)
+    except ValueError:
+        return None
+
+    namespace = get_namespace(character_node)
+    return [[namespace + module, [[group, [namespace + control for control in controls]]
+                                  for group, controls in groups]] for module, groups in stored]
+
+
+def _control_map_valid(character_node, control_map):
+
+    modules = cmds.listConnections(character_node + ".rigModules") or []
+    if sorted(modules) != sorted([module for module, groups in control_map]):
+        return False
+
+    controls = set(control for module, groups in control_map for group, group_controls in groups
+                   for control in group_controls)
+    if not controls:
+        return True
+    return len(cmds.ls(list(controls))) == len(controls)
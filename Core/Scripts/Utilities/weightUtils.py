@@ -0,0 +1,1250 @@
+"""
+This module reads and writes the binary .weights skin weight file format and holds the sparse weight storage used by
+riggingUtils.SkinData. It is pure python on purpose, so weight files can be inspected and processed outside of a Maya
+session.
+
+File layout (all values little-endian):
+
+|   **preamble:** 4 byte magic ("ARTW"), uint16 format version, uint16 flags, uint32 header size
+|   **header:** utf-8 JSON, padded with spaces so the data blocks start on an 8 byte boundary
+|   **data blocks:** packed arrays, described per skinCluster record in the header
+
+The header holds a list of records, one per skinCluster, with the shape name, skinCluster name, influence names,
+skinCluster attribute values and the offset/size of every data block.
+
+|   **version 1:** a dense float32 weight matrix (numVertices x numInfluences, vertex-major) and float32 blend weights
+|   **version 2:** sparse weights in CSR form (uint32 row offsets, uint16 influence indices, float32 values) and
+|   float32 blend weights
+
+If numpy is available the data blocks are memory-mapped rather than read into memory.
+
+Legacy JSON weight files (riggingUtils.export_skin_weights with binary=False, and the vertex files written by
+riggingUtils.SkinWeights) are parsed incrementally by JSONStreamReader and packed into compact arrays as they are
+read, so importing them never holds the whole file, or a dictionary per vertex, in memory.
+"""
+
+import array
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# GLOBALS
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+MAGIC = b"ARTW"
+VERSION = 2
+PREAMBLE = struct.Struct("<4sHHI")
+ALIGNMENT = 8
+
+# array module typecodes and their numpy equivalents
+DTYPES = {"float32": ("f", "<f4"),
+          "uint32": ("I", "<u4"),
+          "uint16": ("H", "<u2")}
+
+# characters read from a JSON file at a time by JSONStreamReader
+READ_CHUNK = 1024 * 1024
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?")
+NUMBER_CHARS = re.compile(r"[-+.eE0-9]*")
+
+# record keys that are not skinCluster attributes
+RESERVED_KEYS = ("shape", "skinCluster", "influences", "weightMatrix", "sparseWeights", "blendWeights", "weights")
+
+# weight changes at or below this value are not reported by clean_weights
+DELTA_EPSILON = 1e-6
+
+# largest weight change compare_weights still counts as unchanged
+DIFF_TOLERANCE = 1e-4
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# CLASSES
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class SparseWeights(object):
+    """
+    Skin weights in compressed sparse row (CSR) form. Row v holds the non-zero weights of vertex v:
+
+        indices[offsets[v]:offsets[v + 1]] are columns into influences
+        values[offsets[v]:offsets[v + 1]] are the matching weights
+
+    A vertex rarely has more than 4-8 non-zero weights, so this is a small fraction of a dense
+    numVertices x numInfluences matrix.
+    """
+
+    def __init__(self, influences, offsets, indices, values):
+        self.influences = list(influences)
+        self.offsets = offsets
+        self.indices = indices
+        self.values = values
+
+    @property
+    def num_vertices(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    def row(self, vertex):
+        """
+        :param vertex: vertex index.
+        :return: (influence indices, weights) of the given vertex.
+        """
+
+        start, end = self.offsets[vertex], self.offsets[vertex + 1]
+        return self.indices[start:end], self.values[start:end]
+
+    @classmethod
+    def from_matrix(cls, influences, weight_matrix, epsilon=0.0):
+        """
+        Builds sparse weights from a flat, vertex-major weight matrix, dropping every weight whose magnitude is not
+        above epsilon.
+
+        :param influences: list of influence names (columns of the matrix).
+        :param weight_matrix: flat sequence of weights (list, array, MDoubleArray or numpy array).
+        :param epsilon: prune threshold.
+        :return: SparseWeights instance.
+        """
+
+        count = len(influences)
+        if numpy is not None and isinstance(weight_matrix, numpy.ndarray):
+            matrix = weight_matrix.reshape(-1, count) if count else weight_matrix.reshape(0, 0)
+            rows, columns = numpy.nonzero(numpy.abs(matrix) > epsilon)
+            offsets = numpy.zeros(matrix.shape[0] + 1, dtype=numpy.uint32)
+            numpy.cumsum(numpy.bincount(rows, minlength=matrix.shape[0]), out=offsets[1:])
+            return cls(influences, offsets, columns.astype(numpy.uint16),
+                       matrix[rows, columns].astype(numpy.float32))
+
+        offsets = array.array("I", [0])
+        indices = array.array("H")
+        values = array.array("f")
+        if count:
+            weight_matrix = list(weight_matrix)
+            for start in xrange(0, len(weight_matrix), count):
+                for index, value in enumerate(weight_matrix[start:start + count]):
+                    if value > epsilon or value < -epsilon:
+                        indices.append(index)
+                        values.append(value)
+                offsets.append(len(values))
+        return cls(influences, offsets, indices, values)
+
+    @classmethod
+    def from_influence_dict(cls, weights, epsilon=0.0):
+        """
+        Builds sparse weights from the legacy {influence: [weight per vertex]} layout of the JSON weight files.
+
+        :param weights: dictionary of influence name to a list of weights.
+        :param epsilon: prune threshold.
+        :return: SparseWeights instance.
+        """
+
+        influences = sorted(weights.keys())
+        columns = [weights[name] for name in influences]
+        offsets = array.array("I", [0])
+        indices = array.array("H")
+        values = array.array("f")
+        for row in zip(*columns):
+            for index, value in enumerate(row):
+                if value > epsilon or value < -epsilon:
+                    indices.append(index)
+                    values.append(value)
+            offsets.append(len(values))
+        return cls(influences, offsets, indices, values)
+
+    def to_matrix(self, influences=None, typecode="d"):
+        """
+        Expands the weights into a flat, vertex-major matrix. Only the non-zero entries are visited.
+
+        :param influences: column order of the result. Defaults to self.influences. Influences that are not in this
+                           list are dropped, influences missing from self.influences get zero weights.
+        :param typecode: array module typecode of the result.
+        :return: array.array of numVertices * len(influences) weights.
+        """
+
+        if influences is None:
+            influences = self.influences
+        count = len(influences)
+        column_map = self.column_map(influences)
+        matrix = array.array(typecode, [0.0]) * (self.num_vertices * count)
+
+        offsets, indices, values = self.offsets, self.indices, self.values
+        for vertex in xrange(self.num_vertices):
+            base = vertex * count
+            for entry in xrange(offsets[vertex], offsets[vertex + 1]):
+                column = column_map[indices[entry]]
+                if column is not None:
+                    matrix[base + column] = values[entry]
+        return matrix
+
+    def to_influence_dict(self):
+        """
+        :return: the legacy {influence: [weight per vertex]} layout of the JSON weight files.
+        """
+
+        count = len(self.influences)
+        if not count:
+            return {}
+        matrix = self.to_matrix()
+        return dict((name, list(matrix[index::count])) for index, name in enumerate(self.influences))
+
+    def column_map(self, influences):
+        """
+        :param influences: list of influence names.
+        :return: list mapping each column of self.influences to its index in the given list (or None).
+        """
+
+        lookup = dict((name, index) for index, name in enumerate(influences))
+        return [lookup.get(name) for name in self.influences]
+
+    def pruned(self, epsilon):
+        """
+        :param epsilon: prune threshold.
+        :return: a new SparseWeights without the weights whose magnitude is not above epsilon.
+        """
+
+        offsets = array.array("I", [0])
+        indices = array.array("H")
+        values = array.array("f")
+        for vertex in xrange(self.num_vertices):
+            for entry in xrange(self.offsets[vertex], self.offsets[vertex + 1]):
+                value = self.values[entry]
+                if value > epsilon or value < -epsilon:
+                    indices.append(self.indices[entry])
+                    values.append(value)
+            offsets.append(len(values))
+        return SparseWeights(self.influences, offsets, indices, values)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class JSONStreamReader(object):
+    """
+    Reads a JSON document incrementally from a file object, READ_CHUNK characters at a time.
+
+    iter_object and iter_array walk a container without decoding it: iter_object yields each key and iter_array the
+    index of each element, and the caller must consume the matching value (read_value, read_array, iter_object or
+    iter_array) before asking for the next one. read_value decodes a whole value, so it is meant for small ones.
+    """
+
+    def __init__(self, fobj, chunk_size=READ_CHUNK):
+        self.fobj = fobj
+        self.chunk_size = chunk_size
+        self.text = fobj.read(0)
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def read_value(self):
+        """
+        :return: the next value, decoded.
+        """
+
+        char = self._peek()
+        while True:
+            if char == "-" or char.isdigit():
+                # a number cut off by the end of the buffer ("0.", "1e-") matches a shorter one, so it is only taken
+                # once something that can't continue it follows
+                match = NUMBER.match(self.text, self.pos)
+                if match and (NUMBER_CHARS.match(self.text, match.end()).end() < len(self.text) or self.eof):
+                    self.pos = match.end()
+                    if match.group(1) or match.group(2):
+                        return float(match.group(0))
+                    return int(match.group(0))
+            else:
+                try:
+                    value, end = self.decoder.raw_decode(self.text, self.pos)
+                except ValueError:
+                    pass
+                else:
+                    self.pos = end
+                    return value
+
+            # the value continues past the end of the buffer
+            if not self._fill():
+                raise ValueError("Invalid JSON value at the end of the file.")
+
+    def read_array(self, typecode):
+        """
+        Reads the array of numbers starting at the current position into an array.array.
+
+        :param typecode: array module typecode of the result.
+        :return: array.array instance.
+        """
+
+        values = array.array(typecode)
+        for index in self.iter_array():
+            values.append(self.read_value())
+        return values
+
+    def iter_object(self):
+        """
+        Walks the object starting at the current position, yielding its keys.
+        """
+
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self._next_separator("}"):
+                return
+
+    def iter_array(self):
+        """
+        Walks the array starting at the current position, yielding the index of each element.
+        """
+
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._next_separator("]"):
+                return
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fobj.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data.")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError("Expected '{0}' in JSON data, found '{1}'.".format(char, self.text[self.pos]))
+        self.pos += 1
+
+    def _next_separator(self, closing):
+        char = self._peek()
+        self.pos += 1
+        if char == closing:
+            return True
+        if char != ",":
+            raise ValueError("Expected ',' or '{0}' in JSON data, found '{1}'.".format(closing, char))
+        return False
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class VertexRecords(object):
+    """
+    Compact, read-only stand-in for the "vtxDict" of the vertex weight files written by riggingUtils.SkinWeights:
+
+        {"<vertex>": {"world": [x, y, z], "local": [x, y, z], "uv": [u, v, ...], "skinning": [[joint, weight], ...]}}
+
+    Positions and UVs are kept in flat arrays and the skinning in CSR form, with influence names collected in a
+    dictionary as they are first seen. Indexing by vertex key returns a record that reads like the original
+    dictionary.
+    """
+
+    def __init__(self):
+        self.joints = []
+        self.columns = {}
+        self.rows = {}
+        self.keys = []
+        self.world = array.array("d")
+        self.local = array.array("d")
+        self.uv_offsets = array.array("I", [0])
+        self.uvs = array.array("d")
+        self.offsets = array.array("I", [0])
+        self.indices = array.array("H")
+        self.values = array.array("f")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __getitem__(self, key):
+        return _VertexRecord(self, self.rows[key])
+
+    def add(self, key, record):
+        """
+        Appends one vertex.
+
+        :param key: vertex key, as found in the file.
+        :param record: the vertex dictionary.
+        """
+
+        self.rows[key] = len(self.keys)
+        self.keys.append(key)
+        self.world.extend(record["world"])
+        self.local.extend(record["local"])
+        self.uvs.extend(record.get("uv", ()))
+        self.uv_offsets.append(len(self.uvs))
+
+        for joint, weight in record["skinning"]:
+            column = self.columns.get(joint)
+            if column is None:
+                column = self.columns[joint] = len(self.joints)
+                self.joints.append(joint)
+            self.indices.append(column)
+            self.values.append(weight)
+        self.offsets.append(len(self.values))
+
+
+class _VertexRecord(object):
+    def __init__(self, records, row):
+        self.records = records
+        self.row = row
+
+    def __getitem__(self, field):
+        records, row = self.records, self.row
+        if field == "world":
+            return list(records.world[row * 3:row * 3 + 3])
+        if field == "local":
+            return list(records.local[row * 3:row * 3 + 3])
+        if field == "uv":
+            return list(records.uvs[records.uv_offsets[row]:records.uv_offsets[row + 1]])
+        if field == "skinning":
+            start, end = records.offsets[row], records.offsets[row + 1]
+            return [[records.joints[records.indices[entry]], records.values[entry]] for entry in xrange(start, end)]
+        raise KeyError(field)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class WeightSnapshotStore(object):
+    """
+    Holds gathered skin data records in memory, keyed by mesh and skinCluster, so weights can be restored later in
+    the same session (for instance across a skeleton rebuild) without a round-trip through weight files.
+
+    If spill_size is given, meshes added once the held records exceed that many bytes are written to binary .weights
+    files in a temporary folder instead, and read back when they are restored.
+    """
+
+    def __init__(self, spill_size=None):
+        self.spill_size = spill_size
+        self.size = 0
+        self.spill_folder = None
+        self.spill_count = 0
+        self._records = {}
+        self._spilled = {}
+
+    def __contains__(self, mesh):
+        return mesh in self._records or mesh in self._spilled
+
+    def __len__(self):
+        return len(self._records) + len(self._spilled)
+
+    def meshes(self):
+        """
+        :return: names of the meshes that have a snapshot.
+        """
+
+        return list(self._records) + list(self._spilled)
+
+    def put(self, mesh, records):
+        """
+        Stores the skin data records of a mesh, replacing any earlier snapshot of it.
+
+        :param mesh: name of the mesh the records were gathered from.
+        :param records: list of skin data dictionaries (see riggingUtils.SkinData.gather_data).
+        """
+
+        self.discard(mesh)
+        size = sum(record_size(record) for record in records)
+
+        if self.spill_size is not None and self.size + size > self.spill_size:
+            if self.spill_folder is None:
+                self.spill_folder = tempfile.mkdtemp(prefix="artv2_weights_")
+            # numbered by a count that only goes up, so a name is never reused while another mesh holds it
+            file_path = os.path.join(self.spill_folder, "{0}.weights".format(self.spill_count))
+            self.spill_count += 1
+            write_weights_file(file_path, records)
+            self._spilled[mesh] = file_path
+            return
+
+        self._records[mesh] = (list(records), size)
+        self.size += size
+
+    def get(self, mesh, skin_cluster=None):
+        """
+        :param mesh: name of the mesh.
+        :param skin_cluster: if given, only the record of this skinCluster is returned.
+        :return: list of skin data dictionaries, empty if there is no snapshot of the mesh.
+        """
+
+        if mesh in self._spilled:
+            records = [_load_record(record) for record in read_weights_file(self._spilled[mesh])]
+        elif mesh in self._records:
+            records = self._records[mesh][0]
+        else:
+            return []
+
+        if skin_cluster is not None:
+            records = [record for record in records if record["skinCluster"] == skin_cluster]
+        return records
+
+    def pop(self, mesh, skin_cluster=None):
+        """
+        Same as get, but also removes the snapshot of the mesh from the store.
+        """
+
+        records = self.get(mesh, skin_cluster)
+        self.discard(mesh)
+        return records
+
+    def discard(self, mesh):
+        """
+        Removes the snapshot of the mesh, if there is one.
+
+        :param mesh: name of the mesh.
+        """
+
+        if mesh in self._records:
+            self.size -= self._records.pop(mesh)[1]
+        if mesh in self._spilled:
+            try:
+                os.remove(self._spilled.pop(mesh))
+            except OSError:
+                pass
+
+    def clear(self):
+        """
+        Removes every snapshot, including any spilled to disk.
+        """
+
+        self._records = {}
+        self._spilled = {}
+        self.size = 0
+        if self.spill_folder is not None:
+            shutil.rmtree(self.spill_folder, ignore_errors=True)
+            self.spill_folder = None
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# FUNCTIONS (STAND-ALONE)
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def is_binary_weights_file(file_path):
+    """
+    Checks the first bytes of the given file for the binary weight file magic. Anything else (legacy JSON files)
+    returns False.
+
+    :param file_path: path to the weight file on disk.
+    :return: True if the file is a binary .weights file.
+    """
+
+    if not os.path.isfile(file_path):
+        return False
+    with open(file_path, "rb") as fobj:
+        return fobj.read(len(MAGIC)) == MAGIC
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def to_float_array(values, typecode="f"):
+    """
+    Converts any sequence of numbers (list, MDoubleArray, numpy array) to a packed array.array.
+
+    :param values: sequence of numbers.
+    :param typecode: array module typecode of the result.
+    :return: array.array instance.
+    """
+
+    if isinstance(values, array.array) and values.typecode == typecode:
+        return values
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        packed = array.array(typecode)
+        packed.extend(values.tolist())
+        return packed
+    if typecode in "fd":
+        return array.array(typecode, [float(value) for value in values])
+    return array.array(typecode, [int(value) for value in values])
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def sparse_weights_from_record(record, epsilon=0.0):
+    """
+    Returns the weights of a skin data record as SparseWeights, whichever layout the record came in: sparse (binary
+    version 2 and SkinData.gather_data), dense (binary version 1) or the legacy JSON influence dictionary.
+
+    :param record: skin data dictionary.
+    :param epsilon: prune threshold.
+    :return: SparseWeights instance.
+    """
+
+    if "sparseWeights" in record:
+        sparse = record["sparseWeights"]
+        return sparse.pruned(epsilon) if epsilon else sparse
+    if "weightMatrix" in record:
+        return SparseWeights.from_matrix(record["influences"], record["weightMatrix"], epsilon)
+    return SparseWeights.from_influence_dict(record["weights"], epsilon)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def read_json_weights_file(file_path, epsilon=0.0):
+    """
+    Streams a legacy JSON weight file (a list of skin data records with {influence: [weight per vertex]} weights).
+    The weights are pruned and packed as they are parsed, so the records come back with a "sparseWeights" entry,
+    like version 2 binary files, and the file is never loaded into memory as a whole.
+
+    :param file_path: path of the file to read.
+    :param epsilon: prune threshold.
+    :return: list of skin data dictionaries.
+    """
+
+    records = []
+    with io.open(file_path, "r", encoding="utf-8") as fobj:
+        reader = JSONStreamReader(fobj)
+        for index in reader.iter_array():
+            record = {}
+            for key in reader.iter_object():
+                if key == "weights":
+                    record["sparseWeights"] = _read_influence_weights(reader, epsilon)
+                elif key == "blendWeights":
+                    record["blendWeights"] = reader.read_array("f")
+                else:
+                    record[key] = reader.read_value()
+            records.append(record)
+    return records
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def read_vertex_weights_file(file_path):
+    """
+    Streams a vertex weight file written by riggingUtils.SkinWeights.exportSkinWeights. Vertices are parsed one at a
+    time into a VertexRecords instance, and the triangle list straight into an array.
+
+    :param file_path: path of the file to read.
+    :return: dictionary with "header", "vtxDict" (VertexRecords) and, if the file has them, "triangles".
+    """
+
+    data = {}
+    with io.open(file_path, "r", encoding="utf-8") as fobj:
+        reader = JSONStreamReader(fobj)
+        for key in reader.iter_object():
+            if key == "vtxDict":
+                vertices = data[key] = VertexRecords()
+                for vertex in reader.iter_object():
+                    vertices.add(vertex, reader.read_value())
+            elif key == "triangles":
+                data[key] = reader.read_array("I")
+            else:
+                data[key] = reader.read_value()
+    return data
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def smooth_weights(weights, influence_count, offsets, neighbors, vertices, iterations=1, strength=1.0, locked=()):
+    """
+    Laplacian smoothing of a flat, vertex-major weight matrix. Each iteration moves the weights of the given vertices
+    towards the average of their neighbours by strength (1.0 replaces them with the average, like Maya's weight
+    hammer). Locked influence columns keep their weights, and the other columns are renormalized so every row still
+    sums to one.
+
+    :param weights: flat weight matrix (list, array, MDoubleArray or numpy array).
+    :param influence_count: number of influences (columns).
+    :param offsets: CSR row offsets of the vertex adjacency (see riggingUtils.get_vertex_adjacency).
+    :param neighbors: CSR neighbour indices of the vertex adjacency.
+    :param vertices: indices of the vertices to smooth.
+    :param iterations: number of smoothing passes.
+    :param strength: blend factor towards the neighbour average, from 0.0 to 1.0.
+    :param locked: indices of the locked influence columns.
+    :return: the smoothed weight matrix (numpy array if numpy is available, otherwise a list).
+    """
+
+    locked = sorted(set(locked))
+    unlocked = [column for column in xrange(influence_count) if column not in locked]
+    vertices = list(vertices)
+
+    if numpy is not None:
+        matrix = numpy.array(weights, dtype=numpy.float64).reshape(-1, influence_count)
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        neighbors = numpy.asarray(neighbors, dtype=numpy.int64)
+        rows = numpy.asarray(vertices, dtype=numpy.int64)
+
+        # neighbours of the smoothed vertices, gathered once
+        starts, ends = offsets[rows], offsets[rows + 1]
+        degrees = ends - starts
+        has_neighbors = degrees > 0
+        gather = numpy.concatenate([neighbors[start:end] for start, end in zip(starts, ends)] or
+                                   [numpy.zeros(0, dtype=numpy.int64)])
+        segments = numpy.concatenate(([0], numpy.cumsum(degrees[has_neighbors])[:-1]))
+
+        for iteration in xrange(iterations):
+            current = matrix[rows]
+            average = current.copy()
+            if len(gather):
+                sums = numpy.add.reduceat(matrix[gather], segments, axis=0)
+                average[has_neighbors] = sums / degrees[has_neighbors][:, None]
+            smoothed = current + (average - current) * strength
+
+            if locked:
+                smoothed[:, locked] = current[:, locked]
+            if unlocked:
+                target = 1.0 - current[:, locked].sum(axis=1)
+                total = smoothed[:, unlocked].sum(axis=1)
+                scale = numpy.where(total > 0.0, target / numpy.where(total > 0.0, total, 1.0), 1.0)
+                smoothed[:, unlocked] *= scale[:, None]
+            matrix[rows] = smoothed
+        return matrix.ravel()
+
+    matrix = list(weights)
+    for iteration in xrange(iterations):
+        updates = []
+        for vertex in vertices:
+            base = vertex * influence_count
+            current = matrix[base:base + influence_count]
+            start, end = offsets[vertex], offsets[vertex + 1]
+            if end > start:
+                average = [0.0] * influence_count
+                for neighbor in neighbors[start:end]:
+                    neighbor_base = neighbor * influence_count
+                    for column in xrange(influence_count):
+                        average[column] += matrix[neighbor_base + column]
+                count = float(end - start)
+                average = [value / count for value in average]
+            else:
+                average = current
+            smoothed = [value + (mean - value) * strength for value, mean in zip(current, average)]
+
+            for column in locked:
+                smoothed[column] = current[column]
+            if unlocked:
+                target = 1.0 - sum(current[column] for column in locked)
+                total = sum(smoothed[column] for column in unlocked)
+                if total > 0.0:
+                    for column in unlocked:
+                        smoothed[column] *= target / total
+            updates.append((base, smoothed))
+
+        for base, smoothed in updates:
+            matrix[base:base + influence_count] = smoothed
+    return matrix
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def clean_weights(weights, influence_count, threshold=0.0, max_influences=0, normalize=True):
+    """
+    Prunes, caps and renormalizes a flat, vertex-major weight matrix in one pass: weights below the threshold are
+    zeroed, only the max_influences largest weights of each vertex are kept, and the rows are scaled back to sum to
+    one. The largest weight of a vertex is never pruned, so no vertex is left unweighted.
+
+    :param weights: flat weight matrix (list, array, MDoubleArray or numpy array).
+    :param influence_count: number of influences (columns).
+    :param threshold: weights below this value are pruned.
+    :param max_influences: largest number of influences per vertex, 0 for no limit.
+    :param normalize: whether to renormalize the rows.
+    :return: tuple of the cleaned weight matrix (numpy array if numpy is available, otherwise a list) and a report
+             dictionary with "vertices", "changed" (number of vertices whose weights changed), "pruned" (number of
+             weights zeroed), "maxDelta" and "averageDelta" (largest weight change per changed vertex, averaged).
+    """
+
+    limit = max_influences if 0 < max_influences < influence_count else 0
+
+    if numpy is not None:
+        matrix = numpy.array(weights, dtype=numpy.float64).reshape(-1, influence_count)
+        original = matrix.copy()
+
+        keep = matrix >= threshold
+        keep[numpy.arange(len(matrix)), matrix.argmax(axis=1)] = True
+        if limit:
+            # everything but the largest max_influences columns of each row
+            smallest = numpy.argpartition(-matrix, limit - 1, axis=1)[:, limit:]
+            keep[numpy.arange(len(matrix))[:, None], smallest] = False
+        pruned = int(numpy.count_nonzero(matrix[~keep]))
+        matrix[~keep] = 0.0
+
+        if normalize:
+            totals = matrix.sum(axis=1)
+            matrix /= numpy.where(totals > 0.0, totals, 1.0)[:, None]
+
+        deltas = numpy.abs(matrix - original).max(axis=1)
+        changed = deltas > DELTA_EPSILON
+        report = {"vertices": len(matrix), "changed": int(changed.sum()), "pruned": pruned,
+                  "maxDelta": float(deltas.max()) if len(deltas) else 0.0,
+                  "averageDelta": float(deltas[changed].mean()) if changed.any() else 0.0}
+        return matrix.ravel(), report
+
+    matrix = list(weights)
+    num_vertices = len(matrix) // influence_count if influence_count else 0
+    report = {"vertices": num_vertices, "changed": 0, "pruned": 0, "maxDelta": 0.0, "averageDelta": 0.0}
+    total_delta = 0.0
+    for vertex in xrange(num_vertices):
+        base = vertex * influence_count
+        row = matrix[base:base + influence_count]
+        order = sorted(xrange(influence_count), key=row.__getitem__, reverse=True)
+        kept = [order[0]] + [column for column in order[1:] if row[column] >= threshold]
+        if limit:
+            kept = kept[:limit]
+
+        cleaned = [0.0] * influence_count
+        for column in kept:
+            cleaned[column] = row[column]
+        report["pruned"] += sum(1 for column in xrange(influence_count) if row[column] and not cleaned[column])
+
+        if normalize:
+            total = sum(cleaned)
+            if total > 0.0:
+                cleaned = [value / total for value in cleaned]
+
+        delta = max(abs(new - old) for new, old in zip(cleaned, row))
+        if delta > DELTA_EPSILON:
+            report["changed"] += 1
+            report["maxDelta"] = max(report["maxDelta"], delta)
+            total_delta += delta
+        matrix[base:base + influence_count] = cleaned
+
+    if report["changed"]:
+        report["averageDelta"] = total_delta / report["changed"]
+    return matrix, report
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def unused_columns(weights, influence_count, epsilon=0.0):
+    """
+    Finds the influences that carry no weight, from the column sums of a flat, vertex-major weight matrix.
+
+    :param weights: flat weight matrix (list, array, MDoubleArray or numpy array).
+    :param influence_count: number of influences (columns).
+    :param epsilon: columns summing to this value or less count as unused.
+    :return: sorted list of the unused column indices.
+    """
+
+    if numpy is not None:
+        totals = numpy.abs(numpy.asarray(weights, dtype=numpy.float64).reshape(-1, influence_count)).sum(axis=0)
+        return [int(column) for column in numpy.flatnonzero(totals <= epsilon)]
+
+    totals = [0.0] * influence_count
+    for index, value in enumerate(weights):
+        totals[index % influence_count] += abs(value)
+    return [column for column in xrange(influence_count) if totals[column] <= epsilon]
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def read_weight_records(file_path):
+    """
+    Reads the skin data records of a weight file, whether it is a binary .weights file or a legacy JSON file.
+
+    :param file_path: path of the file to read.
+    :return: list of skin data dictionaries.
+    """
+
+    if is_binary_weights_file(file_path):
+        return read_weights_file(file_path)
+
+    # legacy JSON files are streamed, they can be several hundred MB
+    return read_json_weights_file(file_path)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def compare_weights(source, target, tolerance=DIFF_TOLERANCE):
+    """
+    Compares two sets of skin weights, aligned by influence name and vertex index. Only the non-zero entries of
+    either side are visited, so the cost follows the number of weights rather than vertices x influences.
+
+    :param source: SparseWeights instance.
+    :param target: SparseWeights instance.
+    :param tolerance: largest weight change that still counts as unchanged.
+    :return: report dictionary with "vertices", "vertexCounts" (source, target), "vertexDeltas" (largest weight
+             change per vertex), "maxDelta", "changed" (number of vertices changed beyond the tolerance),
+             "changedPerInfluence" ({influence: number of vertices changed}), "addedInfluences" and
+             "removedInfluences" (influences only in the target, or only in the source), "tolerance" and "passed".
+    """
+
+    source_names = set(source.influences)
+    influences = list(source.influences) + [name for name in target.influences if name not in source_names]
+    count = len(influences)
+    num_vertices = max(source.num_vertices, target.num_vertices)
+
+    if numpy is not None:
+        keys = []
+        values = []
+        for weights, sign in ((source, 1.0), (target, -1.0)):
+            offsets = numpy.asarray(weights.offsets, dtype=numpy.int64)
+            rows = numpy.repeat(numpy.arange(weights.num_vertices, dtype=numpy.int64), numpy.diff(offsets))
+            column_map = numpy.array(weights.column_map(influences), dtype=numpy.int64)
+            columns = column_map[numpy.asarray(weights.indices, dtype=numpy.int64)]
+            keys.append(rows * count + columns)
+            values.append(numpy.asarray(weights.values, dtype=numpy.float64) * sign)
+
+        # sum the entries of both sides per (vertex, influence), keys come back sorted by vertex
+        keys, inverse = numpy.unique(numpy.concatenate(keys), return_inverse=True)
+        deltas = numpy.abs(numpy.bincount(inverse, weights=numpy.concatenate(values), minlength=len(keys)))
+        rows, columns = numpy.divmod(keys, max(count, 1))
+
+        vertex_deltas = numpy.zeros(num_vertices)
+        if len(keys):
+            vertices, starts = numpy.unique(rows, return_index=True)
+            vertex_deltas[vertices] = numpy.maximum.reduceat(deltas, starts)
+        changed = deltas > tolerance
+        per_influence = numpy.bincount(columns[changed], minlength=count).tolist()
+        changed_vertices = int(numpy.count_nonzero(vertex_deltas > tolerance))
+        max_delta = float(vertex_deltas.max()) if num_vertices else 0.0
+
+    else:
+        vertex_deltas = array.array("d", [0.0]) * num_vertices
+        per_influence = [0] * count
+        source_map = source.column_map(influences)
+        target_map = target.column_map(influences)
+        for vertex in xrange(num_vertices):
+            row = {}
+            if vertex < source.num_vertices:
+                for entry in xrange(source.offsets[vertex], source.offsets[vertex + 1]):
+                    column = source_map[source.indices[entry]]
+                    row[column] = row.get(column, 0.0) + source.values[entry]
+            if vertex < target.num_vertices:
+                for entry in xrange(target.offsets[vertex], target.offsets[vertex + 1]):
+                    column = target_map[target.indices[entry]]
+                    row[column] = row.get(column, 0.0) - target.values[entry]
+            for column, delta in row.items():
+                delta = abs(delta)
+                if delta > tolerance:
+                    per_influence[column] += 1
+                if delta > vertex_deltas[vertex]:
+                    vertex_deltas[vertex] = delta
+        changed_vertices = sum(1 for delta in vertex_deltas if delta > tolerance)
+        max_delta = max(vertex_deltas) if num_vertices else 0.0
+
+    target_names = set(target.influences)
+    return {"vertices": num_vertices,
+            "vertexCounts": (source.num_vertices, target.num_vertices),
+            "vertexDeltas": vertex_deltas,
+            "maxDelta": max_delta,
+            "changed": changed_vertices,
+            "changedPerInfluence": dict((influences[column], changes) for column, changes in enumerate(per_influence)
+                                        if changes),
+            "addedInfluences": [name for name in target.influences if name not in source_names],
+            "removedInfluences": [name for name in source.influences if name not in target_names],
+            "tolerance": tolerance,
+            "passed": not changed_vertices and source.num_vertices == target.num_vertices}
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def compare_weight_files(source_path, target_path, tolerance=DIFF_TOLERANCE):
+    """
+    Compares the skin weights of two weight files (binary or legacy JSON), matching their records by shape name. A
+    shape that is only in one of the files is compared against no weights at all, so it fails.
+
+    :param source_path: path of the reference weight file.
+    :param target_path: path of the weight file to check.
+    :param tolerance: largest weight change that still counts as unchanged.
+    :return: list of compare_weights reports, each with the "shape" it belongs to.
+    """
+
+    return compare_weight_records(read_weight_records(source_path), read_weight_records(target_path), tolerance)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def compare_weight_records(source_records, target_records, tolerance=DIFF_TOLERANCE):
+    """
+    Compares two lists of skin data records, matching them by shape name (see compare_weight_files).
+
+    :param source_records: list of reference skin data dictionaries.
+    :param target_records: list of skin data dictionaries to check.
+    :param tolerance: largest weight change that still counts as unchanged.
+    :return: list of compare_weights reports, each with the "shape" it belongs to.
+    """
+
+    targets = dict((record["shape"], record) for record in target_records)
+    shapes = [record["shape"] for record in source_records]
+    shapes += [record["shape"] for record in target_records if record["shape"] not in shapes]
+    sources = dict((record["shape"], record) for record in source_records)
+
+    empty = SparseWeights([], array.array("I", [0]), array.array("H"), array.array("f"))
+    reports = []
+    for shape in shapes:
+        source = sparse_weights_from_record(sources[shape]) if shape in sources else empty
+        target = sparse_weights_from_record(targets[shape]) if shape in targets else empty
+        report = compare_weights(source, target, tolerance)
+        report["shape"] = shape
+        reports.append(report)
+    return reports
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def transfer_weights(weights, transfers):
+    """
+    Moves the weights of some influences onto others, adding each source column into its target column (for
+    instance the weights of bones removed from a LOD onto the bone that replaces them). Targets that are not
+    influences yet are appended, and the source influences are kept with no weights, so they can be removed as unused.
+
+    :param weights: SparseWeights instance.
+    :param transfers: dictionary of influence name to the name of the influence that takes over its weights.
+    :return: new SparseWeights instance.
+    """
+
+    influences = list(weights.influences)
+    for target in transfers.values():
+        if target not in influences:
+            influences.append(target)
+    columns = dict((name, column) for column, name in enumerate(influences))
+    remap = [columns[transfers.get(name, name)] for name in weights.influences]
+    count = len(influences)
+
+    if numpy is not None:
+        offsets = numpy.asarray(weights.offsets, dtype=numpy.int64)
+        rows = numpy.repeat(numpy.arange(weights.num_vertices, dtype=numpy.int64), numpy.diff(offsets))
+        keys = rows * count + numpy.array(remap, dtype=numpy.int64)[numpy.asarray(weights.indices, dtype=numpy.int64)]
+
+        # sum the entries that landed on the same (vertex, influence)
+        keys, inverse = numpy.unique(keys, return_inverse=True)
+        values = numpy.bincount(inverse, weights=numpy.asarray(weights.values, dtype=numpy.float64),
+                                minlength=len(keys))
+        rows, indices = numpy.divmod(keys, max(count, 1))
+        new_offsets = numpy.zeros(weights.num_vertices + 1, dtype=numpy.uint32)
+        numpy.cumsum(numpy.bincount(rows, minlength=weights.num_vertices), out=new_offsets[1:])
+        return SparseWeights(influences, new_offsets, indices.astype(numpy.uint16), values.astype(numpy.float32))
+
+    offsets = array.array("I", [0])
+    indices = array.array("H")
+    values = array.array("f")
+    for vertex in xrange(weights.num_vertices):
+        row = {}
+        for entry in xrange(weights.offsets[vertex], weights.offsets[vertex + 1]):
+            column = remap[weights.indices[entry]]
+            row[column] = row.get(column, 0.0) + weights.values[entry]
+        for column in sorted(row):
+            indices.append(column)
+            values.append(row[column])
+        offsets.append(len(values))
+    return SparseWeights(influences, offsets, indices, values)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def record_size(record):
+    """
+    :param record: skin data dictionary.
+    :return: approximate number of bytes held by the weight arrays of the record.
+    """
+
+    size = _nbytes(record.get("blendWeights", ()))
+    if "sparseWeights" in record:
+        sparse = record["sparseWeights"]
+        size += _nbytes(sparse.offsets) + _nbytes(sparse.indices) + _nbytes(sparse.values)
+    elif "weightMatrix" in record:
+        size += _nbytes(record["weightMatrix"])
+    return size
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def write_weights_file(file_path, records):
+    """
+    Writes skin data records to disk in the binary .weights format.
+
+    Each record is a dictionary as produced by riggingUtils.SkinData.gather_data: it must have "shape",
+    "skinCluster", "blendWeights" and weights in any layout sparse_weights_from_record understands. Every other key is
+    treated as a skinCluster attribute and stored in the header.
+
+    :param file_path: path to write to.
+    :param records: list of skin data dictionaries.
+    """
+
+    header = {"records": []}
+    blocks = []
+    offset = 0
+
+    for record in records:
+        sparse = sparse_weights_from_record(record)
+
+        entry = {"shape": record["shape"],
+                 "skinCluster": record["skinCluster"],
+                 "influences": sparse.influences,
+                 "numVertices": sparse.num_vertices,
+                 "attributes": dict((key, value) for key, value in record.items() if key not in RESERVED_KEYS),
+                 "blocks": {}}
+
+        for name, dtype, data in (("offsets", "uint32", sparse.offsets),
+                                  ("indices", "uint16", sparse.indices),
+                                  ("values", "float32", sparse.values),
+                                  ("blendWeights", "float32", record["blendWeights"])):
+            data = to_float_array(data, DTYPES[dtype][0])
+            entry["blocks"][name] = {"dtype": dtype, "offset": offset, "count": len(data)}
+            blocks.append(data)
+            offset += len(data) * data.itemsize
+            offset += _padding(offset)
+
+        header["records"].append(entry)
+
+    header_bytes = json.dumps(header, sort_keys=True, ensure_ascii=True).encode("utf-8")
+    header_bytes += b" " * _padding(PREAMBLE.size + len(header_bytes))
+
+    with open(file_path, "wb") as fobj:
+        fobj.write(PREAMBLE.pack(MAGIC, VERSION, 0, len(header_bytes)))
+        fobj.write(header_bytes)
+        for data in blocks:
+            if sys.byteorder != "little":
+                data = array.array(data.typecode, data)
+                data.byteswap()
+            data.tofile(fobj)
+            fobj.write(b"\0" * _padding(len(data) * data.itemsize))
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def read_weights_file(file_path):
+    """
+    Reads a binary .weights file. The returned records mirror the dictionaries written by write_weights_file, with
+    the skinCluster attributes flattened back into the record. Version 2 files give a "sparseWeights" entry, version 1
+    files a dense "weightMatrix" and "influences".
+
+    Data blocks are numpy memmaps when numpy is available, otherwise array.array instances read from a memory-mapped
+    view of the file.
+
+    :param file_path: path of the file to read.
+    :return: list of skin data dictionaries.
+    """
+
+    with open(file_path, "rb") as fobj:
+        magic, version, flags, header_size = PREAMBLE.unpack(fobj.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise IOError("{0} is not a binary weights file.".format(file_path))
+        if version > VERSION:
+            raise IOError("{0} was written by a newer version ({1}) of the weights format.".format(file_path,
+                                                                                                    version))
+        header = json.loads(fobj.read(header_size).decode("utf-8"))
+        data_start = PREAMBLE.size + header_size
+
+        records = []
+        view = None
+        if numpy is None:
+            view = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            for entry in header["records"]:
+                record = dict(entry["attributes"])
+                record["shape"] = entry["shape"]
+                record["skinCluster"] = entry["skinCluster"]
+                record["influences"] = entry["influences"]
+
+                blocks = dict((name, _read_block(file_path, view, data_start, block))
+                              for name, block in entry["blocks"].items())
+                record["blendWeights"] = blocks.pop("blendWeights")
+                if "weightMatrix" in blocks:
+                    record["weightMatrix"] = blocks["weightMatrix"]
+                else:
+                    record["sparseWeights"] = SparseWeights(entry["influences"], blocks["offsets"],
+                                                            blocks["indices"], blocks["values"])
+                records.append(record)
+        finally:
+            if view is not None:
+                view.close()
+
+    return records
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _read_influence_weights(reader, epsilon):
+    # weights arrive influence by influence, so collect the non-zero entries first and sort them into rows after
+    influences = []
+    vertices = array.array("I")
+    columns = array.array("H")
+    values = array.array("f")
+    num_vertices = 0
+
+    for influence in reader.iter_object():
+        column = len(influences)
+        influences.append(influence)
+        vertex = -1
+        for vertex in reader.iter_array():
+            value = reader.read_value()
+            if value > epsilon or value < -epsilon:
+                vertices.append(vertex)
+                columns.append(column)
+                values.append(value)
+        num_vertices = max(num_vertices, vertex + 1)
+
+    # counting sort of the entries by vertex
+    offsets = array.array("I", [0]) * (num_vertices + 1)
+    for vertex in vertices:
+        offsets[vertex + 1] += 1
+    for vertex in xrange(num_vertices):
+        offsets[vertex + 1] += offsets[vertex]
+
+    slots = array.array("I", offsets)
+    row_indices = array.array("H", [0]) * len(values)
+    row_values = array.array("f", [0.0]) * len(values)
+    for entry in xrange(len(values)):
+        vertex = vertices[entry]
+        slot = slots[vertex]
+        row_indices[slot] = columns[entry]
+        row_values[slot] = values[entry]
+        slots[vertex] = slot + 1
+    return SparseWeights(influences, offsets, row_indices, row_values)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _nbytes(data):
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        return data.nbytes
+    if isinstance(data, array.array):
+        return len(data) * data.itemsize
+    return len(data) * 8
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _load_record(record):
+    # copy memory-mapped blocks into memory, so the spill file can be removed while the record is still in use
+    if numpy is None:
+        return record
+    record["blendWeights"] = numpy.array(record["blendWeights"])
+    if "sparseWeights" in record:
+        sparse = record["sparseWeights"]
+        record["sparseWeights"] = SparseWeights(sparse.influences, numpy.array(sparse.offsets),
+                                                numpy.array(sparse.indices), numpy.array(sparse.values))
+    return record
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _padding(size):
+    return (ALIGNMENT - size % ALIGNMENT) % ALIGNMENT
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def _read_block(file_path, view, data_start, block):
+    typecode, numpy_type = DTYPES[block["dtype"]]
+    offset = data_start + block["offset"]
+    count = block["count"]
+
+    if numpy is not None:
+        if not count:
+            return numpy.zeros(0, dtype=numpy_type)
+        return numpy.memmap(file_path, dtype=numpy_type, mode="r", offset=offset, shape=(count,))
+
+    size = count * array.array(typecode).itemsize
+    data = array.array(typecode, view[offset:offset + size])
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
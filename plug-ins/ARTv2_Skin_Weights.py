@@ -0,0 +1,103 @@
+"""
+Undoable skin weight command
+
+MFnSkinCluster.setWeights is not undoable on its own. ARTv2_setSkinWeights wraps it in a command so weights set from
+riggingUtils in a single API call still go through Maya's undo queue. The weights to set are handed over through
+riggingUtils.set_skin_weights, which queues them before calling the command.
+"""
+
+import sys
+
+import maya.api.OpenMaya as OpenMaya
+import maya.api.OpenMayaAnim as OpenMayaAnim
+
+COMMAND_NAME = "ARTv2_setSkinWeights"
+
+
+def maya_useNewAPI():
+    """
+    Tells Maya this plugin uses the API 2.0 classes.
+    """
+    pass
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+class setSkinWeights(OpenMaya.MPxCommand):
+
+    def __init__(self):
+        OpenMaya.MPxCommand.__init__(self)
+        self.skinFn = None
+        self.dagPath = None
+        self.components = None
+        self.influences = None
+        self.weights = None
+        self.normalize = False
+        self.oldWeights = None
+
+    @staticmethod
+    def creator():
+        return setSkinWeights()
+
+    def isUndoable(self):
+        return True
+
+    def doIt(self, args):
+        import Utilities.riggingUtils as riggingUtils
+
+        payload = riggingUtils.pop_pending_weights()
+        if payload is None:
+            raise RuntimeError(COMMAND_NAME + ": no weights queued. Use riggingUtils.set_skin_weights().")
+
+        selection = OpenMaya.MSelectionList()
+        selection.add(payload["skinCluster"])
+        self.skinFn = OpenMayaAnim.MFnSkinCluster(selection.getDependNode(0))
+        self.dagPath = riggingUtils.get_skin_geometry_path(self.skinFn, payload["mesh"])
+        if payload.get("vertices") is None:
+            self.components = riggingUtils.get_complete_vertex_component(self.dagPath)
+        else:
+            self.components = riggingUtils.get_vertex_component(payload["vertices"])
+        self.influences = OpenMaya.MIntArray(payload["influences"])
+        self.weights = payload["weights"]
+        self.normalize = payload.get("normalize", False)
+
+        self.oldWeights = self.skinFn.setWeights(self.dagPath, self.components, self.influences, self.weights,
+                                                 self.normalize, True)
+
+    def redoIt(self):
+        self.skinFn.setWeights(self.dagPath, self.components, self.influences, self.weights, self.normalize)
+
+    def undoIt(self):
+        self.skinFn.setWeights(self.dagPath, self.components, self.influences, self.oldWeights, False)
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Plugin Main
+def initializePlugin(obj):
+
+    plugin = OpenMaya.MFnPlugin(obj, "Epic Games", "1.0", "Any")
+    try:
+        plugin.registerCommand(COMMAND_NAME, setSkinWeights.creator)
+
+    except Exception:
+        sys.stderr.write("Failed to register command: %s" % COMMAND_NAME)
+        raise
+
+
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+def uninitializePlugin(obj):
+
+    plugin = OpenMaya.MFnPlugin(obj)
+    try:
+        plugin.deregisterCommand(COMMAND_NAME)
+    except Exception:
+        sys.stderr.write("Failed to deregister command: %s" % COMMAND_NAME)
+        raise